@@ -0,0 +1,149 @@
+"""Offline benchmark of the bina.az record pipeline: decode, parse, merge, write.
+
+Builds GraphQL list and CurrentItem response bodies from the scraper's CSV
+(bench_servers.build_bina_items) and pushes them through:
+
+- "dict": the pipeline before binaz_record: stdlib json, one dict per listing
+  merged with ``dict.update`` and written through ``csv.DictWriter``;
+- "record/<backend>": the scraper's parse_listing/parse_detail_fields filling a
+  slotted ListingRecord, written as a plain row, for every installed JSON backend.
+
+It reports listings per second and the Python heap held by the parsed records
+while they are all alive (as when they pile up in queues or a frontier batch),
+and checks that every pipeline writes the same CSV.
+
+    python bench_binaz_records.py                 # 20000 listings
+    python bench_binaz_records.py --items 100000 --repeat 1
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+import tracemalloc
+
+import binaz_record
+from bench_servers import build_bina_items
+from bench_suite import load_binaz
+
+LIST_PAGE = 24
+
+
+def build_bodies(items: int) -> list:
+    """(list page body, [detail bodies]) pairs, encoded as the API sends them."""
+    pairs = build_bina_items(items=items)
+    bodies = []
+    for start in range(0, len(pairs), LIST_PAGE):
+        chunk = pairs[start:start + LIST_PAGE]
+        listing_body = json.dumps({"data": {"items": [listing for listing, _ in chunk]}}, ensure_ascii=False).encode("utf-8")
+        detail_bodies = [json.dumps({"data": {"item": detail}}, ensure_ascii=False).encode("utf-8") for _, detail in chunk]
+        bodies.append((listing_body, detail_bodies))
+    return bodies
+
+
+def legacy_parse_listing(item):
+    loc = item.get("location") or {}
+    city = item.get("city") or {}
+    price = item.get("price") or {}
+    area = item.get("area") or {}
+    return {
+        "id": item.get("id"), "url": f"https://bina.az{item.get('path','')}", "price": price.get("value"),
+        "currency": price.get("currency"), "rooms": item.get("rooms"), "area": area.get("value"),
+        "area_units": area.get("units"), "location": loc.get("fullName"), "city": city.get("name"),
+        "updated_at": item.get("updatedAt"), "photos_count": item.get("photosCount"),
+    }
+
+
+def legacy_parse_detail_fields(item):
+    phones = item.get("phones") or []
+    phone_list = [p.get("value") for p in phones if p.get("value")]
+    category = item.get("category") or {}
+    floor = item.get("floor")
+    floors = item.get("floors")
+    return {
+        "description": item.get("description"), "address": item.get("address"), "latitude": item.get("latitude"),
+        "longitude": item.get("longitude"), "contact_name": item.get("contactName"), "phones": ", ".join(phone_list),
+        "category": category.get("name"), "Çıxarış": "Yes" if item.get("hasBillOfSale", False) else "No",
+        "Təmir": "Yes" if item.get("hasRepair", False) else "No",
+        "Mərtəbə": f"{floor}/{floors}" if floor is not None and floors is not None else None,
+    }
+
+
+def dict_pipeline(bodies, out) -> list:
+    writer = csv.DictWriter(out, fieldnames=binaz_record.FIELDNAMES, extrasaction="ignore")
+    kept = []
+    for listing_body, detail_bodies in bodies:
+        metas = [legacy_parse_listing(item) for item in json.loads(listing_body)["data"]["items"]]
+        for meta, detail_body in zip(metas, detail_bodies):
+            meta.update(legacy_parse_detail_fields(json.loads(detail_body)["data"]["item"]))
+            writer.writerow(meta)
+            kept.append(meta)
+    return kept
+
+
+def record_pipeline(binaz, loads):
+    def run(bodies, out) -> list:
+        writer = csv.writer(out)
+        kept = []
+        for listing_body, detail_bodies in bodies:
+            records = [binaz.parse_listing(item) for item in loads(listing_body)["data"]["items"]]
+            for record, detail_body in zip(records, detail_bodies):
+                binaz.parse_detail_fields(loads(detail_body)["data"]["item"], record)
+                writer.writerow(record.row())
+                kept.append(record)
+        return kept
+    return run
+
+
+def bench(name, pipeline, bodies, items, repeat):
+    # Written to a real (utf-8, discarded) file like the scraper's CSV, not kept in memory
+    with open(os.devnull, "w", newline="", encoding="utf-8") as out:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            pipeline(bodies, out)
+        elapsed = time.perf_counter() - started
+
+        # Heap still held by the parsed records once the response bodies are gone
+        tracemalloc.start()
+        kept = pipeline(bodies, out)
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+
+    n = repeat * items
+    print(f"{name:<16} {n / elapsed:>10.0f} listings/s {elapsed / n * 1e6:>8.1f} us/listing "
+          f"{held / items:>8.0f} B/listing held {peak / 1024 / 1024:>8.1f} MiB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bina.az decode/parse/write pipeline offline.")
+    parser.add_argument("--items", type=int, default=20000, help="listings to generate")
+    parser.add_argument("--repeat", type=int, default=3, help="passes for the timing run")
+    args = parser.parse_args()
+
+    binaz = load_binaz()
+    bodies = build_bodies(args.items)
+    size = sum(len(listing_body) + sum(map(len, detail_bodies)) for listing_body, detail_bodies in bodies)
+    print(f"{args.items} listings, {size / 1024 / 1024:.1f} MiB of responses, {args.repeat} passes\n")
+
+    candidates = [("dict", dict_pipeline)]
+    for backend in ("json", "msgspec", "orjson"):
+        if backend == "json" or getattr(binaz_record, backend) is not None:
+            candidates.append((f"record/{backend}", record_pipeline(binaz, binaz_record.decoder(backend))))
+        else:
+            print(f"{'record/' + backend:<16} skipped ({backend} is not installed)")
+
+    reference = None
+    for name, pipeline in candidates:
+        out = io.StringIO()
+        pipeline(bodies, out)
+        if reference is None:
+            reference = out.getvalue()
+        elif out.getvalue() != reference:
+            print(f"{name:<16} !!! CSV output differs from dict")
+        bench(name, pipeline, bodies, args.items, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Offline benchmark of listing_dedup at hundreds of thousands of listings.
+
+Synthetic listings are built from the sentences of the real descriptions in
+bina_listings_20250724.csv: each original gets a few random sentences, a
+random point in Baku and a random price/area/rooms. A share of the listings
+are reposts of an earlier one, as agents post them: a few words dropped or
+changed, a contact line appended, the pin moved by up to ~100 m, the price
+changed by up to 5%. The ground truth is which original every listing copies.
+
+The listings are added to a DedupIndex in daily-sized batches, as the crawls
+would add them, and the benchmark reports listings per second per batch (it
+should stay flat as the index grows, where comparing all pairs grows with n),
+the save/load time and size of the index, and pairwise precision and recall
+of the clusters against the ground truth.
+
+    python bench_dedup.py                                 # 300000 listings
+    python bench_dedup.py --listings 100000 --batch 10000
+"""
+import argparse
+import csv
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+
+from listing_dedup import DedupIndex
+
+SOURCE_CSV = "bina_listings_20250724.csv"
+# Baku, roughly
+LAT_RANGE = (40.33, 40.48)
+LON_RANGE = (49.75, 50.00)
+CONTACT_LINES = ["Zəng edin!", "Vasitəçi yoxdur.", "Əlaqə üçün WhatsApp.", "Ipoteka mümkündür.", "Təcili satılır."]
+
+
+def load_sentences(path: str) -> list:
+    with open(path, newline="", encoding="utf-8") as f:
+        text = " ".join(row["description"] or "" for row in csv.DictReader(f))
+    return [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", text) if len(sentence.strip()) > 20]
+
+
+def repost_text(text: str, rng: random.Random) -> str:
+    words = text.split()
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(words))
+        if rng.random() < 0.5:
+            del words[i]
+        else:
+            words[i] = words[i].upper()
+        if len(words) < 2:
+            break
+    return " ".join(words) + " " + rng.choice(CONTACT_LINES)
+
+
+def build_listings(n: int, duplicate_share: float, sentences: list, seed: int = 1) -> list:
+    """``n`` listing dicts with a ``truth`` key: the id of the original they copy (their own id for originals)."""
+    rng = random.Random(seed)
+    listings = []
+    for i in range(n):
+        listing_id = str(10_000_000 + i)
+        if listings and rng.random() < duplicate_share:
+            original = rng.choice(listings)
+            listings.append({
+                "id": listing_id, "truth": original["truth"],
+                "description": repost_text(original["description"], rng),
+                "latitude": original["latitude"] + rng.uniform(-0.0008, 0.0008),
+                "longitude": original["longitude"] + rng.uniform(-0.0008, 0.0008),
+                "price": round(original["price"] * rng.uniform(0.95, 1.05)),
+                "area": original["area"], "rooms": original["rooms"],
+            })
+        else:
+            rooms = rng.randint(1, 5)
+            listings.append({
+                "id": listing_id, "truth": listing_id,
+                "description": " ".join(rng.sample(sentences, rng.randint(3, 8))),
+                "latitude": rng.uniform(*LAT_RANGE), "longitude": rng.uniform(*LON_RANGE),
+                "price": rng.randrange(40_000, 900_000, 100), "area": round(rng.uniform(25, 60) * rooms, 1), "rooms": rooms,
+            })
+    return listings
+
+
+def pairs(counts) -> int:
+    return sum(c * (c - 1) // 2 for c in counts)
+
+
+def score(listings: list, index: DedupIndex) -> tuple:
+    """Pairwise precision and recall of the index's clusters against the ground truth."""
+    predicted = {listing_id: cluster for listing_id, cluster, _ in index.clusters()}
+    truth = {listing["id"]: listing["truth"] for listing in listings}
+    together = pairs(Counter((predicted[i], truth[i]) for i in truth).values())
+    predicted_pairs = pairs(Counter(predicted[i] for i in truth).values())
+    true_pairs = pairs(Counter(truth.values()).values())
+    return together / max(predicted_pairs, 1), together / max(true_pairs, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MinHash/LSH near-duplicate clustering offline.")
+    parser.add_argument("--listings", type=int, default=300_000)
+    parser.add_argument("--batch", type=int, default=50_000, help="listings per add() call, like one day's crawl")
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of listings that are reposts")
+    args = parser.parse_args()
+
+    sentences = load_sentences(SOURCE_CSV)
+    started = time.perf_counter()
+    listings = build_listings(args.listings, args.duplicates, sentences)
+    print(f"{len(listings)} listings from {len(sentences)} real sentences built in {time.perf_counter() - started:.1f}s\n")
+
+    index = DedupIndex()
+    total = 0.0
+    for start in range(0, len(listings), args.batch):
+        batch = listings[start:start + args.batch]
+        started = time.perf_counter()
+        index.add(batch)
+        elapsed = time.perf_counter() - started
+        total += elapsed
+        print(f"add {start + len(batch):>8} {len(batch) / elapsed:>10.0f} listings/s {elapsed:>7.1f}s")
+    print(f"{'total':<12} {len(listings) / total:>10.0f} listings/s {total:>7.1f}s")
+
+    path = os.path.join(tempfile.mkdtemp(), "dedup.npz")
+    started = time.perf_counter()
+    index.save(path)
+    saved = time.perf_counter() - started
+    started = time.perf_counter()
+    loaded = DedupIndex.load(path)
+    print(f"\nsave {saved:.1f}s, load {time.perf_counter() - started:.1f}s, {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+    os.remove(path)
+
+    precision, recall = score(listings, loaded)
+    clusters = len({cluster for _, cluster, _ in loaded.clusters()})
+    expected = len({listing["truth"] for listing in listings})
+    print(f"{clusters} clusters ({expected} expected), pairwise precision {precision:.3f}, recall {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
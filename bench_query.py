@@ -0,0 +1,133 @@
+"""Offline benchmark of listing_query at hundreds of thousands of listings.
+
+Synthetic bina.az listings (a random point in Baku, price, rooms, area,
+category and location; some rentals and some priced in USD) are added to a ListingIndex in daily-sized batches, as
+the crawls would add them, with a share of every batch being listings already
+indexed that were re-priced or moved. Then random queries of the kinds the
+index is for are timed, and every result is checked against a brute-force
+scan of the listings in memory:
+
+- listings within 0.5-3 km of a point, in a price and room range;
+- listings in a price range (no point);
+- price per m² (of the sales in AZN) by location, over all listings and over
+  one category, and by grid cell within 3 km of a point.
+
+    python bench_query.py                                 # 500000 listings
+    python bench_query.py --listings 100000 --batch 10000 --queries 500
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from listing_query import ListingIndex, distance_km
+
+# Baku, roughly
+LAT_RANGE = (40.33, 40.48)
+LON_RANGE = (49.75, 50.00)
+CATEGORIES = ["Yeni tikili", "Köhnə tikili", "Həyət evi/Bağ evi", "Obyekt", "Ofis"]
+LOCATIONS = [f"Location {i}" for i in range(120)]
+
+
+def make_listing(listing_id: int, rng: random.Random) -> dict:
+    rooms = rng.randint(1, 6)
+    area = round(rng.uniform(25, 60) * rooms, 1)
+    return {
+        "id": str(listing_id), "url": f"https://bina.az/items/{listing_id}", "area_units": "m²",
+        "currency": "USD" if rng.random() < 0.05 else "AZN", "leased": rng.choices(["Yes", "No", ""], [10, 85, 5])[0],
+        "price": str(round(area * rng.uniform(900, 5000), -2)), "rooms": str(rooms), "area": str(area),
+        "category": rng.choice(CATEGORIES), "location": rng.choice(LOCATIONS), "city": "Bakı",
+        "latitude": str(rng.uniform(*LAT_RANGE)), "longitude": str(rng.uniform(*LON_RANGE)),
+    }
+
+
+def matches(listing: dict, query: dict) -> bool:
+    price, rooms = float(listing["price"]), int(listing["rooms"])
+    if not query["min_price"] <= price <= query["max_price"] or not query["min_rooms"] <= rooms <= query["max_rooms"]:
+        return False
+    return "lat" not in query or distance_km(query["lat"], query["lon"], float(listing["latitude"]),
+                                              float(listing["longitude"])) <= query["km"]
+
+
+def random_query(rng: random.Random, with_point: bool) -> dict:
+    low = rng.randrange(50_000, 600_000, 10_000)
+    rooms = rng.randint(1, 5)
+    query = {"min_price": low, "max_price": low + rng.choice([20_000, 50_000, 150_000]),
+             "min_rooms": rooms, "max_rooms": rooms + rng.randint(0, 1)}
+    if with_point:
+        query.update(lat=rng.uniform(*LAT_RANGE), lon=rng.uniform(*LON_RANGE), km=rng.choice([0.5, 1.0, 2.0, 3.0]))
+    return query
+
+
+def timed(label: str, fn, queries: list) -> list:
+    times, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(fn(query))
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    sizes = [len(result) for result in results]
+    print(f"{label:<34} p50 {statistics.median(times):>6.2f} ms  p95 {times[int(len(times) * 0.95)]:>6.2f} ms  "
+          f"max {times[-1]:>6.2f} ms  ({statistics.fmean(sizes):.0f} rows on average)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark listing_query's spatial and price index offline.")
+    parser.add_argument("--listings", type=int, default=500_000)
+    parser.add_argument("--batch", type=int, default=50_000, help="listings per day's update")
+    parser.add_argument("--updates", type=float, default=0.2, help="share of each batch that re-scrapes indexed listings")
+    parser.add_argument("--queries", type=int, default=200, help="queries of each kind")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    path = os.path.join(tempfile.mkdtemp(), "query.sqlite")
+    index = ListingIndex(path)
+    listings = {}
+    day = 0
+    while len(listings) < args.listings:
+        day += 1
+        batch = [make_listing(10_000_000 + len(listings) + i, rng)
+                 for i in range(min(args.batch, args.listings - len(listings)))]
+        for listing_id in rng.sample(sorted(listings), min(len(listings), int(len(batch) * args.updates))):
+            listing = dict(listings[listing_id], price=str(round(float(listings[listing_id]["price"]) * rng.uniform(0.9, 1.1), -2)))
+            if rng.random() < 0.1:
+                listing.update(latitude=str(rng.uniform(*LAT_RANGE)), longitude=str(rng.uniform(*LON_RANGE)))
+            batch.append(listing)
+        started = time.perf_counter()
+        index.add(batch, seen_at=f"2025-08-{day:02d}T12:00:00")
+        elapsed = time.perf_counter() - started
+        listings.update((listing["id"], listing) for listing in batch)
+        print(f"day {day:>2}: {len(batch):>6} listings upserted in {elapsed:>5.2f}s ({len(batch) / elapsed:>6.0f}/s), "
+              f"{index.count()} indexed")
+    print(f"\n{os.path.getsize(path) / 1024 / 1024:.1f} MiB\n")
+
+    everything = list(listings.values())
+    near = [random_query(rng, True) for _ in range(args.queries)]
+    priced = [random_query(rng, False) for _ in range(args.queries)]
+    results = timed("within X km, price and rooms", lambda query: index.search(**query), near)
+    results += timed("price and rooms", lambda query: index.search(**query), priced)
+    stats = timed("price per m² by location", lambda query: index.price_per_m2("location"), priced[:20])
+    categories = [rng.choice(CATEGORIES) for _ in range(20)]
+    stats += timed("price per m² by location, category", lambda category: index.price_per_m2("location", category=category),
+                   categories)
+    timed("price per m² by cell within 3 km", lambda query: index.price_per_m2("cell", query["lat"], query["lon"], 3.0), near)
+
+    started = time.perf_counter()
+    mismatches = sum({row["id"] for row in result} != {listing["id"] for listing in everything if matches(listing, query)}
+                     for query, result in zip(near + priced, results))
+    for stat, category in zip(stats, [None] * 20 + categories):
+        by_location = {}
+        for listing in everything:
+            if category in (None, listing["category"]) and listing["leased"] != "Yes" and listing["currency"] == "AZN":
+                by_location.setdefault(listing["location"], []).append(float(listing["price"]) / float(listing["area"]))
+        expected = {location: round(statistics.median(values), 1) for location, values in by_location.items()}
+        mismatches += {row["location"]: row["median"] for row in stat} != expected
+    print(f"\nchecked against a brute-force scan ({time.perf_counter() - started:.0f}s): {mismatches} mismatches")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
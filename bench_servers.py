@@ -0,0 +1,362 @@
+"""Local stand-ins for bina.az's GraphQL endpoint and tap.az's HTML pages.
+
+Both servers answer the exact requests the scrapers send, so a benchmark run
+exercises the real request, parsing and storage code with no proxy and no
+live site in the way. Every response can be delayed (``latency`` seconds,
+uniformly 0.5x-1.5x, with a ``slow_rate`` share taking 10x) and can fail at
+random with a 500 (``error_rate``) or a 429 + Retry-After (``throttle_rate``).
+
+* bina.az: ``GET /graphql`` with the persisted-query parameters of
+  ``graphql_request``. The operations are SearchTotalCount, FeaturedItemsRow
+  and CurrentItem, and the hashes must match ``HASHES`` in the scraper.
+  Listings are built from ``bina_listings.csv`` and repeated under new IDs up
+  to ``items``. Like the site, the list stops after PAGE_CAP pages.
+* tap.az: a main category page, ``subcategories`` paginated listings and
+  product pages that reuse the saved pages in fixtures/tapaz.
+
+    python bench_servers.py --latency 0.2 --error-rate 0.02    # serve until Ctrl-C
+"""
+import argparse
+import ast
+import csv
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BINAZ_SCRIPT = os.path.join(REPO_DIR, "binaz-scraper-original.py")
+BINA_CSV = os.path.join(REPO_DIR, "bina_listings.csv")
+TAPAZ_FIXTURE_DIR = os.path.join(REPO_DIR, "fixtures", "tapaz")
+TAPAZ_CATEGORY_URL = "/elanlar/neqliyyat/tikinti-texnikasi"
+PAGE_CAP = 47
+TAPAZ_PAGE_SIZE = 24
+
+
+def read_hashes(script: str = BINAZ_SCRIPT) -> dict:
+    """The scraper's HASHES dict, read from its source so the scraper doesn't have to be imported."""
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "HASHES" for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"no HASHES in {script}")
+
+
+class Faults:
+    """Latency and failure injection shared by both servers."""
+
+    def __init__(self, latency: float = 0.0, slow_rate: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self):
+        """Returns (delay_seconds, status or None) for one request."""
+        with self._lock:
+            delay = self.latency * self._random.uniform(0.5, 1.5)
+            if self._random.random() < self.slow_rate:
+                delay *= 10
+            roll = self._random.random()
+        if roll < self.error_rate:
+            return delay, 500
+        if roll < self.error_rate + self.throttle_rate:
+            return delay, 429
+        return delay, None
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, faults: Faults, port: int = 0):
+        super().__init__(("127.0.0.1", port), handler)
+        self.faults = faults
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (cancelled hedged requests, timeouts); that's not a server error
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def count(self, failed: bool):
+        with self._lock:
+            self.requests += 1
+            self.failures += failed
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        delay, status = self.server.faults.pick()
+        if delay:
+            time.sleep(delay)
+        self.server.count(status is not None)
+        if status == 429:
+            self.send_body(429, b"Too Many Requests", "text/plain", {"Retry-After": "1"})
+        elif status:
+            self.send_body(status, b"Internal Server Error", "text/plain")
+        else:
+            self.answer(urlsplit(self.path))
+
+
+# === bina.az ===
+
+def _number(value, kind=float):
+    try:
+        return kind(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def build_bina_items(csv_path: str = BINA_CSV, items: int = None) -> list:
+    """(list item, detail item) pairs in the API's shape, from the scraper's own CSV output."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    items = items or len(rows)
+    # The site's filters take IDs; the stand-in numbers the CSV's cities
+    city_ids = {name: str(i + 1) for i, name in enumerate(sorted({row.get("city") or "" for row in rows}))}
+    built = []
+    for i in range(items):
+        row = rows[i % len(rows)]
+        item_id = row["id"] if i < len(rows) else str(90_000_000 + i)
+        listing = {
+            "id": item_id,
+            "path": f"/items/{item_id}",
+            "price": {"value": _number(row.get("price"), int), "currency": row.get("currency") or "AZN"},
+            "rooms": _number(row.get("rooms"), int),
+            "area": {"value": _number(row.get("area")), "units": row.get("area_units")},
+            "location": {"fullName": row.get("location")},
+            "city": {"name": row.get("city")},
+            "updatedAt": row.get("updated_at"),
+            "photosCount": _number(row.get("photos_count"), int),
+            # Not in the CSV; every tenth listing is a rental so the "leased" shard dimension splits
+            "leased": i % 10 == 0,
+            "cityId": city_ids[row.get("city") or ""],
+            "categoryId": "1" if i % 2 else "2",
+        }
+        detail = {
+            "id": item_id,
+            "description": row.get("description"),
+            "address": row.get("address"),
+            "latitude": _number(row.get("latitude")),
+            "longitude": _number(row.get("longitude")),
+            "contactName": row.get("contact_name"),
+            "phones": [{"value": phone} for phone in (row.get("phones") or "").split(", ") if phone],
+            "category": {"name": "Yeni tikili" if i % 2 else "Köhnə tikili"},
+            "hasBillOfSale": i % 3 != 0,
+            "hasRepair": i % 4 != 0,
+            "floor": i % 16 + 1,
+            "floors": 16,
+        }
+        built.append((listing, detail))
+    return built
+
+
+def matches_filter(listing: dict, filter_params: dict) -> bool:
+    if "leased" in filter_params and listing["leased"] != filter_params["leased"]:
+        return False
+    for key in ("cityId", "categoryId"):
+        if key in filter_params and listing[key] != filter_params[key]:
+            return False
+    if "roomIds" in filter_params:
+        rooms = listing["rooms"]
+        room_id = None if rooms is None else ("5+" if rooms >= 5 else str(rooms))
+        if room_id not in filter_params["roomIds"]:
+            return False
+    price = listing["price"]["value"] or 0
+    if "priceFrom" in filter_params and price < filter_params["priceFrom"]:
+        return False
+    if "priceTo" in filter_params and price > filter_params["priceTo"]:
+        return False
+    return True
+
+
+class BinaHandler(StandInHandler):
+    def answer(self, url):
+        if url.path != "/graphql":
+            self.send_body(404, b"Not Found", "text/plain")
+            return
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        try:
+            operation = query["operationName"]
+            variables = json.loads(query.get("variables") or "{}")
+            sha256 = json.loads(query["extensions"])["persistedQuery"]["sha256Hash"]
+        except (KeyError, ValueError, TypeError):
+            self.send_body(400, b'{"errors":[{"message":"Bad request"}]}', "application/json")
+            return
+        server = self.server
+        if server.operations.get(operation) != sha256:
+            self.send_body(200, b'{"errors":[{"message":"PersistedQueryNotFound"}]}', "application/json")
+            return
+
+        if operation == "CurrentItem":
+            detail = server.details.get(str(variables.get("id")))
+            data = {"item": detail}
+        else:
+            listings = server.search(variables.get("filter") or {})
+            if operation == "SearchTotalCount":
+                data = {"itemsConnection": {"totalCount": len(listings)}}
+            else:
+                offset, limit = variables.get("offset", 0), variables.get("limit", 24)
+                end = min(offset + limit, PAGE_CAP * limit)
+                data = {"items": listings[offset:end] if offset < end else []}
+        self.send_body(200, json.dumps({"data": data}, ensure_ascii=False).encode("utf-8"), "application/json")
+
+
+class BinaStandIn(StandInServer):
+    def __init__(self, faults: Faults, items: int = None, csv_path: str = BINA_CSV, port: int = 0):
+        super().__init__(BinaHandler, faults, port)
+        hashes = read_hashes()
+        self.operations = {"SearchTotalCount": hashes["count"], "FeaturedItemsRow": hashes["list"], "CurrentItem": hashes["detail"]}
+        built = build_bina_items(csv_path, items)
+        self.listings = [listing for listing, _ in built]
+        self.details = {detail["id"]: detail for _, detail in built}
+        self._searches = {}
+
+    @property
+    def graphql_url(self) -> str:
+        return self.url + "/graphql"
+
+    def search(self, filter_params: dict) -> list:
+        key = json.dumps(filter_params, sort_keys=True)
+        if key not in self._searches:
+            self._searches[key] = [listing for listing in self.listings if matches_filter(listing, filter_params)]
+        return self._searches[key]
+
+
+# === tap.az ===
+
+def tapaz_listing_html(category_url: str, subcategory: str, ids: list, page: int, last_page: bool) -> str:
+    products = "".join(
+        f'<div class="products-i"><a class="products-link" href="{category_url}/{subcategory}/{elan_id}">'
+        f'<div class="products-name">Elan {elan_id}</div></a></div>' for elan_id in ids)
+    pagination = "" if last_page else f'<div class="pagination"><span class="next"><a href="{category_url}/{subcategory}?page={page + 1}">Daha çox</a></span></div>'
+    return f'<!DOCTYPE html><html><body><div class="products">{products}</div>{pagination}</body></html>'
+
+
+class TapazHandler(StandInHandler):
+    def answer(self, url):
+        server = self.server
+        parts = url.path.rstrip("/").split("/")
+        base_parts = server.category_url.split("/")
+        if url.path.rstrip("/") == "":
+            # Home page: the site menu links the one category this stand-in serves
+            html = f'<!DOCTYPE html><html><body><nav><a href="{server.category_url}">Category</a></nav></body></html>'
+        elif url.path.rstrip("/") == server.category_url:
+            links = "".join(f'<a class="cat-name" href="{server.category_url}/{name}">{name}</a>' for name in server.subcategories)
+            html = f'<!DOCTYPE html><html><body><div class="subcategories-inner">{links}</div></body></html>'
+        elif parts[:len(base_parts)] == base_parts and len(parts) == len(base_parts) + 1 and parts[-1] in server.subcategories:
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            ids = server.subcategories[parts[-1]]
+            start = (page - 1) * TAPAZ_PAGE_SIZE
+            html = tapaz_listing_html(server.category_url, parts[-1], ids[start:start + TAPAZ_PAGE_SIZE], page,
+                                      start + TAPAZ_PAGE_SIZE >= len(ids))
+        elif parts[:len(base_parts)] == base_parts and len(parts) == len(base_parts) + 2 and parts[-1] in server.products:
+            html = server.products[parts[-1]]
+        else:
+            self.send_body(404, b"Not Found", "text/plain")
+            return
+        self.send_body(200, html.encode("utf-8"), "text/html; charset=utf-8")
+
+
+class TapazStandIn(StandInServer):
+    def __init__(self, faults: Faults, subcategories: int = 4, products_per_subcategory: int = 120,
+                 fixture_dir: str = TAPAZ_FIXTURE_DIR, category_url: str = TAPAZ_CATEGORY_URL, port: int = 0):
+        super().__init__(TapazHandler, faults, port)
+        self.category_url = category_url
+        templates = []
+        for path in sorted(glob.glob(os.path.join(fixture_dir, "*.html"))):
+            with open(path, encoding="utf-8") as f:
+                templates.append(f.read())
+        if not templates:
+            raise ValueError(f"no product pages in {fixture_dir}")
+        self.subcategories = {}
+        self.products = {}
+        next_id = 50_000_000
+        # An int gives every subcategory the same size; a list sets each one's size
+        sizes = products_per_subcategory if isinstance(products_per_subcategory, list) else [products_per_subcategory] * subcategories
+        for s, size in enumerate(sizes):
+            ids = [str(next_id + i) for i in range(size)]
+            next_id += size
+            self.subcategories[f"sub-{s + 1}"] = ids
+            for elan_id in ids:
+                # Rendered once up front; the templates differ, so parsers see varied pages
+                self.products[elan_id] = templates[int(elan_id) % len(templates)]
+
+
+def start_servers(faults: Faults, bina_items: int = None, tapaz_subcategories: int = 4, tapaz_products: int = 120):
+    """Starts both stand-ins on free ports and returns ``(bina, tapaz)``."""
+    return (BinaStandIn(faults, bina_items).start(),
+            TapazStandIn(faults, tapaz_subcategories, tapaz_products).start())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for bina.az GraphQL and tap.az HTML.")
+    parser.add_argument("--bina-port", type=int, default=8701)
+    parser.add_argument("--tapaz-port", type=int, default=8702)
+    parser.add_argument("--bina-items", type=int, default=None, help="listings to serve (default: the CSV's rows)")
+    parser.add_argument("--tapaz-subcategories", type=int, default=4)
+    parser.add_argument("--tapaz-products", type=int, default=120, help="products per subcategory")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean response delay in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of responses delayed 10x")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.slow_rate, args.error_rate, args.throttle_rate, args.seed)
+    bina = BinaStandIn(faults, args.bina_items, port=args.bina_port).start()
+    tapaz = TapazStandIn(faults, args.tapaz_subcategories, args.tapaz_products, port=args.tapaz_port).start()
+    print(f"bina.az GraphQL: {bina.graphql_url} ({len(bina.listings)} listings)")
+    print(f"tap.az HTML:     {tapaz.url}{tapaz.category_url} ({len(tapaz.products)} products)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bina.stop()
+        tapaz.stop()
+        print(f"Served {bina.requests} bina.az and {tapaz.requests} tap.az requests.")
+
+
+if __name__ == "__main__":
+    main()
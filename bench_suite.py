@@ -0,0 +1,307 @@
+"""Offline benchmark suite: runs the scrapers against the local stand-ins in bench_servers.
+
+Each configuration runs the real scraper code (bina.az: ``main()`` of the
+scraper with the chosen engine; tap.az: HTTP listing + ``scrape_products_http``
+with the chosen parser, storing into a ListingStore) in a fresh child process
+in a temporary directory. Peak memory is therefore the child's own, and runs
+don't share caches. The servers run in this process, with the same latency and
+fault settings for every configuration. The bina.az scraper's proxy and rate
+settings are replaced with an unproxied RateController of the configured
+concurrency.
+
+Reported per configuration: records stored, wall time, records/s and requests/s,
+p50/p99 request latency as the scraper saw it (including its own queueing and
+retries), failed requests and peak RSS.
+
+    python bench_suite.py                                  # everything, default faults
+    python bench_suite.py --only bina --latency 0.1 --concurrency 8 32
+    python bench_suite.py --save before.json               # ...change something...
+    python bench_suite.py --baseline before.json           # records/s relative to before
+"""
+import argparse
+import contextlib
+import fnmatch
+import functools
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_servers import BINAZ_SCRIPT, REPO_DIR, Faults, start_servers
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0'
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def peak_rss_mib():
+    """Peak resident memory of this process, or None where it can't be measured."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # KiB on Linux, bytes on macOS
+        return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+class LatencyRecorder:
+    """Wraps request functions so every call's latency and outcome is recorded."""
+
+    def __init__(self):
+        self.samples = []
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _record(self, started: float, failed: bool):
+        with self._lock:
+            self.samples.append(time.perf_counter() - started)
+            self.failures += failed
+
+    def wrap(self, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._record(started, failed)
+        return timed
+
+    def wrap_async(self, fn):
+        @functools.wraps(fn)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = await fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._record(started, failed)
+        return timed
+
+
+def load_binaz():
+    """Imports the hyphenated bina.az script as a module."""
+    spec = importlib.util.spec_from_file_location("binaz_scraper", BINAZ_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# === configurations (run in the child) ===
+
+def run_bina(config: dict, urls: dict, recorder: LatencyRecorder) -> int:
+    from rate_control import RateController
+
+    binaz = load_binaz()
+    binaz.BASE_URL = urls["bina"]
+    binaz.POOL = None
+    binaz.SESSION.trust_env = False
+    concurrency = config["concurrency"]
+    binaz.RATE = RateController(rate=10_000.0, max_rate=10_000.0, concurrency=concurrency,
+                                min_concurrency=1, max_concurrency=concurrency, target_latency=30.0)
+    binaz.graphql_request = recorder.wrap(binaz.graphql_request)
+    binaz.async_graphql_request = recorder.wrap_async(binaz.async_graphql_request)
+    argv = ["--engine", config["engine"]] + (["--shards"] if config.get("shards") else [])
+    binaz.main(argv)
+    return binaz.output.written
+
+
+def run_tapaz(config: dict, urls: dict, recorder: LatencyRecorder) -> int:
+    from bs4 import BeautifulSoup
+
+    import tapaz_http
+    from listings_store import ListingStore
+    from rate_control import RateController
+    from tapaz_extract import extract_product
+
+    concurrency = config["concurrency"]
+    tapaz_http.HTTP_RATE = RateController(rate=10_000.0, max_rate=10_000.0, concurrency=concurrency,
+                                          min_concurrency=1, max_concurrency=concurrency, target_latency=30.0)
+    tapaz_http.fetch_html = recorder.wrap(tapaz_http.fetch_html)
+    base_url, category_url = urls["tapaz"], urls["tapaz_category"]
+
+    session = tapaz_http.make_session(USER_AGENT, 1)
+    soup = BeautifulSoup(tapaz_http.fetch_html_with_retries(session, base_url + category_url), "html.parser")
+    subcategories = [link.get("href") for link in soup.select(".subcategories-inner a.cat-name")]
+    session.close()
+
+    store = ListingStore("listings.sqlite", "tapaz", "elan_id")
+    parse = functools.partial(extract_product, parser=config["parser"])
+    for subcategory_url in subcategories:
+        links = tapaz_http.iter_listing_links(subcategory_url, USER_AGENT, base_url)
+        tapaz_http.scrape_products_http(links, parse, USER_AGENT, workers=concurrency, on_record=store.append)
+    stored = store.count()
+    store.close()
+    return stored
+
+
+RUNNERS = {"bina": run_bina, "tapaz": run_tapaz}
+
+
+def configurations(concurrencies: list) -> list:
+    from tapaz_extract import available_parsers
+
+    configs = []
+    engines = ["threads"]
+    if importlib.util.find_spec("aiohttp"):
+        engines.append("async")
+    for concurrency in concurrencies:
+        for engine in engines:
+            configs.append({"name": f"bina-{engine}-c{concurrency}", "kind": "bina", "engine": engine, "concurrency": concurrency})
+        configs.append({"name": f"bina-threads-shards-c{concurrency}", "kind": "bina", "engine": "threads", "shards": True,
+                        "concurrency": concurrency})
+        for parser in available_parsers():
+            configs.append({"name": f"tapaz-http-{parser}-c{concurrency}", "kind": "tapaz", "parser": parser, "concurrency": concurrency})
+    return configs
+
+
+def run_child(config: dict, urls: dict) -> dict:
+    """Runs one configuration in this (child) process, in a scratch directory."""
+    os.environ["NO_PROXY"] = "127.0.0.1,localhost"
+    sys.path.insert(0, REPO_DIR)
+    recorder = LatencyRecorder()
+    with tempfile.TemporaryDirectory() as scratch, open(os.devnull, "w", encoding="utf-8") as log:
+        os.chdir(scratch)
+        started = time.perf_counter()
+        error = None
+        records = 0
+        try:
+            # The scrapers print a line per record; keep that out of the report
+            with contextlib.redirect_stdout(log):
+                records = RUNNERS[config["kind"]](config, urls, recorder)
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+        os.chdir(REPO_DIR)
+    return {
+        "name": config["name"],
+        "records": records,
+        "seconds": round(elapsed, 3),
+        "records_per_s": round(records / elapsed, 1) if elapsed else None,
+        "requests": len(recorder.samples),
+        "requests_per_s": round(len(recorder.samples) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(recorder.samples, 0.50) * 1000, 1) if recorder.samples else None,
+        "p99_ms": round(percentile(recorder.samples, 0.99) * 1000, 1) if recorder.samples else None,
+        "failed_requests": recorder.failures,
+        "peak_rss_mib": round(peak_rss_mib(), 1) if peak_rss_mib() is not None else None,
+        "error": error,
+    }
+
+
+def run_in_subprocess(config: dict, urls: dict, timeout: float) -> dict:
+    payload = json.dumps({"config": config, "urls": urls})
+    try:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", payload],
+                              capture_output=True, text=True, timeout=timeout, cwd=REPO_DIR)
+    except subprocess.TimeoutExpired:
+        return {"name": config["name"], "error": f"timed out after {timeout:.0f}s"}
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"name": config["name"], "error": (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+    return json.loads(lines[-1])
+
+
+def format_value(value, width: int) -> str:
+    return f"{'-' if value is None else value:>{width}}"
+
+
+def print_table(results: list, baseline: dict):
+    columns = [("records", 8), ("seconds", 8), ("records_per_s", 10), ("requests_per_s", 10), ("p50_ms", 8),
+               ("p99_ms", 8), ("failed_requests", 7), ("peak_rss_mib", 9)]
+    headers = ["records", "secs", "rec/s", "req/s", "p50 ms", "p99 ms", "failed", "RSS MiB"]
+    name_width = max([len(result["name"]) for result in results] + [13])
+    print(f"{'configuration':<{name_width}} " + " ".join(f"{h:>{w}}" for h, (_, w) in zip(headers, columns))
+          + ("   vs baseline" if baseline else ""))
+    for result in results:
+        if result.get("error") and not result.get("records"):
+            print(f"{result['name']:<{name_width}} failed: {result['error']}")
+            continue
+        line = f"{result['name']:<{name_width}} " + " ".join(format_value(result.get(key), w) for key, w in columns)
+        before = baseline.get(result["name"], {}).get("records_per_s") if baseline else None
+        if before and result.get("records_per_s"):
+            line += f"   {(result['records_per_s'] / before - 1) * 100:+6.1f}% rec/s"
+        if result.get("error"):
+            line += f"   ({result['error']})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against local stand-in servers.")
+    parser.add_argument("--only", default="*", help="glob over configuration names, e.g. 'bina*' or '*lxml*'")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--bina-items", type=int, default=2000, help="listings served by the bina.az stand-in")
+    parser.add_argument("--tapaz-subcategories", type=int, default=4)
+    parser.add_argument("--tapaz-products", type=int, default=120, help="products per tap.az subcategory")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean server response delay in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.01, help="share of responses delayed 10x")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds before a configuration is abandoned")
+    parser.add_argument("--save", metavar="JSON", help="write the results here")
+    parser.add_argument("--baseline", metavar="JSON", help="compare records/s with results saved by --save")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        payload = json.loads(args.child)
+        print(json.dumps(run_child(payload["config"], payload["urls"])))
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {result["name"]: result for result in json.load(f)["results"]}
+
+    configs = [config for config in configurations(args.concurrency) if fnmatch.fnmatch(config["name"], f"*{args.only}*")]
+    if not configs:
+        print(f"No configuration matches {args.only!r}.")
+        return
+
+    faults = Faults(args.latency, args.slow_rate, args.error_rate, args.throttle_rate, args.seed)
+    bina, tapaz = start_servers(faults, args.bina_items, args.tapaz_subcategories, args.tapaz_products)
+    urls = {"bina": bina.graphql_url, "tapaz": tapaz.url, "tapaz_category": tapaz.category_url}
+    print(f"Stand-ins: {len(bina.listings)} bina.az listings, {len(tapaz.products)} tap.az products; "
+          f"latency {args.latency}s, slow {args.slow_rate:.0%}, 500s {args.error_rate:.0%}, 429s {args.throttle_rate:.0%}\n")
+
+    results = []
+    try:
+        for config in configs:
+            print(f"Running {config['name']}...", flush=True)
+            results.append(run_in_subprocess(config, urls, args.timeout))
+    finally:
+        bina.stop()
+        tapaz.stop()
+
+    print()
+    print_table(results, baseline)
+    if args.save:
+        settings = {key: value for key, value in vars(args).items() if key not in ("child", "save", "baseline")}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
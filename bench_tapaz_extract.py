@@ -0,0 +1,117 @@
+"""Offline benchmark for tap.az product-page extraction.
+
+Runs every available parser (plus the old per-field BeautifulSoup lookup, as
+a baseline) over a directory of saved product pages and reports pages per
+second and peak Python-heap allocation per page (memory allocated inside C
+parsers such as lxml/lexbor is not visible to tracemalloc). No network is used unless --fetch is
+given to save more pages into the fixture directory first.
+
+    python bench_tapaz_extract.py                       # fixtures/tapaz/*.html
+    python bench_tapaz_extract.py --repeat 50 --dir my_pages
+    python bench_tapaz_extract.py --fetch https://tap.az/elanlar/.../41000077
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+from tapaz_extract import available_parsers, extract_product
+
+FIXTURE_DIR = os.path.join("fixtures", "tapaz")
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0'
+
+
+def legacy_extract(html, url):
+    """The extraction the scrapers used before tapaz_extract: html.parser plus one select() per field."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def get_text(element): return element.text.strip() if element else None
+    def get_property_value(label_text):
+        for prop in soup.select('.product-properties__i'):
+            label = prop.select_one('.product-properties__i-name')
+            if label and label_text in label.text:
+                value_el = prop.select_one('.product-properties__i-value')
+                return get_text(value_el.find('a')) if value_el and value_el.find('a') else get_text(value_el)
+        return None
+
+    price_val = get_text(soup.select_one('.price-val'))
+    description_el = soup.select_one('.product-description__content')
+    return {'Type of Product': "Tikinti Texnikası", 'elan_id': url.split('/')[-1].split('?')[0], 'title': get_text(soup.select_one('h1.product-title')), 'price': int(''.join(filter(str.isdigit, price_val))) if price_val else None, 'city': get_property_value('Şəhər'), 'category': get_property_value('Malın növü'), 'Year': get_property_value('Buraxılış ili'), 'New?': get_property_value('Yeni?'), 'Yurusu_km': get_property_value('Yürüşü, km'), 'Description': ' '.join(description_el.stripped_strings) if description_el else None, 'URL': url}
+
+
+def load_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            # Fixture names are product_<elan_id>.html; the URL only feeds elan_id/URL columns
+            elan_id = os.path.splitext(os.path.basename(path))[0].split("_")[-1]
+            pages.append((f"https://tap.az/elanlar/fixture/{elan_id}", f.read()))
+    return pages
+
+
+def fetch_pages(urls, directory):
+    from tapaz_http import fetch_html, make_session
+    os.makedirs(directory, exist_ok=True)
+    session = make_session(USER_AGENT)
+    for url in urls:
+        elan_id = url.rstrip("/").split("/")[-1].split("?")[0]
+        path = os.path.join(directory, f"product_{elan_id}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(fetch_html(session, url))
+        print(f"Saved {url} -> {path}")
+
+
+def bench(name, extract, pages, repeat):
+    # Timing pass without tracemalloc, which slows allocation-heavy code a lot
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for url, html in pages:
+            extract(html, url)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for url, html in pages:
+        extract(html, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = repeat * len(pages)
+    print(f"{name:<12} {n / elapsed:>10.1f} pages/s {elapsed / n * 1000:>9.2f} ms/page {peak / 1024:>10.1f} KiB peak (one pass)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tap.az product-page extraction on saved HTML.")
+    parser.add_argument("--dir", default=FIXTURE_DIR, help="directory of saved product pages (*.html)")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the corpus for the timing run")
+    parser.add_argument("--fetch", nargs="+", metavar="URL", help="download these product pages into --dir first")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_pages(args.fetch, args.dir)
+
+    pages = load_pages(args.dir)
+    if not pages:
+        print(f"No *.html pages found in {args.dir}")
+        return
+    print(f"{len(pages)} pages x {args.repeat} passes from {args.dir}\n")
+
+    candidates = [("legacy", legacy_extract)]
+    candidates += [(name, lambda html, url, name=name: extract_product(html, url, parser=name)) for name in available_parsers()]
+    reference, reference_name = None, None
+    for name, extract in candidates:
+        try:
+            records = [extract(html, url) for url, html in pages]
+        except ImportError as e:
+            print(f"{name:<12} skipped ({e})")
+            continue
+        if reference is None:
+            reference, reference_name = records, name
+        elif records != reference:
+            print(f"{name:<12} !!! output differs from {reference_name}")
+        bench(name, extract, pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
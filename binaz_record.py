@@ -0,0 +1,127 @@
+"""Fixed-schema listing record and fast JSON decoding for the bina.az scraper.
+
+A ``ListingRecord`` holds one output row: the list-page fields filled by
+``parse_listing`` and the detail fields filled by ``parse_detail_fields``.
+It uses ``__slots__``, so a record is a fixed array of references instead of a
+per-listing dict, and ``row()`` hands the values to the CSV writer in column
+order without building a dict first.
+
+``loads`` decodes response bodies with orjson or msgspec when one of them is
+installed (both are several times faster than the stdlib on large GraphQL
+responses) and falls back to ``json.loads``. Decoding errors are always
+ValueErrors, so the retry logic treats them alike.
+"""
+import json
+import sys
+from operator import attrgetter
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON decoding
+    orjson = None
+try:
+    import msgspec
+except ImportError:  # optional, faster JSON decoding
+    msgspec = None
+
+# (attribute, output column). Order is the CSV column order.
+LISTING_COLUMNS = (
+    ("id", "id"), ("url", "url"), ("price", "price"), ("currency", "currency"), ("rooms", "rooms"),
+    ("area", "area"), ("area_units", "area_units"), ("location", "location"), ("city", "city"),
+    ("updated_at", "updated_at"), ("photos_count", "photos_count"), ("leased", "leased"),
+)
+DETAIL_COLUMNS = (
+    ("description", "description"), ("address", "address"), ("latitude", "latitude"),
+    ("longitude", "longitude"), ("contact_name", "contact_name"), ("phones", "phones"),
+    ("category", "category"), ("has_deed", "Çıxarış"), ("has_repair", "Təmir"), ("floor", "Mərtəbə"),
+)
+LISTING_FIELDS = [column for _, column in LISTING_COLUMNS]
+DETAIL_FIELDS = [column for _, column in DETAIL_COLUMNS]
+FIELDNAMES = LISTING_FIELDS + DETAIL_FIELDS
+
+_ATTRIBUTES = tuple(attribute for attribute, _ in LISTING_COLUMNS + DETAIL_COLUMNS)
+_row = attrgetter(*_ATTRIBUTES)
+
+
+def shared(text):
+    """One shared copy of a repeated string (city, currency, units...) instead of one per listing."""
+    return sys.intern(text) if isinstance(text, str) else text
+
+
+class ListingRecord:
+    """One listing; fields that haven't been parsed yet are None."""
+
+    __slots__ = _ATTRIBUTES
+
+    # Keyword order is FIELDNAMES order, so positional values work too
+    def __init__(self, id=None, url=None, price=None, currency=None, rooms=None, area=None, area_units=None,
+                 location=None, city=None, updated_at=None, photos_count=None, leased=None, description=None, address=None,
+                 latitude=None, longitude=None, contact_name=None, phones=None, category=None, has_deed=None,
+                 has_repair=None, floor=None):
+        self.id = id
+        self.url = url
+        self.price = price
+        self.currency = currency
+        self.rooms = rooms
+        self.area = area
+        self.area_units = area_units
+        self.location = location
+        self.city = city
+        self.updated_at = updated_at
+        self.photos_count = photos_count
+        self.leased = leased
+        self.description = description
+        self.address = address
+        self.latitude = latitude
+        self.longitude = longitude
+        self.contact_name = contact_name
+        self.phones = phones
+        self.category = category
+        self.has_deed = has_deed
+        self.has_repair = has_repair
+        self.floor = floor
+
+    def row(self) -> tuple:
+        """All values in FIELDNAMES order."""
+        return _row(self)
+
+    def as_dict(self) -> dict:
+        """Column name -> value, for the listings store and the frontier's JSON payloads."""
+        return dict(zip(FIELDNAMES, _row(self)))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ListingRecord":
+        return cls(*(data.get(column) for column in FIELDNAMES))
+
+    def copy_detail(self, previous: dict):
+        """Takes the detail columns from a previous run's CSV row or stored record (empty cells become None)."""
+        for attribute, column in DETAIL_COLUMNS:
+            value = previous[column]
+            setattr(self, attribute, value if value != "" else None)
+
+    def __repr__(self):
+        return f"ListingRecord(id={self.id!r}, url={self.url!r})"
+
+
+JSON_BACKEND = "orjson" if orjson else "msgspec" if msgspec else "json"
+
+
+def decoder(backend: str = None):
+    """A ``loads(body)`` function for ``backend`` ("orjson", "msgspec", "json"); default: JSON_BACKEND."""
+    backend = backend or JSON_BACKEND
+    if backend == "orjson":
+        # orjson.JSONDecodeError is a ValueError already
+        return orjson.loads
+    if backend == "msgspec":
+        msgspec_decoder = msgspec.json.Decoder()
+
+        def loads(body):
+            try:
+                return msgspec_decoder.decode(body)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e)) from e
+        return loads
+    return json.loads
+
+
+loads = decoder()
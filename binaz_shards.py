@@ -0,0 +1,115 @@
+"""Shard planner for the bina.az search API.
+
+The list endpoint stops paginating after PAGE_CAP pages, so a single query
+never sees more than ~1,100 listings. ``plan_shards`` uses the cheap
+SearchTotalCount query to split the search into filter combinations that each
+fit under that cap. Categorical dimensions are tried first (sale/rent, city,
+category, rooms); a split is only kept if the children's counts add up to the
+parent's, so a filter that silently drops listings (e.g. rooms for land plots,
+or a city ID missing from the range below) is never used. Whatever is still
+too big is bisected on price.
+
+Rooms come after category on purpose: within a flat category every listing has
+a room count, so the rooms split that fails on a mixed search covers there.
+
+Trying a dimension costs one count per value (about a hundred for cities), so
+with ``workers`` > 1 those counts run side by side; ``count_fn`` is then called
+from several threads at once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+# The site's city and category IDs are small integers; every ID up to these is asked for,
+# and the ones without listings are dropped. If the site adds IDs past them, the coverage
+# check turns the dimension down instead of losing listings.
+CITY_ID_MAX = 100
+CATEGORY_ID_MAX = 20
+
+# Filter keys follow the site's ItemFilter input. A dimension is a filter key plus
+# the values that, together, should cover every listing under the parent filter.
+SPLIT_DIMENSIONS = [
+    ("leased", [False, True]),
+    ("cityId", [str(i) for i in range(1, CITY_ID_MAX + 1)]),
+    ("categoryId", [str(i) for i in range(1, CATEGORY_ID_MAX + 1)]),
+    ("roomIds", [["1"], ["2"], ["3"], ["4"], ["5+"]]),
+]
+PRICE_FROM_KEY = "priceFrom"
+PRICE_TO_KEY = "priceTo"
+# First split point for the open-ended top price band (AZN)
+PRICE_SPLIT_START = 100_000
+
+
+def _price_children(filter_params: dict) -> list:
+    lo = filter_params.get(PRICE_FROM_KEY, 0)
+    hi = filter_params.get(PRICE_TO_KEY)
+    if hi is None:
+        mid = max(lo * 4, PRICE_SPLIT_START)
+    elif hi - lo < 1:
+        return []
+    else:
+        mid = (lo + hi) // 2
+    low_band = dict(filter_params, **{PRICE_FROM_KEY: lo, PRICE_TO_KEY: mid})
+    high_band = dict(filter_params, **{PRICE_FROM_KEY: mid + 1})
+    if hi is None:
+        high_band.pop(PRICE_TO_KEY, None)
+    else:
+        high_band[PRICE_TO_KEY] = hi
+    return [low_band, high_band]
+
+
+def plan_shards(count_fn, base_filter: dict = None, max_items: int = 1128, dimensions: list = None,
+                workers: int = 1) -> list:
+    """Returns ``[{"filter": ..., "count": ...}]`` shards covering ``base_filter``.
+
+    ``count_fn(filter_params) -> int`` is normally ``get_total_count``.
+    Shards that cannot be split any further are returned as they are, with
+    ``"truncated": True``, and will lose whatever lies past the page cap.
+    A price split whose bands add up to less than their parent is kept (price
+    is the last resort) but reported, as are the listings it loses.
+    """
+    dimensions = SPLIT_DIMENSIONS if dimensions is None else dimensions
+    base_filter = base_filter or {}
+    shards = []
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-count") if workers > 1 else None
+
+    def count_all(children: list) -> list:
+        return list(pool.map(count_fn, children)) if pool else [count_fn(child) for child in children]
+
+    def split(filter_params: dict, count: int, dims: list):
+        if count == 0:
+            return
+        if count <= max_items:
+            shards.append({"filter": filter_params, "count": count})
+            return
+
+        while dims:
+            key, values = dims[0]
+            dims = dims[1:]
+            if key in filter_params:
+                continue
+            children = [dict(filter_params, **{key: value}) for value in values]
+            counts = count_all(children)
+            if sum(counts) < count:
+                print(f"  - '{key}' covers only {sum(counts)}/{count} listings here; not splitting on it.")
+                continue
+            for child, child_count in zip(children, counts):
+                split(child, child_count, dims)
+            return
+
+        children = _price_children(filter_params)
+        if not children:
+            print(f"  - Shard {filter_params} still has {count} listings and cannot be split further.")
+            shards.append({"filter": filter_params, "count": count, "truncated": True})
+            return
+        counts = count_all(children)
+        if sum(counts) < count:
+            print(f"  - Price bands of {filter_params} cover only {sum(counts)}/{count} listings; "
+                  f"{count - sum(counts)} without a matching price will be missed.")
+        for child, child_count in zip(children, counts):
+            split(child, child_count, [])
+
+    try:
+        split(base_filter, count_fn(base_filter), list(dimensions))
+    finally:
+        if pool:
+            pool.shutdown()
+    return shards
@@ -0,0 +1,207 @@
+"""Persistent crawl frontier that hands work to several workers under time-limited leases.
+
+A task is ``(kind, key, payload)``, e.g. ``("page", "0:48", {"shard": 0, "offset": 48})``
+or ``("item", "4757585", {...listing fields...})``. Keys are unique per kind, so
+adding a task that is already known (an item seen on two pages or two shards)
+is a no-op and every result is produced once. ``lease`` hands pending tasks to
+one owner until ``ttl`` seconds pass; a worker that dies simply lets its leases
+expire, after which the tasks are handed out again. A task that takes longer
+than one lease is kept alive with ``renew`` (``keep_leased`` does it from a
+background thread). Tasks that fail ``max_attempts`` times, or whose
+``max_attempts``-th lease expires (a task that kills or hangs every worker
+that takes it), are parked as "failed" instead of looping forever.
+
+``Frontier`` is the interface the scrapers use; ``SqliteFrontier`` implements it
+on one SQLite file, which is enough for any number of worker processes on one
+machine. Several machines need a shared server behind the same interface
+(e.g. Postgres with ``SELECT ... FOR UPDATE SKIP LOCKED``); SQLite must not be
+shared over a network filesystem.
+"""
+import abc
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+Task = namedtuple("Task", "kind key payload attempts")
+
+
+class Frontier(abc.ABC):
+    """Interface of a leased work frontier. All methods must be safe across threads and processes."""
+
+    @abc.abstractmethod
+    def add(self, kind: str, tasks: list) -> int:
+        """Queues ``(key, payload)`` pairs that aren't known yet; returns how many were new."""
+
+    @abc.abstractmethod
+    def lease(self, kind: str, owner: str, n: int = 1, ttl: float = LEASE_SECONDS) -> list:
+        """Leases up to ``n`` pending tasks of ``kind`` (expired leases count as pending)."""
+
+    @abc.abstractmethod
+    def renew(self, task: Task, owner: str, ttl: float = LEASE_SECONDS) -> bool:
+        """Extends a lease to ``ttl`` seconds from now; False if it had expired and someone else owns it now."""
+
+    @abc.abstractmethod
+    def complete(self, task: Task, owner: str) -> bool:
+        """Marks a leased task done; False if the lease had expired and someone else owns it now."""
+
+    @abc.abstractmethod
+    def fail(self, task: Task, owner: str, error: str = None):
+        """Gives a leased task back for another attempt, or parks it once it has used up its attempts."""
+
+    @abc.abstractmethod
+    def counts(self, kind: str = None) -> dict:
+        """Number of tasks per state ("pending", "leased", "done", "failed")."""
+
+    def unfinished(self, kind: str = None) -> int:
+        counts = self.counts(kind)
+        return counts.get("pending", 0) + counts.get("leased", 0)
+
+    @abc.abstractmethod
+    def get_meta(self, name: str, default=None):
+        """The JSON value stored under ``name``, or ``default``."""
+
+    @abc.abstractmethod
+    def set_meta(self, name: str, value, only_if_absent: bool = False) -> bool:
+        """Stores a JSON value; with ``only_if_absent``, returns False (and changes nothing) if it exists."""
+
+    def close(self):
+        pass
+
+
+@contextlib.contextmanager
+def keep_leased(frontier: Frontier, task: Task, owner: str, ttl: float = LEASE_SECONDS):
+    """Renews ``task``'s lease every ``ttl / 3`` seconds while the block runs, so a long task isn't handed out
+    again; if the process dies, the renewals stop and the lease expires as usual."""
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(ttl / 3):
+            if not frontier.renew(task, owner, ttl):
+                print(f"Lost the lease on {task.kind} {task.key}; another worker may redo it.")
+                return
+
+    thread = threading.Thread(target=renew, name=f"lease-{task.kind}-{task.key}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (kind, state, lease_expires);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class SqliteFrontier(Frontier):
+    def __init__(self, path: str, max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # isolation_level=None: transactions are explicit (BEGIN IMMEDIATE takes the write lock up front)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _write(self, fn):
+        """Runs ``fn(conn)`` in one write transaction and returns its result."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def add(self, kind: str, tasks: list) -> int:
+        rows = [(kind, str(key), json.dumps(payload, ensure_ascii=False)) for key, payload in tasks]
+        if not rows:
+            return 0
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO tasks (kind, key, payload) VALUES (?, ?, ?)", rows)
+            return conn.total_changes - before
+        return self._write(insert)
+
+    def lease(self, kind: str, owner: str, n: int = 1, ttl: float = LEASE_SECONDS) -> list:
+        def take(conn):
+            now = time.time()
+            conn.execute("UPDATE tasks SET state = 'failed', lease_expires = NULL, error = 'lease expired' "
+                         "WHERE kind = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                         (kind, now, self.max_attempts))
+            rows = conn.execute(
+                "SELECT key, payload, attempts FROM tasks WHERE kind = ? AND "
+                "(state = 'pending' OR (state = 'leased' AND lease_expires < ?)) ORDER BY rowid LIMIT ?",
+                (kind, now, n)).fetchall()
+            conn.executemany("UPDATE tasks SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                             "WHERE kind = ? AND key = ?", [(owner, now + ttl, kind, key) for key, _, _ in rows])
+            return [Task(kind, key, json.loads(payload), attempts + 1) for key, payload, attempts in rows]
+        return self._write(take)
+
+    def renew(self, task: Task, owner: str, ttl: float = LEASE_SECONDS) -> bool:
+        cursor = self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET lease_expires = ? WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+            (time.time() + ttl, task.kind, task.key, owner)))
+        return cursor.rowcount == 1
+
+    def complete(self, task: Task, owner: str) -> bool:
+        def finish(conn):
+            cursor = conn.execute("UPDATE tasks SET state = 'done', lease_expires = NULL, error = NULL "
+                                  "WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+                                  (task.kind, task.key, owner))
+            return cursor.rowcount == 1
+        return self._write(finish)
+
+    def fail(self, task: Task, owner: str, error: str = None):
+        state = "failed" if task.attempts >= self.max_attempts else "pending"
+        self._write(lambda conn: conn.execute(
+            "UPDATE tasks SET state = ?, lease_expires = NULL, error = ? "
+            "WHERE kind = ? AND key = ? AND owner = ? AND state = 'leased'",
+            (state, error, task.kind, task.key, owner)))
+
+    def counts(self, kind: str = None) -> dict:
+        now = time.time()
+        query = ("SELECT CASE WHEN state = 'leased' AND lease_expires < ? THEN "
+                 "CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END ELSE state END, COUNT(*) "
+                 "FROM tasks" + (" WHERE kind = ?" if kind else "") + " GROUP BY 1")
+        params = (now, self.max_attempts) + ((kind,) if kind else ())
+        with self._lock:
+            return dict(self._conn.execute(query, params).fetchall())
+
+    def get_meta(self, name: str, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, name: str, value, only_if_absent: bool = False) -> bool:
+        verb = "INSERT OR IGNORE" if only_if_absent else "INSERT OR REPLACE"
+        cursor = self._write(lambda conn: conn.execute(f"{verb} INTO meta (name, value) VALUES (?, ?)",
+                                                       (name, json.dumps(value))))
+        return cursor.rowcount == 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
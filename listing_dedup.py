@@ -0,0 +1,481 @@
+"""Near-duplicate bina.az listings: the same property reposted under new IDs or by other agents.
+
+Each description is lower-cased, reduced to its letters and digits and cut
+into overlapping SHINGLE_CHARS-character shingles, and a SIGNATURE_SIZE-value
+MinHash signature is computed for it, with one-permutation hashing: every
+shingle is hashed once, the top bits of the hash pick one of the signature's
+bins and each bin keeps its smallest value (empty bins borrow from the next
+full one). That is one hash per shingle instead of one per shingle and
+signature value, and it runs over many listings at a time in numpy.
+
+The signature is split into BANDS bands; a listing goes into one LSH bucket
+per band, keyed by the band's hash *and* the listing's coordinate cell
+(CELL_DEGREES). New listings are only compared with the listings sharing a
+band bucket in the 2x2 block of cells nearest to them, so a stock phrase used
+all over the city never builds a giant bucket. A candidate counts as a
+duplicate when the signatures agree on at least THRESHOLD of their values
+(the estimated Jaccard similarity), the two points are within MAX_DISTANCE_KM,
+the prices differ by at most PRICE_TOLERANCE and the room counts and areas
+match (AREA_TOLERANCE): developers post every flat of a complex with the
+same description, and those are different properties. Duplicates are merged
+into clusters (union-find).
+
+Price is checked on the candidates instead of being part of the bucket key:
+reposts are often re-priced, and probing the neighbouring price buckets too
+would double the lookups per listing.
+
+The index is incremental: ``add`` only hashes the listings it hasn't seen and
+the ones whose description (by checksum), coordinates, price, area or rooms
+changed, and ``save``/``load`` keep it in one .npz file between runs. An edited
+listing's old bucket keys are dropped and the clusters it belonged to are
+linked again from scratch, so an edit can split a cluster as well as join one.
+A cluster's id is the id of its earliest indexed listing, so ids stay put as
+clusters grow.
+
+    index = DedupIndex.load("bina_dedup.npz")      # an empty index the first time
+    index.add(csv.DictReader(f))
+    index.save("bina_dedup.npz")
+    index.cluster_of("4757585")
+
+    python listing_dedup.py bina_listings_20250724.csv --output bina_clusters.csv
+
+The bina.az scraper runs ``update_store`` after every crawl: the run's
+listings are added to the index and every listing's cluster is written to the
+listings store (``ListingStore.cluster_of``).
+"""
+import argparse
+import csv
+import os
+import zlib
+from collections import Counter
+
+import numpy as np
+
+# A power of two: the top bits of a shingle's hash pick its bin
+SIGNATURE_SIZE = 128
+BANDS = 32
+SHINGLE_CHARS = 5
+# Fixed, so signatures from earlier runs stay comparable; stored in the index file and checked on load
+SEED = 20250724
+THRESHOLD = 0.8
+MAX_DISTANCE_KM = 0.5
+PRICE_TOLERANCE = 0.10
+AREA_TOLERANCE = 0.03
+# At least 2 * MAX_DISTANCE_KM in both directions, so the 2x2 block of cells nearest to a listing
+# covers everything within MAX_DISTANCE_KM (0.012 deg is ~1.3 km north-south, ~1.0 km east-west in Baku)
+CELL_DEGREES = 0.012
+# Listings hashed per numpy pass; bounds the size of the temporary shingle arrays
+CHUNK_LISTINGS = 10000
+INDEX_FILE = "bina_dedup.npz"
+
+ROWS = SIGNATURE_SIZE // BANDS
+_BIN_SHIFT = np.uint64(64 - (SIGNATURE_SIZE.bit_length() - 1))
+_EMPTY = np.uint32(0xFFFFFFFF)
+_rng = np.random.default_rng(SEED)
+_SALT = _rng.integers(0, 2 ** 63, dtype=np.uint64)
+# One set of multipliers per band, so equal values in different bands hash to different buckets
+_BAND_MIX = _rng.integers(1, 2 ** 63, (BANDS, ROWS), dtype=np.uint64) | np.uint64(1)
+_CELL_MIX = _rng.integers(1, 2 ** 63, dtype=np.uint64) | np.uint64(1)
+_NO_CELL = _rng.integers(1, 2 ** 63, dtype=np.uint64)
+# Added per step to a value borrowed by an empty bin, so it differs from the bin it came from
+_DENSIFY_STEP = np.uint32(0x9E3779B1)
+_SHINGLE_MULT = np.uint64(1099511628211)
+# Description checksum of listings indexed before checksums were kept (CRC32 never reaches it)
+_UNKNOWN_TEXT = np.uint64(1 << 32)
+_NUMBER_FIELDS = (("_lat", "latitude"), ("_lon", "longitude"), ("_price", "price"), ("_area", "area"), ("_rooms", "rooms"))
+# Which of the first 65536 code points are letters or digits; everything else (spaces, punctuation,
+# emoji) is dropped before shingling
+_WORD_CHARS = np.array([chr(c).isalnum() for c in range(0x10000)], dtype=bool)
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64's finaliser: spreads the rolling hash over all 64 bits."""
+    x = x ^ _SALT
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def _densify(sigs: np.ndarray, has_text: np.ndarray):
+    """Fills the empty bins of short texts from the next full bin to the right (wrapping around)."""
+    empty = (sigs == _EMPTY) & has_text[:, None]
+    rows = np.flatnonzero(empty.any(axis=1))
+    if len(rows) == 0:
+        return
+    empty, sub = empty[rows], sigs[rows]
+    bins = np.arange(SIGNATURE_SIZE)
+    never = 3 * SIGNATURE_SIZE
+    full_at = np.concatenate([np.where(empty, never, bins), np.where(empty, never, bins + SIGNATURE_SIZE)], axis=1)
+    source = np.minimum.accumulate(full_at[:, ::-1], axis=1)[:, ::-1][:, :SIGNATURE_SIZE]
+    borrowed = sub[np.arange(len(rows))[:, None], source % SIGNATURE_SIZE] + (source - bins).astype(np.uint32) * _DENSIFY_STEP
+    sigs[rows] = np.where(empty, borrowed, sub)
+
+
+def signatures(texts: list) -> tuple:
+    """MinHash signatures ``(len(texts), SIGNATURE_SIZE)`` uint32, and which texts had anything to hash.
+
+    Texts are lower-cased and reduced to their letters and digits, so spacing
+    and punctuation changes don't matter; a text shorter than SHINGLE_CHARS is
+    one shingle.
+    """
+    texts = [(text or "").lower() for text in texts]
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    sigs = np.full((len(texts), SIGNATURE_SIZE), _EMPTY, dtype=np.uint32)
+    has_text = np.zeros(len(texts), dtype=bool)
+    flat = sigs.reshape(-1)
+    for start in range(0, len(texts), CHUNK_LISTINGS):
+        end = min(start + CHUNK_LISTINGS, len(texts))
+        codes = np.frombuffer("".join(texts[start:end]).encode("utf-32-le"), dtype=np.uint32)
+        owner = np.repeat(np.arange(end - start), lengths[start:end])
+        word = _WORD_CHARS[np.minimum(codes, 0xFFFF)] & (codes < 0xFFFF)
+        codes, owner = codes[word].astype(np.uint64), owner[word]
+        kept = np.bincount(owner, minlength=end - start)
+        has_text[start:end] = kept > 0
+        # Rolling hash of each position's next SHINGLE_CHARS characters, in place; the ones that
+        # run past the end of their text are dropped below
+        hashes = codes.copy()
+        for j in range(1, SHINGLE_CHARS):
+            hashes[:len(codes) - j] *= _SHINGLE_MULT
+            hashes[:len(codes) - j] += codes[j:]
+        first = np.cumsum(kept) - kept
+        shingle = kept[owner] - (np.arange(len(codes)) - first[owner]) >= SHINGLE_CHARS
+        hashes, owner = hashes[shingle], owner[shingle]
+        short = np.flatnonzero((kept > 0) & (kept < SHINGLE_CHARS))
+        if len(short):
+            # Too short for a whole shingle: the text itself is the one shingle
+            whole = np.zeros(len(short), dtype=np.uint64)
+            for j in range(SHINGLE_CHARS):
+                within = kept[short] > j
+                whole[within] = whole[within] * _SHINGLE_MULT + codes[first[short[within]] + j]
+            hashes, owner = np.concatenate([hashes, whole]), np.concatenate([owner, short])
+        hashes = _mix(hashes)
+        slots = (owner + start) * SIGNATURE_SIZE + (hashes >> _BIN_SHIFT).astype(np.int64)
+        np.minimum.at(flat, slots, (hashes & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+    _densify(sigs, has_text)
+    return sigs, has_text
+
+
+def band_hashes(sigs: np.ndarray) -> np.ndarray:
+    """One uint64 per band: ``(len(sigs), BANDS)``."""
+    return (sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64) * _BAND_MIX).sum(axis=2)
+
+
+def cell_codes(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """``(n, 4)`` uint64 codes of each point's 2x2 block of nearest cells; its own cell comes first.
+
+    Points without coordinates get _NO_CELL four times.
+    """
+    x, y = lon / CELL_DEGREES, lat / CELL_DEGREES
+    known = ~(np.isnan(x) | np.isnan(y))
+    x, y = np.where(known, x, 0), np.where(known, y, 0)
+    cx, cy = np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+    # The neighbour on the side of the cell the point is closer to
+    sx, sy = np.where(x - cx < 0.5, -1, 1), np.where(y - cy < 0.5, -1, 1)
+    xs = np.stack([cx, cx + sx, cx, cx + sx], axis=1)
+    ys = np.stack([cy, cy, cy + sy, cy + sy], axis=1)
+    codes = (((xs & 0xFFFFFFFF) << 32) | (ys & 0xFFFFFFFF)).astype(np.uint64) * _CELL_MIX
+    codes[~known] = _NO_CELL
+    return codes
+
+
+def bucket_keys(sigs: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """``(n, 4, BANDS)`` bucket keys: every band hash combined with each of the 4 cells (the own cell first)."""
+    return band_hashes(sigs)[:, None, :] ^ cell_codes(lat, lon)[:, :, None]
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _checksum(text) -> int:
+    return zlib.crc32((text or "").encode("utf-8"))
+
+
+def _sharing(probe_keys: np.ndarray, probe_rows: np.ndarray, keys: np.ndarray, key_rows: np.ndarray) -> tuple:
+    """Every ``(probe row, row)`` pair whose keys are equal.
+
+    Both key arrays must be sorted: sorted probes make the binary searches walk ``keys`` in order.
+    """
+    lo = np.searchsorted(keys, probe_keys)
+    hit = lo < len(keys)
+    hit[hit] = keys[lo[hit]] == probe_keys[hit]
+    lo, probe_keys, probe_rows = lo[hit], probe_keys[hit], probe_rows[hit]
+    counts = np.searchsorted(keys, probe_keys, "right") - lo
+    # For each probe, the positions lo, lo+1, ..., lo+count-1 of its equal keys
+    positions = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+    return np.repeat(probe_rows, counts), key_rows[positions]
+
+
+class DedupIndex:
+    """Incremental MinHash/LSH index over listing records (dicts with id, description, latitude, longitude, price, area, rooms).
+
+    The buckets are one sorted array of keys (a listing's band hashes in its
+    own cell) with the row of each key; a batch is matched against them with
+    binary searches and merged in afterwards. Add records a crawl at a time,
+    not one by one: each ``add`` call rewrites the key arrays.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self._row = {}
+        self._parent = []
+        self._size = 0
+        self._sigs = np.empty((0, SIGNATURE_SIZE), dtype=np.uint32)
+        self._has_text = np.empty(0, dtype=bool)
+        self._text_sum = np.empty(0, dtype=np.uint64)
+        self._lat = np.empty(0)
+        self._lon = np.empty(0)
+        self._price = np.empty(0)
+        self._area = np.empty(0)
+        self._rooms = np.empty(0)
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._key_rows = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, n: int):
+        needed = self._size + n
+        if needed <= len(self._lat):
+            return
+        capacity = max(needed, 2 * len(self._lat), 1024)
+        for name in ("_sigs", "_has_text", "_text_sum", "_lat", "_lon", "_price", "_area", "_rooms"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _find(self, row: int) -> int:
+        parent = self._parent
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    def _union(self, a: int, b: int):
+        a, b = self._find(a), self._find(b)
+        if a != b:
+            # The earlier listing stays the root, so its id remains the cluster id
+            self._parent[max(a, b)] = min(a, b)
+
+    def _duplicates(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Which of the candidate pairs ``(a[i], b[i])`` are the same property."""
+        similar = np.empty(len(a), dtype=bool)
+        # In slices, to bound the (pairs x SIGNATURE_SIZE) comparison
+        for start in range(0, len(a), 65536):
+            end = start + 65536
+            similar[start:end] = (self._sigs[a[start:end]] == self._sigs[b[start:end]]).mean(axis=1) >= THRESHOLD
+        for values, tolerance in ((self._price, PRICE_TOLERANCE), (self._area, AREA_TOLERANCE), (self._rooms, 0)):
+            x, y = values[a], values[b]
+            # A missing value doesn't rule a pair out
+            similar &= np.isnan(x) | np.isnan(y) | (np.abs(x - y) <= tolerance * np.fmax(x, y))
+        dy = (self._lat[a] - self._lat[b]) * 110.57
+        dx = (self._lon[a] - self._lon[b]) * 111.32 * np.cos(np.radians(self._lat[a]))
+        distance = np.hypot(dx, dy)
+        similar &= np.isnan(distance) | (distance <= MAX_DISTANCE_KM)
+        return similar
+
+    def _merge_keys(self, keys: np.ndarray, rows: np.ndarray):
+        """Merges sorted ``keys`` (with their ``rows``) into the sorted key arrays."""
+        at = np.searchsorted(self._keys, keys) + np.arange(len(keys))
+        merged_keys = np.empty(len(self._keys) + len(keys), dtype=np.uint64)
+        merged_rows = np.empty(len(merged_keys), dtype=np.int64)
+        old = np.ones(len(merged_keys), dtype=bool)
+        old[at] = False
+        merged_keys[at], merged_rows[at] = keys, rows
+        merged_keys[old], merged_rows[old] = self._keys, self._key_rows
+        self._keys, self._key_rows = merged_keys, merged_rows
+
+    def _edited(self, row: int, record: dict) -> bool:
+        """Whether ``record`` may differ from what row ``row`` was indexed with."""
+        if self._text_sum[row] != _checksum(record.get("description")):
+            return True
+        for name, field in _NUMBER_FIELDS:
+            old, value = getattr(self, name)[row], _number(record.get(field))
+            if old != value and not (np.isnan(old) and np.isnan(value)):
+                return True
+        return False
+
+    def _update(self, records: list) -> np.ndarray:
+        """Re-indexes the edited ``records`` in place; returns the rows whose signature or numbers changed.
+
+        Their keys leave the key arrays; the caller links them again.
+        """
+        rows = np.array([self._row[str(record["id"])] for record in records], dtype=np.int64)
+        if not len(rows):
+            return rows
+        sigs, has_text = signatures([record.get("description") for record in records])
+        # A new checksum with the same signature (punctuation, case) is just remembered
+        self._text_sum[rows] = [_checksum(record.get("description")) for record in records]
+        changed = (sigs != self._sigs[rows]).any(axis=1) | (has_text != self._has_text[rows])
+        for name, field in _NUMBER_FIELDS:
+            values = np.array([_number(record.get(field)) for record in records])
+            old = getattr(self, name)[rows]
+            changed |= ~((values == old) | (np.isnan(values) & np.isnan(old)))
+            getattr(self, name)[rows] = values
+        self._sigs[rows], self._has_text[rows] = sigs, has_text
+        rows = rows[changed]
+        kept = ~np.isin(self._key_rows, rows)
+        self._keys, self._key_rows = self._keys[kept], self._key_rows[kept]
+        return rows
+
+    def _split(self, rows: np.ndarray) -> np.ndarray:
+        """Takes apart the clusters of ``rows``; returns all their members, each now a cluster of its own."""
+        roots = np.array([self._find(row) for row in range(self._size)], dtype=np.int64)
+        members = np.flatnonzero(np.isin(roots, roots[rows]))
+        for row in members.tolist():
+            self._parent[row] = row
+        return members
+
+    def add(self, records) -> int:
+        """Indexes the records whose id isn't indexed yet or whose data changed, and links them to their duplicates.
+
+        Returns how many were new or changed.
+        """
+        new, edited, seen = [], [], set()
+        for record in records:
+            listing_id = str(record["id"])
+            if listing_id in seen:
+                continue
+            seen.add(listing_id)
+            if listing_id not in self._row:
+                new.append(record)
+            elif self._edited(self._row[listing_id], record):
+                edited.append(record)
+        changed = self._update(edited)
+        if not new and not len(changed):
+            return 0
+        first = self._size
+        self._reserve(len(new))
+        rows = slice(first, first + len(new))
+        self._sigs[rows], self._has_text[rows] = signatures([record.get("description") for record in new])
+        self._text_sum[rows] = [_checksum(record.get("description")) for record in new]
+        for name, field in _NUMBER_FIELDS:
+            getattr(self, name)[rows] = [_number(record.get(field)) for record in new]
+        self._size += len(new)
+        for row, record in enumerate(new, first):
+            self.ids.append(str(record["id"]))
+            self._row[self.ids[-1]] = row
+            self._parent.append(row)
+
+        # Every pair an edited listing was part of is decided again, so its old clusters are linked anew;
+        # the batch is the rows whose own keys aren't in the key arrays (edited and new)
+        new_rows = np.arange(first, self._size)
+        batch = np.concatenate([changed, new_rows])
+        probed = np.concatenate([self._split(changed), new_rows]) if len(changed) else new_rows
+        # Listings without a description have nothing to compare and stay clusters of their own
+        probed = probed[self._has_text[probed]]
+        keys = bucket_keys(self._sigs[probed], self._lat[probed], self._lon[probed])
+        probe_keys = keys.reshape(-1)
+        order = np.argsort(probe_keys)
+        probe_keys, probe_rows = probe_keys[order], np.repeat(probed, 4 * BANDS)[order]
+        in_batch = np.isin(probed, batch)
+        own_keys = keys[in_batch, 0, :].reshape(-1)
+        order = np.argsort(own_keys, kind="stable")
+        own_keys, own_rows = own_keys[order], np.repeat(probed[in_batch], BANDS)[order]
+
+        # Candidates among the indexed listings and within this batch
+        a1, b1 = _sharing(probe_keys, probe_rows, self._keys, self._key_rows)
+        a2, b2 = _sharing(probe_keys, probe_rows, own_keys, own_rows)
+        a, b = np.concatenate([a1, a2]), np.concatenate([b1, b2])
+        pairs = np.unique(np.minimum(a, b)[a != b] * self._size + np.maximum(a, b)[a != b])
+        a, b = pairs // self._size, pairs % self._size
+        duplicates = self._duplicates(a, b)
+        for x, y in zip(a[duplicates].tolist(), b[duplicates].tolist()):
+            self._union(x, y)
+        self._merge_keys(own_keys, own_rows)
+        return len(new) + len(changed)
+
+    def cluster_of(self, listing_id) -> str:
+        """The cluster id (the id of its earliest indexed listing) of ``listing_id``."""
+        return self.ids[self._find(self._row[str(listing_id)])]
+
+    def clusters(self) -> list:
+        """``(id, cluster_id, cluster_size)`` for every indexed listing, in index order."""
+        roots = [self._find(row) for row in range(self._size)]
+        sizes = Counter(roots)
+        return [(listing_id, self.ids[root], sizes[root]) for listing_id, root in zip(self.ids, roots)]
+
+    def save(self, path: str = INDEX_FILE):
+        tmp_path = path + ".tmp"
+        n = self._size
+        with open(tmp_path, "wb") as f:
+            np.savez(f, params=np.array([SIGNATURE_SIZE, BANDS, SHINGLE_CHARS, SEED]), ids=np.array(self.ids, dtype=str),
+                     sigs=self._sigs[:n], has_text=self._has_text[:n], text_sum=self._text_sum[:n],
+                     lat=self._lat[:n], lon=self._lon[:n],
+                     price=self._price[:n], area=self._area[:n], rooms=self._rooms[:n],
+                     parent=np.array([self._find(row) for row in range(n)], dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> "DedupIndex":
+        """The index saved at ``path``, or an empty one if there is none yet."""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            if data["params"].tolist() != [SIGNATURE_SIZE, BANDS, SHINGLE_CHARS, SEED]:
+                raise ValueError(f"{path} was built with other MinHash settings; delete it to rebuild the index")
+            index.ids = data["ids"].tolist()
+            index._sigs, index._has_text = data["sigs"], data["has_text"]
+            # Older files have no checksums: their listings are compared by signature the next time they are seen
+            index._text_sum = (data["text_sum"] if "text_sum" in data.files
+                               else np.full(len(data["ids"]), _UNKNOWN_TEXT, dtype=np.uint64))
+            index._lat, index._lon, index._price = data["lat"], data["lon"], data["price"]
+            index._area, index._rooms = data["area"], data["rooms"]
+            index._parent = data["parent"].tolist()
+        index._size = len(index.ids)
+        index._row = {listing_id: row for row, listing_id in enumerate(index.ids)}
+        # The key arrays are cheaper to rebuild from the signatures than to store
+        rows = np.flatnonzero(index._has_text)
+        keys = bucket_keys(index._sigs[rows], index._lat[rows], index._lon[rows])[:, 0, :].reshape(-1)
+        order = np.argsort(keys, kind="stable")
+        index._keys, index._key_rows = keys[order], np.repeat(rows, BANDS)[order]
+        return index
+
+
+def update_store(store, index_path: str = INDEX_FILE) -> tuple:
+    """Adds ``store``'s listings of its run to the index at ``index_path`` and writes the clusters to the store.
+
+    Returns ``(listings newly indexed or re-indexed, listings that have near-duplicates)``.
+    """
+    index = DedupIndex.load(index_path)
+    added = index.add(store.iter_records())
+    index.save(index_path)
+    rows = index.clusters()
+    store.set_clusters(rows)
+    return added, sum(1 for _, _, size in rows if size > 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate bina.az listings (MinHash/LSH over descriptions).")
+    parser.add_argument("csv_paths", nargs="+", help="scraper CSVs to add to the index, oldest first")
+    parser.add_argument("--index", default=INDEX_FILE, help="index file, updated in place")
+    parser.add_argument("--output", default="bina_clusters.csv", help="id,cluster_id,cluster_size for every indexed listing")
+    args = parser.parse_args()
+
+    index = DedupIndex.load(args.index)
+    print(f"{len(index)} listings already indexed in {args.index}")
+    for path in args.csv_paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            print(f"{path}: {index.add(csv.DictReader(f))} new or changed listings indexed")
+    index.save(args.index)
+
+    rows = index.clusters()
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "cluster_id", "cluster_size"])
+        writer.writerows(rows)
+    duplicates = sum(1 for _, _, size in rows if size > 1)
+    print(f"{len(rows)} listings, {len({cluster for _, cluster, _ in rows})} clusters; "
+          f"{duplicates} listings have near-duplicates. Written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,577 @@
+"""Range queries over the scraped bina.az listings: "within X km of a point, in this price and room range".
+
+The listings are kept in their own SQLite file (INDEX_FILE), one typed row per
+listing with the fields the queries need: price, rooms, area (in m²; land in
+sot is converted), price per m², category, location and coordinates. The
+coordinates are also in an R*Tree (SQLite's built-in spatial index, kept in
+step with the rows by triggers), and price, area, rooms and category have
+ordinary B-tree indexes, so a query reads only the rows in its bounding box
+or its price/area range instead of the whole CSV:
+
+- ``search`` asks the R*Tree for the bounding box around the point and the
+  price and room range (both are R*Tree dimensions as well), filters the rest
+  (area, category) in SQL and drops the corners of the box by distance;
+  without a point it walks the price, rooms or area index.
+- ``price_per_m2`` groups the matching listings by location, category, rooms
+  or grid cell and returns the count, median, mean, min and max price per m².
+  Over all listings (no point or filter) it reads a summary table, so the
+  citywide figures cost one small lookup. Triggers note every group whose
+  listings changed, and an update recomputes only those groups' rows.
+
+Rentals are listed with their monthly price and some sales are priced in USD,
+so ``price_per_m2`` only counts sales in AZN unless ``leased``/``currency`` ask
+for others; ``search`` takes the same two filters. Listings whose ``leased`` is
+unknown (older CSVs, list pages that don't carry it) count as sales: rentals are
+a small share of the site, and leaving them out would leave out nearly all.
+
+The index is updated incrementally: ``sync_store`` reads only the bina.az
+listings that the listings store (listings.sqlite) has seen since the last
+sync, and ``import_csv`` upserts a scraper CSV. A listing that is scraped
+again replaces its row; ``seen_since`` leaves out listings that no crawl has
+seen lately (sold or taken down).
+
+    python listing_query.py --sync                                    # after each day's crawl
+    python listing_query.py --near 40.3777 49.8920 --km 1.5 --price 100000 250000 --rooms 2 3
+    python listing_query.py --stats location --category "Yeni tikili"
+"""
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import sqlite3
+import statistics
+import time
+
+INDEX_FILE = "bina_query.sqlite"
+STORE_FILE = "listings.sqlite"
+STORE_SOURCE = "binaz"
+# bina.az gives land plots in sot (100 m²); anything else unknown is left without an area
+AREA_UNITS = {"m²": 1.0, "sot": 100.0}
+# Grid cell size for price_per_m2(by="cell"); 0.01 deg is ~1.1 km north-south, ~0.85 km east-west in Baku.
+# Stored per listing; changing it recomputes the cells when the index is next opened
+CELL_DEGREES = 0.01
+# price_per_m2's default currency, and the one the summary table is kept for (sales and unknown leased)
+STATS_CURRENCY = "AZN"
+# Past this share of the summary's groups marked as changed, one pass over the table beats reading them group by group
+REBUILD_SHARE = 0.25
+# ANALYZE (the planner's statistics) again once the table grew or shrank by this share, or after this many days
+ANALYZE_GROWTH = 0.2
+ANALYZE_DAYS = 7
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Rows per executemany when importing
+CHUNK_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id TEXT PRIMARY KEY,
+    url TEXT,
+    price REAL,
+    currency TEXT,
+    leased INTEGER,
+    rooms INTEGER,
+    area REAL,
+    price_per_m2 REAL,
+    category TEXT,
+    location TEXT,
+    city TEXT,
+    latitude REAL,
+    longitude REAL,
+    cell TEXT,
+    updated_at TEXT,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_price ON listings (price);
+CREATE INDEX IF NOT EXISTS listings_area ON listings (area);
+CREATE INDEX IF NOT EXISTS listings_rooms_price ON listings (rooms, price);
+CREATE INDEX IF NOT EXISTS listings_category ON listings (category);
+-- Price and rooms are R*Tree dimensions too, so "near here, in this price and room range" is answered
+-- inside the tree; a missing price or room count is stored as 0 and dropped by the exact filter
+CREATE VIRTUAL TABLE IF NOT EXISTS points USING rtree (
+    id, min_lat, max_lat, min_lon, max_lon, min_price, max_price, min_rooms, max_rooms
+);
+CREATE TRIGGER IF NOT EXISTS listings_points_insert AFTER INSERT ON listings
+WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+    INSERT INTO points VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude,
+                               COALESCE(new.price, 0), COALESCE(new.price, 0), COALESCE(new.rooms, 0), COALESCE(new.rooms, 0));
+END;
+CREATE TRIGGER IF NOT EXISTS listings_points_update AFTER UPDATE OF latitude, longitude, price, rooms ON listings
+WHEN old.latitude IS NOT new.latitude OR old.longitude IS NOT new.longitude
+     OR old.price IS NOT new.price OR old.rooms IS NOT new.rooms BEGIN
+    DELETE FROM points WHERE id = old.rowid;
+    INSERT INTO points SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude,
+                              COALESCE(new.price, 0), COALESCE(new.price, 0), COALESCE(new.rooms, 0), COALESCE(new.rooms, 0)
+    WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+END;
+CREATE TRIGGER IF NOT EXISTS listings_points_delete AFTER DELETE ON listings BEGIN
+    DELETE FROM points WHERE id = old.rowid;
+END;
+-- Price per m² of the sales in STATS_CURRENCY of every group of every grouping (GROUPS), over all
+-- listings (category '') and within each category
+CREATE TABLE IF NOT EXISTS summary (
+    by TEXT NOT NULL,
+    category TEXT NOT NULL,
+    grp NOT NULL,
+    listings INTEGER NOT NULL,
+    median REAL,
+    mean REAL,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (by, category, grp)
+);
+-- Groups whose summary rows are out of date (duplicates and NULLs included, so the triggers only
+-- append), filled by the triggers in SUMMARY_SCHEMA and emptied by _refresh
+CREATE TABLE IF NOT EXISTS dirty (by TEXT NOT NULL, grp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _counted(row: str) -> str:
+    """SQL condition: the listing ``row`` ("new", "old" or "l") is in the summary table."""
+    return f"{row}.price_per_m2 IS NOT NULL AND COALESCE({row}.leased, 0) = 0 AND {row}.currency = '{STATS_CURRENCY}'"
+
+
+def _mark_dirty(*rows: str) -> str:
+    """Trigger statement noting each grouping's group of the listings ``rows`` ("new", "old") as out of date."""
+    groups = " UNION ALL ".join(f"SELECT '{by}', {row}.{by}" for row in rows for by in ("location", "category", "rooms", "cell"))
+    return f"INSERT INTO dirty {groups};"
+
+
+# Needs the leased and cell columns, so it runs after _migrate has added them to an older index
+SUMMARY_SCHEMA = f"""
+CREATE INDEX IF NOT EXISTS listings_location ON listings (location);
+CREATE INDEX IF NOT EXISTS listings_cell ON listings (cell);
+CREATE TRIGGER IF NOT EXISTS listings_dirty_insert AFTER INSERT ON listings WHEN {_counted("new")} BEGIN
+    {_mark_dirty("new")}
+END;
+CREATE TRIGGER IF NOT EXISTS listings_dirty_update AFTER UPDATE ON listings
+WHEN ({_counted("old")} OR {_counted("new")}) AND (old.price_per_m2 IS NOT new.price_per_m2
+     OR old.leased IS NOT new.leased OR old.currency IS NOT new.currency OR old.location IS NOT new.location
+     OR old.category IS NOT new.category OR old.rooms IS NOT new.rooms OR old.cell IS NOT new.cell) BEGIN
+    {_mark_dirty("old", "new")}
+END;
+CREATE TRIGGER IF NOT EXISTS listings_dirty_delete AFTER DELETE ON listings WHEN {_counted("old")} BEGIN
+    {_mark_dirty("old")}
+END;
+"""
+
+COLUMNS = ["id", "url", "price", "currency", "leased", "rooms", "area", "price_per_m2", "category", "location", "city",
+           "latitude", "longitude", "cell", "updated_at", "last_seen"]
+
+# Out-of-order loads (an old snapshot imported after newer ones) keep the newest data, and a field
+# the newer record lacks (older CSVs have no category or detail columns) keeps its old value. The
+# R*Tree entry is only rewritten when the listing moved or its price or rooms changed.
+_KEPT = [column for column in COLUMNS[1:-1] if column != "price_per_m2"]
+UPSERT = f"""
+INSERT INTO listings ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})
+ON CONFLICT (id) DO UPDATE SET
+    {", ".join(f"{column} = COALESCE(excluded.{column}, {column})" for column in _KEPT)},
+    price_per_m2 = COALESCE(excluded.price, price) / COALESCE(excluded.area, area),
+    last_seen = excluded.last_seen
+WHERE excluded.last_seen >= listings.last_seen
+  AND ({" OR ".join(f"COALESCE(excluded.{column}, listings.{column}) IS NOT listings.{column}" for column in _KEPT)})
+"""
+# Run before UPSERT: a listing seen again with the same fields only gets its last_seen moved, which
+# rewrites none of its index entries and leaves the summary alone (UPSERT then skips it)
+TOUCH = f"""
+UPDATE listings SET last_seen = ?{len(COLUMNS)} WHERE id = ?1 AND last_seen <= ?{len(COLUMNS)}
+AND {" AND ".join(f"COALESCE(?{COLUMNS.index(column) + 1}, {column}) IS {column}" for column in _KEPT)}
+"""
+
+ORDERS = {None, "price", "area", "price_per_m2", "distance_km"}
+GROUPS = {"location": "l.location", "category": "l.category", "rooms": "l.rooms", "cell": "l.cell"}
+# The "cell" column for existing rows; the same arithmetic as cell_of (shifted to positive numbers, so
+# truncation is floor())
+CELL_SQL = "CAST((latitude + 90) / :cell AS INTEGER) || ':' || CAST((longitude + 180) / :cell AS INTEGER)"
+# The scraper writes "Yes"/"No"
+LEASED = {"Yes": 1, "No": 0, True: 1, False: 0}
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def cell_of(lat, lon):
+    """The grid cell ("row:column" of CELL_DEGREES squares) of a point, or None."""
+    if lat is None or lon is None:
+        return None
+    return f"{int((lat + 90) / CELL_DEGREES)}:{int((lon + 180) / CELL_DEGREES)}"
+
+
+def row_of(record: dict, seen_at: str) -> tuple:
+    """The ``listings`` row for a scraped bina.az record (CSV row or store record)."""
+    price = _number(record.get("price"))
+    area = _number(record.get("area"))
+    units = AREA_UNITS.get(record.get("area_units") or "m²")
+    area = area * units if area and units else None
+    rooms = _number(record.get("rooms"))
+    lat, lon = _number(record.get("latitude")), _number(record.get("longitude"))
+    values = {
+        "id": str(record["id"]), "url": record.get("url"), "price": price, "currency": record.get("currency"),
+        "leased": LEASED.get(record.get("leased")), "rooms": int(rooms) if rooms is not None else None, "area": area,
+        "price_per_m2": price / area if price and area else None,
+        "category": record.get("category") or None, "location": record.get("location") or None,
+        "city": record.get("city") or None,
+        "latitude": lat, "longitude": lon, "cell": cell_of(lat, lon),
+        "updated_at": record.get("updated_at"), "last_seen": seen_at,
+    }
+    return tuple(values[column] for column in COLUMNS)
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, km: float) -> tuple:
+    """``(min_lat, max_lat, min_lon, max_lon)`` of a box containing every point within ``km`` of (lat, lon)."""
+    dlat = km / KM_PER_DEGREE
+    # Widest at the box's edge nearest the pole
+    cos_lat = math.cos(math.radians(min(89.9, abs(lat) + dlat)))
+    dlon = min(180.0, km / (KM_PER_DEGREE * cos_lat))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def _between(conditions: list, params: dict, column: str, low, high):
+    if low is not None:
+        conditions.append(f"l.{column} >= :{column}_low")
+        params[f"{column}_low"] = low
+    if high is not None:
+        conditions.append(f"l.{column} <= :{column}_high")
+        params[f"{column}_high"] = high
+
+
+def _stats(by: str, groups: dict) -> list:
+    """Price-per-m² statistics of ``{group: [value, ...]}``, most listings first."""
+    stats = [{by: group, "listings": len(values), "median": round(statistics.median(values), 1),
+              "mean": round(statistics.fmean(values), 1), "min": round(min(values), 1), "max": round(max(values), 1)}
+             for group, values in groups.items()]
+    return sorted(stats, key=lambda stat: (-stat["listings"], str(stat[by])))
+
+
+class ListingIndex:
+    """The query index in ``path``. One connection; not shared between threads."""
+
+    def __init__(self, path: str = INDEX_FILE):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=60)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.create_function("distance_km", 4, distance_km, deterministic=True)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # ANALYZE samples each index instead of reading all of it
+        self._conn.execute("PRAGMA analysis_limit = 1000")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.executescript(SUMMARY_SCHEMA)
+
+    def _migrate(self):
+        """Adds the leased and cell columns to an index written before they existed, and recomputes the cells
+        (and the whole summary) when CELL_DEGREES changed. The summary and its triggers are rebuilt as well
+        when the rule for which listings it counts (``_counted``) changed."""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(listings)")}
+        cells_current = "leased" in columns and self._meta("cell_degrees") == repr(CELL_DEGREES)
+        if cells_current and self._meta("counted") == _counted("l"):
+            return
+        with self._conn:
+            if not cells_current:
+                for column, kind in (("leased", "INTEGER"), ("cell", "TEXT")):
+                    if column not in columns:
+                        self._conn.execute(f"ALTER TABLE listings ADD COLUMN {column} {kind}")
+                self._conn.execute(f"UPDATE listings SET cell = {CELL_SQL}", {"cell": CELL_DEGREES})
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('cell_degrees', ?)", (repr(CELL_DEGREES),))
+            # SUMMARY_SCHEMA creates them again with the current rule
+            for event in ("insert", "update", "delete"):
+                self._conn.execute(f"DROP TRIGGER IF EXISTS listings_dirty_{event}")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('counted', ?)", (_counted("l"),))
+        self._refresh(everything=True)
+
+    # --- updates ---
+
+    def add(self, records, seen_at: str = None) -> int:
+        """Upserts bina.az records (dicts with the CSV's columns); returns how many there were."""
+        seen_at = seen_at or datetime.datetime.now().isoformat(timespec="seconds")
+        return self._upsert(row_of(record, seen_at) for record in records if record.get("id"))
+
+    def _upsert(self, rows) -> int:
+        """Writes ``listings`` rows in one transaction, CHUNK_SIZE at a time."""
+        n = 0
+        chunk = []
+        with self._conn:
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= CHUNK_SIZE:
+                    self._conn.executemany(TOUCH, chunk)
+                    self._conn.executemany(UPSERT, chunk)
+                    n += len(chunk)
+                    chunk = []
+            self._conn.executemany(TOUCH, chunk)
+            self._conn.executemany(UPSERT, chunk)
+            n += len(chunk)
+        self._refresh()
+        self._analyze_if_due()
+        return n
+
+    def import_csv(self, path: str, seen_at: str = None) -> int:
+        """Upserts a scraper CSV; its listings count as seen when the file was last modified."""
+        seen_at = seen_at or datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+        with open(path, newline="", encoding="utf-8") as f:
+            return self.add(csv.DictReader(f), seen_at)
+
+    def sync_store(self, store_path: str = STORE_FILE, source: str = STORE_SOURCE) -> int:
+        """Upserts the listings ``store_path`` has seen since the last sync. Returns how many."""
+        since = self._meta("synced_until") or ""
+        # Read-only, so a scraper still writing the store isn't blocked
+        store = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True, timeout=60)
+        try:
+            until = store.execute("SELECT MAX(last_seen) FROM listings WHERE source = ?", (source,)).fetchone()[0]
+            if until is None or until <= since:
+                return 0
+            # Up to the newest last_seen read above: a listing written after it waits for the next sync
+            rows = store.execute("SELECT last_seen, data FROM listings WHERE source = ? AND last_seen > ? AND last_seen <= ?",
+                                 (source, since, until))
+            n = self._upsert(row_of(json.loads(data), last_seen) for last_seen, data in rows)
+        finally:
+            store.close()
+        self._set_meta("synced_until", until)
+        return n
+
+    def _refresh(self, everything: bool = False):
+        """Recomputes the summary rows of the groups the triggers marked as changed (or of ``everything``).
+
+        Reads only the listings of those groups, through the grouping's index,
+        unless REBUILD_SHARE of the groups changed; that is paid once per
+        update instead of by every unfiltered ``price_per_m2`` call.
+        """
+        marked = self._conn.execute("SELECT COUNT(*) FROM (SELECT DISTINCT by, grp FROM dirty WHERE grp IS NOT NULL)").fetchone()[0]
+        known = self._conn.execute("SELECT COUNT(*) FROM summary WHERE category = ''").fetchone()[0]
+        everything = everything or marked > REBUILD_SHARE * known
+        groups = {}
+        with self._conn:
+            if everything:
+                self._conn.execute("DELETE FROM summary")
+                rows = self._conn.execute(f"SELECT {', '.join(GROUPS.values())}, l.category, l.price_per_m2 "
+                                          f"FROM listings l WHERE {_counted('l')}")
+                for row in rows:
+                    for by, group in zip(GROUPS, row):
+                        self._collect(groups, by, group, row[-2], row[-1])
+            elif marked:
+                for by, column in GROUPS.items():
+                    rows = self._conn.execute(f"SELECT {column}, l.category, l.price_per_m2 FROM listings l "
+                                              f"WHERE {column} IN (SELECT grp FROM dirty WHERE by = ?) AND {_counted('l')}", (by,))
+                    for group, category, value in rows:
+                        self._collect(groups, by, group, category, value)
+                    # Including the groups no listing is left in
+                    self._conn.execute("DELETE FROM summary WHERE by = ? AND grp IN (SELECT grp FROM dirty WHERE by = ?)", (by, by))
+            self._conn.executemany("INSERT INTO summary VALUES (:by, :category, :grp, :listings, :median, :mean, :min, :max)",
+                                   (dict(stat, by=by, category=category, grp=stat[by])
+                                    for (by, category), values in groups.items() for stat in _stats(by, values)))
+            self._conn.execute("DELETE FROM dirty")
+
+    @staticmethod
+    def _collect(groups: dict, by: str, group, category, value):
+        """Adds a listing's price per m² to its group, over all listings and within its category."""
+        if group is None:
+            return
+        groups.setdefault((by, ""), {}).setdefault(group, []).append(value)
+        if category:
+            groups.setdefault((by, category), {}).setdefault(group, []).append(value)
+
+    def _analyze_if_due(self):
+        """Runs ANALYZE, so without a point the planner picks the price, rooms or area index by selectivity,
+        when the table has changed size by ANALYZE_GROWTH or the last one is ANALYZE_DAYS old."""
+        rows, now = self.count(), time.time()
+        analyzed_rows, analyzed_at = json.loads(self._meta("analyzed") or "[null, 0]")
+        if analyzed_rows is not None and abs(rows - analyzed_rows) < ANALYZE_GROWTH * analyzed_rows \
+                and now - analyzed_at < ANALYZE_DAYS * 86400:
+            return
+        self._conn.execute("ANALYZE")
+        self._set_meta("analyzed", json.dumps([rows, now]))
+
+    def _meta(self, key: str):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    # --- queries ---
+
+    def _matching(self, lat=None, lon=None, km=None, min_price=None, max_price=None, min_rooms=None, max_rooms=None,
+                  min_area=None, max_area=None, category=None, seen_since=None, leased=None, currency=None) -> tuple:
+        """``(from_and_where, params)`` selecting the listings ``l`` that match the filters."""
+        conditions, params = [], {}
+        _between(conditions, params, "price", min_price, max_price)
+        _between(conditions, params, "rooms", min_rooms, max_rooms)
+        # The same bounds on the R*Tree's price and rooms dimensions, when it's used
+        tree_conditions = [f"p.max_{column} >= :{column}_low" for column in ("price", "rooms") if f"{column}_low" in params]
+        tree_conditions += [f"p.min_{column} <= :{column}_high" for column in ("price", "rooms") if f"{column}_high" in params]
+        _between(conditions, params, "area", min_area, max_area)
+        if category is not None:
+            conditions.append("l.category = :category")
+            params["category"] = category
+        if seen_since is not None:
+            conditions.append("l.last_seen >= :seen_since")
+            params["seen_since"] = seen_since
+        if leased:
+            conditions.append("l.leased = 1")
+        elif leased is not None:
+            # Unknown counts as a sale, as in the summary table
+            conditions.append("COALESCE(l.leased, 0) = 0")
+        if currency is not None:
+            conditions.append("l.currency = :currency")
+            params["currency"] = currency
+        if lat is None:
+            source = "listings l"
+        else:
+            # CROSS JOIN keeps the R*Tree as the outer loop; left to itself the planner may walk the
+            # price index and look every row up in the R*Tree, which is ~50x slower
+            source = "points p CROSS JOIN listings l ON l.rowid = p.id"
+            params.update(lat=lat, lon=lon, km=km)
+            params["min_lat"], params["max_lat"], params["min_lon"], params["max_lon"] = bounding_box(lat, lon, km)
+            # Overlap rather than containment: the R*Tree rounds its 32-bit boxes outwards
+            conditions += ["p.max_lat >= :min_lat", "p.min_lat <= :max_lat", "p.max_lon >= :min_lon", "p.min_lon <= :max_lon"]
+            conditions += tree_conditions
+            # The flat-earth distance is within a factor of (1 +- error) of the great-circle one this close
+            # to the point, so only listings in a thin ring at the edge need the exact (Python) distance
+            dlat = math.radians(km / KM_PER_DEGREE)
+            tan_lat = math.tan(min(math.radians(89.0), math.radians(abs(lat)) + dlat))
+            error = 2 * (tan_lat * dlat + (km / EARTH_RADIUS_KM) ** 2) + 1e-9
+            params.update(ky2=KM_PER_DEGREE ** 2, kx2=(KM_PER_DEGREE * math.cos(math.radians(lat))) ** 2,
+                          inner2=(km * max(0.0, 1 - error)) ** 2, outer2=(km * (1 + error)) ** 2)
+            flat2 = "((l.latitude - :lat) * (l.latitude - :lat) * :ky2 + (l.longitude - :lon) * (l.longitude - :lon) * :kx2)"
+            exact = "distance_km(:lat, :lon, l.latitude, l.longitude) <= :km"
+            conditions.append(f"({flat2} <= :inner2 OR ({flat2} <= :outer2 AND {exact}))")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"{source}{where}", params
+
+    def search(self, lat: float = None, lon: float = None, km: float = None, order: str = None, limit: int = None,
+               **filters) -> list:
+        """Listings within ``km`` of (lat, lon) (if given) that match ``filters``, as dicts.
+
+        ``filters``: min_/max_ price, rooms and area (m²), ``category``,
+        ``seen_since`` (an ISO timestamp), ``leased`` (True for rentals only,
+        False for sales and listings not known to be rentals) and ``currency``. With a point each result has a
+        ``distance_km`` and they are nearest first; ``order`` ("price", "area",
+        "price_per_m2" or "distance_km") overrides that.
+        """
+        if (lat is None) != (km is None) or (lat is None) != (lon is None):
+            raise ValueError("search needs lat, lon and km together")
+        order = order or ("distance_km" if lat is not None else None)
+        if order not in ORDERS or (order == "distance_km" and lat is None):
+            raise ValueError(f"can't order by {order!r}")
+        matching, params = self._matching(lat, lon, km, **filters)
+        columns = "l.*, round(distance_km(:lat, :lon, l.latitude, l.longitude), 3) AS distance_km" if lat is not None else "l.*"
+        sql = f"SELECT {columns} FROM {matching}"
+        if order:
+            sql += f" ORDER BY {order} IS NULL, {order}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def price_per_m2(self, by: str = "location", lat: float = None, lon: float = None, km: float = None,
+                     min_listings: int = 1, leased: bool = False, currency: str = STATS_CURRENCY, **filters) -> list:
+        """Price per m² of the listings matching the filters, grouped ``by`` location, category, rooms or cell.
+
+        Returns ``[{by: group, "listings", "median", "mean", "min", "max"}, ...]``,
+        most listings first. Takes the same filters as ``search``, but only
+        counts sales (``leased=False``) in STATS_CURRENCY unless told otherwise;
+        ``leased=None`` or ``currency=None`` mixes them. Without a point or
+        other filters than ``category`` the answer comes from the summary
+        table; otherwise only the matching listings are read.
+        """
+        if by not in GROUPS:
+            raise ValueError(f"unknown grouping {by!r}; one of {', '.join(GROUPS)}")
+        summarised = leased is not None and not leased and currency == STATS_CURRENCY
+        if summarised and lat is None and all(value is None for name, value in filters.items() if name != "category"):
+            rows = self._conn.execute("SELECT grp, listings, median, mean, min, max FROM summary "
+                                      "WHERE by = ? AND category = ? AND listings >= ? ORDER BY listings DESC, grp",
+                                      (by, filters.get("category") or "", min_listings))
+            return [{by: row["grp"], **{key: row[key] for key in row.keys()[1:]}} for row in rows]
+        matching, params = self._matching(lat, lon, km, leased=leased, currency=currency, **filters)
+        groups = {}
+        for group, value in self._conn.execute(f"SELECT {GROUPS[by]}, l.price_per_m2 FROM {matching}", params):
+            if group is not None and value is not None:
+                groups.setdefault(group, []).append(value)
+        return [stat for stat in _stats(by, groups) if stat["listings"] >= min_listings]
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spatial and price range queries over the scraped bina.az listings.")
+    parser.add_argument("--index", default=INDEX_FILE)
+    parser.add_argument("--sync", action="store_true", help=f"add the listings {STORE_FILE} has seen since the last sync")
+    parser.add_argument("--store", default=STORE_FILE)
+    parser.add_argument("--import-csv", nargs="+", default=[], metavar="CSV", help="add scraper CSVs")
+    parser.add_argument("--near", nargs=2, type=float, metavar=("LAT", "LON"))
+    parser.add_argument("--km", type=float, default=1.0)
+    parser.add_argument("--price", nargs=2, type=float, metavar=("MIN", "MAX"))
+    parser.add_argument("--rooms", nargs=2, type=int, metavar=("MIN", "MAX"))
+    parser.add_argument("--area", nargs=2, type=float, metavar=("MIN", "MAX"), help="in m²")
+    parser.add_argument("--category", help='e.g. "Yeni tikili"')
+    parser.add_argument("--seen-since", help="only listings seen since this ISO date")
+    parser.add_argument("--leased", choices=["yes", "no"], help="only rentals (monthly prices) or only sales; --stats counts sales")
+    parser.add_argument("--currency", help=f"only listings priced in this currency; --stats counts {STATS_CURRENCY}")
+    parser.add_argument("--stats", choices=sorted(GROUPS), help="price per m² grouped by this instead of listing matches")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    index = ListingIndex(args.index)
+    try:
+        # Oldest snapshot first, as listings_store.py loads them
+        for path in sorted(args.import_csv, key=os.path.getmtime):
+            started = time.perf_counter()
+            print(f"{path}: {index.import_csv(path)} listings upserted in {time.perf_counter() - started:.1f}s")
+        if args.sync:
+            started = time.perf_counter()
+            print(f"{args.store}: {index.sync_store(args.store)} listings synced in {time.perf_counter() - started:.1f}s")
+        if not (args.near or args.price or args.rooms or args.area or args.category or args.seen_since or args.leased
+                or args.currency or args.stats):
+            print(f"{index.count()} listings in {args.index}")
+            return
+
+        filters = {"category": args.category, "seen_since": args.seen_since,
+                   "leased": {"yes": True, "no": False}.get(args.leased), "currency": args.currency}
+        for name in ("price", "rooms", "area"):
+            low, high = getattr(args, name) or (None, None)
+            filters[f"min_{name}"], filters[f"max_{name}"] = low, high
+        point = {"lat": args.near[0], "lon": args.near[1], "km": args.km} if args.near else {}
+        started = time.perf_counter()
+        if args.stats:
+            filters["leased"] = args.leased == "yes"
+            filters["currency"] = args.currency or STATS_CURRENCY
+            rows = index.price_per_m2(args.stats, **point, **filters)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{'':<24} {'listings':>8} {'median':>9} {'mean':>9} {'min':>9} {'max':>9}   {filters['currency']}/m²")
+            for row in rows[:args.limit]:
+                print(f"{str(row[args.stats])[:24]:<24} {row['listings']:>8} {row['median']:>9.0f} {row['mean']:>9.0f} "
+                      f"{row['min']:>9.0f} {row['max']:>9.0f}")
+            print(f"{len(rows)} groups in {elapsed:.1f} ms")
+        else:
+            rows = index.search(**point, order=None if args.near else "price", **filters)
+            elapsed = (time.perf_counter() - started) * 1000
+            for row in rows[:args.limit]:
+                distance = f"{row['distance_km']:>6.2f} km  " if args.near else ""
+                print(f"{distance}{row['price'] or 0:>10.0f} {row['currency'] or '':<3} {row['rooms'] or '-':>2} rooms "
+                      f"{row['area'] or 0:>7.1f} m²  {row['location'] or ''}  {row['url']}")
+            print(f"{len(rows)} listings in {elapsed:.1f} ms")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
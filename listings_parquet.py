@@ -0,0 +1,184 @@
+"""Typed Parquet snapshots of the scrapers' output and a fast, column-selective loader.
+
+Each run can be written as one Parquet file per day (``<dir>/<prefix>_YYYYMMDD.parquet``)
+with an explicit schema, so readers never have to infer types again:
+low-cardinality text (city, currency, units, category...) is dictionary-encoded
+and loads as pandas ``category``; prices, areas and coordinates are numeric;
+``updated_at`` is a UTC timestamp; every row carries its ``snapshot`` date.
+
+Loading goes through a memory-mapped Arrow dataset and reads only the
+requested columns (and, with ``since``, only the matching snapshots):
+
+    from listings_parquet import load_frame
+    df = load_frame("bina_history", columns=["id", "price", "city", "snapshot"])
+
+pyarrow (and pandas for ``load_frame``) are optional; without them the scrapers
+skip the Parquet step and keep writing CSV/xlsx as before.
+
+    python listings_parquet.py bina_listings.csv bina_listings_20250724.csv --dir bina_history
+"""
+import argparse
+import datetime
+import glob
+import os
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for Parquet output and loading
+    pa = None
+
+# Column -> kind. "category" is dictionary-encoded text, "digits" an int read from the digits of a
+# string ("120 000 km" -> 120000), "timestamp" an ISO-8601 time stored as UTC.
+BINA_COLUMNS = {
+    "id": "int64", "url": "string", "price": "float64", "currency": "category", "rooms": "int16",
+    "area": "float64", "area_units": "category", "location": "category", "city": "category",
+    "updated_at": "timestamp", "photos_count": "int16", "leased": "category", "description": "string", "address": "string",
+    "latitude": "float64", "longitude": "float64", "contact_name": "string", "phones": "string",
+    "category": "category", "Çıxarış": "category", "Təmir": "category", "Mərtəbə": "category",
+}
+TAPAZ_COLUMNS = {
+    "Type of Product": "category", "elan_id": "int64", "title": "string", "price": "int64",
+    "city": "category", "category": "category", "Year": "int16", "New?": "category",
+    "Yurusu_km": "digits", "Description": "string", "URL": "string",
+}
+SNAPSHOT_COLUMN = "snapshot"
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow)")
+
+
+def _arrow_type(kind: str):
+    return {
+        "int64": pa.int64(), "int16": pa.int16(), "digits": pa.int64(), "float64": pa.float64(),
+        "string": pa.string(), "category": pa.dictionary(pa.int32(), pa.string()),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }[kind]
+
+
+def schema(columns: dict):
+    _require_pyarrow()
+    return pa.schema([pa.field(name, _arrow_type(kind)) for name, kind in columns.items()]
+                     + [pa.field(SNAPSHOT_COLUMN, pa.date32())])
+
+
+def _coerce(value, kind: str):
+    """CSV strings, JSON values and None all map to the column's Python type (or None)."""
+    if value is None or value == "":
+        return None
+    try:
+        if kind in ("int64", "int16"):
+            return int(float(value))
+        if kind == "digits":
+            digits = "".join(c for c in str(value) if c.isdigit())
+            return int(digits) if digits else None
+        if kind == "float64":
+            return float(value)
+        if kind == "timestamp":
+            parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            return parsed.astimezone(datetime.timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def records_to_table(records, columns: dict, snapshot: datetime.date = None):
+    """An Arrow table of ``records`` (dicts) with exactly ``columns``; missing keys become nulls."""
+    _require_pyarrow()
+    values = {name: [] for name in columns}
+    n = 0
+    for record in records:
+        for name, kind in columns.items():
+            values[name].append(_coerce(record.get(name), kind))
+        n += 1
+    arrays = []
+    for name, kind in columns.items():
+        if kind == "category":
+            arrays.append(pa.array(values[name], pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values[name], _arrow_type(kind)))
+    arrays.append(pa.array([snapshot or datetime.date.today()] * n, pa.date32()))
+    return pa.Table.from_arrays(arrays, schema=schema(columns))
+
+
+def snapshot_path(directory: str, prefix: str, snapshot: datetime.date) -> str:
+    return os.path.join(directory, f"{prefix}_{snapshot:%Y%m%d}.parquet")
+
+
+def write_parquet(records, path: str, columns: dict, snapshot: datetime.date = None) -> int:
+    """Writes ``records`` to ``path`` (zstd-compressed, replaced atomically). Returns the row count."""
+    table = records_to_table(records, columns, snapshot)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return table.num_rows
+
+
+def write_csv_snapshot(csv_path: str, directory: str, prefix: str, columns: dict, snapshot: datetime.date = None) -> str:
+    """Converts one scraper CSV into ``<directory>/<prefix>_YYYYMMDD.parquet`` and returns its path."""
+    import csv
+
+    snapshot = snapshot or datetime.date.today()
+    path = snapshot_path(directory, prefix, snapshot)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        write_parquet(csv.DictReader(f), path, columns, snapshot)
+    return path
+
+
+def snapshot_files(directory: str) -> list:
+    return sorted(glob.glob(os.path.join(directory, "*.parquet")))
+
+
+def load_table(directory: str, columns: list = None, since: datetime.date = None, latest: bool = False):
+    """Reads ``columns`` (default all) of the snapshots in ``directory`` through memory-mapped files.
+
+    ``since`` keeps snapshots on or after that date; ``latest`` keeps only the newest file.
+    """
+    _require_pyarrow()
+    paths = snapshot_files(directory)
+    if not paths:
+        raise FileNotFoundError(f"no Parquet snapshots in {directory}")
+    if latest:
+        paths = paths[-1:]
+    # Snapshots written before a column was added read it as nulls
+    unified = pa.unify_schemas([pq.read_schema(path) for path in paths])
+    dataset = ds.dataset(paths, schema=unified, format="parquet", filesystem=pafs.LocalFileSystem(use_mmap=True))
+    row_filter = ds.field(SNAPSHOT_COLUMN) >= pa.scalar(since, pa.date32()) if since else None
+    return dataset.to_table(columns=columns, filter=row_filter)
+
+
+def load_frame(directory: str, columns: list = None, since: datetime.date = None, latest: bool = False):
+    """``load_table`` as a pandas DataFrame; dictionary columns arrive as ``category``."""
+    return load_table(directory, columns, since, latest).to_pandas(date_as_object=False)
+
+
+def _snapshot_date(csv_path: str) -> datetime.date:
+    """The date in the file name (bina_listings_20250724.csv), else the file's modification date."""
+    match = re.search(r"(\d{8})", os.path.basename(csv_path))
+    if match:
+        return datetime.datetime.strptime(match.group(1), "%Y%m%d").date()
+    return datetime.date.fromtimestamp(os.path.getmtime(csv_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert scraper CSVs into typed daily Parquet snapshots.")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--dir", default="bina_history", help="snapshot directory")
+    parser.add_argument("--prefix", default="bina_listings")
+    parser.add_argument("--source", choices=["binaz", "tapaz"], default="binaz", help="which schema to apply")
+    args = parser.parse_args()
+
+    columns = BINA_COLUMNS if args.source == "binaz" else TAPAZ_COLUMNS
+    for csv_path in args.csv_files:
+        path = write_csv_snapshot(csv_path, args.dir, args.prefix, columns, _snapshot_date(csv_path))
+        print(f"{csv_path} -> {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
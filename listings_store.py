@@ -0,0 +1,270 @@
+"""SQLite listings store shared by the scrapers, plus a one-shot .xlsx export.
+
+Every listing is one row keyed by ``(source, listing_id)`` (bina.az ``id``,
+tap.az ``elan_id``). Writing a listing again is an upsert: its data and
+``last_seen``/``last_run`` are replaced and ``first_seen`` is kept, so daily
+runs add only the listings that are new instead of another full copy of the
+catalogue, and "have we seen this one before" is a primary-key lookup.
+Records are committed as they are scraped (or in one transaction per batch),
+so a crash loses at most the record in flight.
+
+The spreadsheet is produced once at the end by streaming the run's rows
+through openpyxl's write-only mode into a temporary file that then replaces
+the old one, so a crash can't leave a half-written .xlsx.
+
+    python listings_store.py bina_listings_2025*.csv --source binaz --key id   # load old CSV snapshots
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import random
+import sqlite3
+import threading
+
+from metrics import METRICS
+
+DEFAULT_STORE = "listings.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    source TEXT NOT NULL,
+    listing_id TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    last_run TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (source, listing_id)
+);
+CREATE INDEX IF NOT EXISTS listings_run ON listings (source, last_run);
+-- Near-duplicate clusters from listing_dedup.py: the cluster id is the id of its earliest listing
+CREATE TABLE IF NOT EXISTS clusters (
+    source TEXT NOT NULL,
+    listing_id TEXT NOT NULL,
+    cluster_id TEXT NOT NULL,
+    cluster_size INTEGER NOT NULL,
+    PRIMARY KEY (source, listing_id)
+);
+"""
+
+# Out-of-order loads (e.g. importing old snapshots after newer runs) keep the newest data
+UPSERT = """
+INSERT INTO listings (source, listing_id, first_seen, last_seen, last_run, data) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (source, listing_id) DO UPDATE SET
+    first_seen = MIN(first_seen, excluded.first_seen),
+    last_run = CASE WHEN excluded.last_seen >= last_seen THEN excluded.last_run ELSE last_run END,
+    data = CASE WHEN excluded.last_seen >= last_seen THEN excluded.data ELSE data END,
+    last_seen = MAX(last_seen, excluded.last_seen)
+"""
+
+
+def new_run_id() -> str:
+    return datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+class ListingStore:
+    """Listings of one ``source``, keyed by each record's ``key`` field. Thread-safe.
+
+    The scraper's worker threads can ``append`` concurrently; several scrapers
+    (different sources) can share one file.
+    """
+
+    def __init__(self, path: str, source: str, key: str, run_id: str = None):
+        self.path = path
+        self.source = source
+        self.key = key
+        self.run_id = run_id or new_run_id()
+        self._lock = threading.Lock()
+        # A second scraper writing the same file waits for the lock instead of failing
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        # WAL + NORMAL: each commit is an append to the log, durable across process crashes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def append(self, record: dict):
+        self.append_many([record])
+
+    def append_many(self, records, seen_at: str = None) -> int:
+        """Upserts ``records`` in one transaction and returns how many there were."""
+        seen_at = seen_at or _now()
+        rows = [(self.source, str(record[self.key]), seen_at, seen_at, self.run_id,
+                 json.dumps(record, ensure_ascii=False)) for record in records]
+        if not rows:
+            return 0
+        with METRICS.timer("store_write_seconds"), self._lock, self._conn:
+            self._conn.executemany(UPSERT, rows)
+        METRICS.inc("records_stored", len(rows), source=self.source)
+        return len(rows)
+
+    def import_csv(self, path: str, seen_at: str = None, chunk_size: int = 5000) -> int:
+        """Upserts the rows of a scraper CSV (empty cells become None). Returns the row count."""
+        n = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            chunk = []
+            for row in csv.DictReader(f):
+                chunk.append({column: (value if value != "" else None) for column, value in row.items()})
+                if len(chunk) >= chunk_size:
+                    n += self.append_many(chunk, seen_at)
+                    chunk = []
+            n += self.append_many(chunk, seen_at)
+        return n
+
+    def seen(self, listing_id) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM listings WHERE source = ? AND listing_id = ?",
+                                      (self.source, str(listing_id))).fetchone() is not None
+
+    def get(self, listing_id):
+        """Returns the stored record for ``listing_id``, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM listings WHERE source = ? AND listing_id = ?",
+                                     (self.source, str(listing_id))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def known_ids(self) -> set:
+        """All listing IDs stored for this source, for bulk "seen before" checks."""
+        with self._lock:
+            return {listing_id for (listing_id,) in
+                    self._conn.execute("SELECT listing_id FROM listings WHERE source = ?", (self.source,))}
+
+    def touch(self, listing_id):
+        """Marks a stored listing as seen by this run without replacing its data."""
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE listings SET last_seen = ?, last_run = ? WHERE source = ? AND listing_id = ?",
+                               (now, self.run_id, self.source, str(listing_id)))
+
+    def count(self, run_id: str = None) -> int:
+        """Number of listings written by this run (or ``run_id``)."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM listings WHERE source = ? AND last_run = ?",
+                                      (self.source, run_id or self.run_id)).fetchone()[0]
+
+    def iter_records(self, run_id: str = None):
+        """Yields the records written by this run (or ``run_id``), oldest write first."""
+        # A separate connection, so a long export doesn't hold the writers' lock
+        conn = sqlite3.connect(self.path)
+        try:
+            for (data,) in conn.execute("SELECT data FROM listings WHERE source = ? AND last_run = ? ORDER BY last_seen, rowid",
+                                        (self.source, run_id or self.run_id)):
+                yield json.loads(data)
+        finally:
+            conn.close()
+
+    def set_clusters(self, rows) -> int:
+        """Stores ``(listing_id, cluster_id, cluster_size)`` rows; only the ones that changed are written. Returns that count."""
+        with METRICS.timer("store_write_seconds"), self._lock, self._conn:
+            old = {listing_id: (cluster_id, size) for listing_id, cluster_id, size in self._conn.execute(
+                "SELECT listing_id, cluster_id, cluster_size FROM clusters WHERE source = ?", (self.source,))}
+            changed = [(self.source, str(listing_id), str(cluster_id), size) for listing_id, cluster_id, size in rows
+                       if old.get(str(listing_id)) != (str(cluster_id), size)]
+            self._conn.executemany("INSERT OR REPLACE INTO clusters (source, listing_id, cluster_id, cluster_size) "
+                                   "VALUES (?, ?, ?, ?)", changed)
+        return len(changed)
+
+    def cluster_of(self, listing_id):
+        """``(cluster_id, cluster_size)`` of a listing, or None if it hasn't been clustered."""
+        with self._lock:
+            row = self._conn.execute("SELECT cluster_id, cluster_size FROM clusters WHERE source = ? AND listing_id = ?",
+                                     (self.source, str(listing_id))).fetchone()
+        return tuple(row) if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def skip_known(items, key_fn, store: ListingStore, refresh_fraction: float = 0.0, stats: dict = None):
+    """Yields the items whose key ``store`` hasn't seen, plus a random ``refresh_fraction`` of the known ones.
+
+    Known items that are skipped are touched, so they still count as part of this run.
+    Works on a lazy iterable (e.g. links streamed from listing pages); duplicates are dropped.
+    ``stats`` (if given) gets "new", "refreshed" and "skipped" counts.
+    """
+    known = store.known_ids()
+    stats = stats if stats is not None else {}
+    for name in ("new", "refreshed", "skipped"):
+        stats.setdefault(name, 0)
+    handled = set()
+    for item in items:
+        key = str(key_fn(item))
+        if key in handled:
+            continue
+        handled.add(key)
+        if key not in known:
+            stats["new"] += 1
+        elif random.random() < refresh_fraction:
+            stats["refreshed"] += 1
+        else:
+            stats["skipped"] += 1
+            store.touch(key)
+            continue
+        yield item
+
+
+def export_csv(records, path: str, fieldnames: list) -> int:
+    """Writes ``records`` to a CSV with ``fieldnames`` (extra keys are dropped), replacing ``path`` at the end."""
+    tmp_path = path + ".tmp"
+    n = 0
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            n += 1
+    os.replace(tmp_path, path)
+    return n
+
+
+def export_xlsx(records, path: str, sheet_name: str = "Sheet1") -> int:
+    """Writes ``records`` (any re-iterable, e.g. a list or a callable returning an iterator) to ``path``.
+
+    Columns are the union of the records' keys in first-seen order. Returns the number of rows.
+    """
+    from openpyxl import Workbook
+
+    get_records = records if callable(records) else (lambda: iter(records))
+    columns = {}
+    for record in get_records():
+        for key in record:
+            columns.setdefault(key, None)
+    columns = list(columns)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(columns)
+    n = 0
+    for record in get_records():
+        sheet.append([record.get(column) for column in columns])
+        n += 1
+
+    tmp_path = path + ".tmp.xlsx"
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load scraper CSV snapshots into the listings store.")
+    parser.add_argument("csv_files", nargs="+")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument("--source", required=True, help="e.g. binaz or tapaz")
+    parser.add_argument("--key", required=True, help="ID column, e.g. id or elan_id")
+    args = parser.parse_args()
+
+    # Oldest snapshot first; each file counts as seen when it was last modified
+    for path in sorted(args.csv_files, key=os.path.getmtime):
+        seen_at = datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+        store = ListingStore(args.store, args.source, args.key, run_id=os.path.splitext(os.path.basename(path))[0])
+        print(f"{path}: {store.import_csv(path, seen_at)} rows upserted (seen {seen_at})")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
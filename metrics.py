@@ -0,0 +1,240 @@
+"""Lightweight run metrics: counters, latency histograms, a progress line and an end-of-run export.
+
+Everything is recorded into one process-wide registry, ``METRICS``, so any
+module can time a phase without passing objects around:
+
+    with METRICS.timer("graphql_seconds", operation="CurrentItem"):
+        resp = SESSION.get(...)
+    METRICS.inc("items_written")
+
+    reporter = METRICS.start_reporter(30, "items_written")   # progress line every 30s
+    ...
+    reporter.stop()
+    METRICS.export("bina_metrics.json")                      # or .prom for Prometheus text
+
+Histograms use fixed buckets (5ms to 2min), so recording is O(1) and memory
+doesn't grow with the run; percentiles are estimated from the buckets.
+``start_profile(path)`` runs cProfile, in every thread, until the returned function is called.
+"""
+import bisect
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+# Upper bounds in seconds; everything slower lands in +Inf
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+PROMETHEUS_PREFIX = "scraper_"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (the max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.50), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "p99": round(self.quantile(0.99), 4),
+            "max": round(self.max, 4),
+        }
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Reporter:
+    def __init__(self, metrics, interval: float, counter: str):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(metrics, interval, counter), name="metrics-reporter", daemon=True)
+        self._thread.start()
+
+    def _run(self, metrics, interval, counter):
+        while not self._stop.wait(interval):
+            print(metrics.progress_line(counter))
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms, keyed by name plus labels."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, n: int = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        """Records the block's duration in histogram ``name``, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def counter(self, name: str, **labels) -> int:
+        """A counter's value; without labels, the total over all its label sets."""
+        with self._lock:
+            if labels:
+                return self._counters.get(_key(name, labels), 0)
+            return sum(value for (counter_name, _), value in self._counters.items() if counter_name == name)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), **histogram.summary()}
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+        return {"started": self.started, "elapsed": round(time.time() - self.started, 3),
+                "counters": counters, "histograms": histograms}
+
+    def progress_line(self, counter: str) -> str:
+        """One line: the counter's total and rate, plus each histogram's count and p50/p95."""
+        elapsed = max(time.time() - self.started, 1e-9)
+        done = self.counter(counter)
+        with self._lock:
+            timings = [f"{name}{_label_text(labels)} n={h.count} p50={h.quantile(0.5):.2f}s p95={h.quantile(0.95):.2f}s"
+                       for (name, labels), h in sorted(self._histograms.items())]
+        return f"[progress {elapsed:.0f}s] {counter}={done} ({done / elapsed:.2f}/s) | " + " | ".join(timings)
+
+    def start_reporter(self, interval: float, counter: str) -> _Reporter:
+        """Prints ``progress_line(counter)`` every ``interval`` seconds until ``.stop()``."""
+        return _Reporter(self, interval, counter)
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            for name in sorted({name for (name, _), _ in counters}):
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} counter")
+                lines += [f"{PROMETHEUS_PREFIX}{name}{_label_text(labels)} {value}"
+                          for (counter_name, labels), value in counters if counter_name == name]
+            for name in sorted({name for (name, _), _ in histograms}):
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} histogram")
+                for (histogram_name, labels), h in histograms:
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(list(BUCKETS) + ["+Inf"], h.counts):
+                        cumulative += n
+                        le = f'le="{bound}"'
+                        lines.append(f"{PROMETHEUS_PREFIX}{name}_bucket{_label_text(labels, le)} {cumulative}")
+                    lines.append(f"{PROMETHEUS_PREFIX}{name}_sum{_label_text(labels)} {h.sum}")
+                    lines.append(f"{PROMETHEUS_PREFIX}{name}_count{_label_text(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Writes the metrics to ``path``: Prometheus text for .prom/.txt, JSON otherwise."""
+        if os.path.splitext(path)[1] in (".prom", ".txt"):
+            payload = self.prometheus_text()
+        else:
+            payload = json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+
+METRICS = Metrics()
+
+
+class _ThreadSnapshot:
+    """A profiler still running on another thread, in the form pstats.Stats accepts (it would disable it)."""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def create_stats(self):
+        self.profiler.snapshot_stats()
+        self.stats = self.profiler.stats
+
+
+def start_profile(path: str = None):
+    """Starts cProfile if ``path`` is given; returns a function that stops it and dumps the stats there.
+
+    cProfile only sees the thread that enables it, so every thread started
+    afterwards (the worker pools) gets its own profiler and the dump merges
+    them all. On Python 3.12+ a single profiler already covers every thread.
+    """
+    if not path:
+        return lambda: None
+    profiler = cProfile.Profile()
+    thread_profilers = []
+    lock = threading.Lock()
+
+    def profile_thread(*_):
+        # Called on a new thread's first event; its own profiler replaces this hook
+        sys.setprofile(None)
+        thread_profiler = cProfile.Profile()
+        try:
+            thread_profiler.enable()
+        except ValueError:
+            return
+        with lock:
+            thread_profilers.append(thread_profiler)
+
+    threading.setprofile(profile_thread)
+    profiler.enable()
+
+    def stop():
+        threading.setprofile(None)
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+        with lock:
+            for thread_profiler in thread_profilers:
+                stats.add(_ThreadSnapshot(thread_profiler))
+        stats.dump_stats(path)
+        print(f"Profile of {1 + len(thread_profilers)} threads written to {path} (view with: python -m pstats {path})")
+    return stop
@@ -0,0 +1,167 @@
+"""Pool of proxy endpoints with health scoring and latency-aware routing.
+
+Each proxy keeps an exponentially weighted latency and error rate. ``choose``
+sends a request to the proxy with the best score (latency, scaled up by its
+error rate and by how many requests it already has in flight). A proxy that
+fails ``FAIL_THRESHOLD`` times in a row is taken out of rotation with an
+exponential backoff, and comes back automatically once the backoff expires.
+
+    with POOL.use() as proxy:
+        resp = session.get(url, proxies=proxy.proxies, timeout=proxy.timeout())
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FAIL_THRESHOLD = 3
+BASE_BACKOFF = 10.0
+MAX_BACKOFF = 600.0
+# Weight of the newest sample in the rolling averages
+EWMA_ALPHA = 0.2
+# Latency assumed for a proxy nobody has measured yet (seconds)
+INITIAL_LATENCY = 2.0
+
+
+def load_proxy_urls(path: str) -> list:
+    """One proxy URL per line; blank lines and # comments are ignored."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def mask_proxy(url: str) -> str:
+    """Hides the password part of a proxy URL for printing."""
+    if "@" not in url:
+        return url
+    creds, host = url.rsplit("@", 1)
+    scheme, _, user = creds.rpartition("//")
+    return f"{scheme}//{user.split(':', 1)[0]}:***@{host}"
+
+
+class Proxy:
+    def __init__(self, url: str):
+        self.url = url
+        self.proxies = {"http": url, "https": url}
+        self.latency = INITIAL_LATENCY
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.banned_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def score(self) -> float:
+        return self.latency * (1 + 4 * self.error_rate) * (1 + self.in_flight)
+
+    def timeout(self, floor: float = 10.0, ceiling: float = 45.0) -> float:
+        """Request timeout scaled to this proxy's typical latency, so one stall doesn't cost the full 45s."""
+        return min(ceiling, max(floor, 5 * self.latency))
+
+    def __repr__(self):
+        return f"Proxy({mask_proxy(self.url)})"
+
+
+class _Use:
+    def __init__(self, pool):
+        self.pool = pool
+        self.proxy = None
+        self.started = 0.0
+
+    def __enter__(self) -> Proxy:
+        self.proxy = self.pool.choose()
+        self.started = time.monotonic()
+        return self.proxy
+
+    def __exit__(self, exc_type, exc, tb):
+        if isinstance(exc, asyncio.CancelledError):
+            # e.g. the losing copy of a hedged request: says nothing about the proxy
+            self.pool.abandon(self.proxy)
+        else:
+            self.pool.report(self.proxy, time.monotonic() - self.started, ok=exc is None)
+        return False
+
+
+class ProxyPool:
+    def __init__(self, urls: list):
+        if not urls:
+            raise ValueError("ProxyPool needs at least one proxy URL")
+        self.proxies = [Proxy(url) for url in urls]
+        self._lock = threading.Lock()
+
+    def use(self) -> _Use:
+        """Context manager: picks a proxy and reports the outcome (an exception counts as a failure)."""
+        return _Use(self)
+
+    def choose(self) -> Proxy:
+        with self._lock:
+            now = time.monotonic()
+            healthy = [p for p in self.proxies if p.banned_until <= now]
+            if healthy:
+                proxy = min(healthy, key=Proxy.score)
+            else:
+                # Everything is backing off; use whichever comes back first rather than stalling
+                proxy = min(self.proxies, key=lambda p: p.banned_until)
+            proxy.in_flight += 1
+            return proxy
+
+    def abandon(self, proxy: Proxy):
+        """Frees a proxy whose request was given up before it answered, without scoring it."""
+        with self._lock:
+            proxy.in_flight -= 1
+
+    def report(self, proxy: Proxy, latency: float, ok: bool):
+        with self._lock:
+            proxy.in_flight -= 1
+            proxy.requests += 1
+            proxy.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - proxy.error_rate)
+            if ok:
+                proxy.latency += EWMA_ALPHA * (latency - proxy.latency)
+                proxy.consecutive_failures = 0
+                proxy.banned_until = 0.0
+                return
+            proxy.errors += 1
+            proxy.consecutive_failures += 1
+            if proxy.consecutive_failures >= FAIL_THRESHOLD:
+                backoff = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (proxy.consecutive_failures - FAIL_THRESHOLD))
+                proxy.banned_until = time.monotonic() + backoff
+                print(f"  - Proxy {mask_proxy(proxy.url)} failed {proxy.consecutive_failures}x in a row; out of rotation for {backoff:.0f}s")
+
+    def probe(self, proxy: Proxy, test_url: str, timeout: float = 30.0) -> dict:
+        """Makes one request through ``proxy`` and feeds the result into its statistics."""
+        with self._lock:
+            proxy.in_flight += 1
+        started = time.monotonic()
+        result = {"proxy": proxy, "ok": False, "latency": None, "body": None, "error": None}
+        try:
+            resp = requests.get(test_url, proxies=proxy.proxies, timeout=timeout)
+            resp.raise_for_status()
+            result.update(ok=True, body=resp.text.strip())
+        except Exception as e:
+            result["error"] = str(e)
+        result["latency"] = time.monotonic() - started
+        self.report(proxy, result["latency"], result["ok"])
+        return result
+
+    def probe_all(self, test_url: str, rounds: int = 1, timeout: float = 30.0, workers: int = 16) -> list:
+        """Probes every proxy ``rounds`` times, all concurrently. Returns the individual results."""
+        jobs = [proxy for _ in range(rounds) for proxy in self.proxies]
+        with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            return list(executor.map(lambda proxy: self.probe(proxy, test_url, timeout), jobs))
+
+    def summary(self) -> list:
+        with self._lock:
+            now = time.monotonic()
+            return [{
+                "proxy": mask_proxy(p.url),
+                "latency": round(p.latency, 2),
+                "error_rate": round(p.error_rate, 2),
+                "requests": p.requests,
+                "errors": p.errors,
+                "in_flight": p.in_flight,
+                "backoff": round(max(0.0, p.banned_until - now), 1),
+            } for p in sorted(self.proxies, key=Proxy.score)]
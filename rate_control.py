@@ -0,0 +1,224 @@
+"""Adaptive request rate and concurrency control shared by the scrapers.
+
+A ``RateController`` combines a token bucket (requests per second) with an
+AIMD concurrency limit. Every finished request reports its latency and status:
+fast successes grow both limits additively, while 429/5xx responses, transport
+errors (connection failures, timeouts) and very slow answers cut them in half.
+Anything else raised inside the slot, such as a 404 from ``raise_for_status()``
+or a body that is not JSON, is the request's own problem and leaves the limits
+alone. A ``Retry-After`` header pauses all callers until it has passed.
+
+    with RATE.slot() as slot:
+        resp = session.get(...)
+        slot.observe(resp.status_code, resp.headers.get("Retry-After"))
+
+``async with RATE.async_slot()`` is the asyncio equivalent. A request that is
+abandoned, such as the losing copy of a hedged request (``slot.cancel()``, or
+task cancellation in asyncio), gives its slot back without counting towards
+either limit.
+"""
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Statuses that mean "slow down" rather than "this request is bad"; any other 5xx counts too
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Exceptions that mean the server or the path to it is struggling
+TRANSPORT_ERRORS = (ConnectionError, TimeoutError, asyncio.TimeoutError)
+try:
+    import requests
+    TRANSPORT_ERRORS += (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+except ImportError:
+    pass
+try:
+    import aiohttp
+    TRANSPORT_ERRORS += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+except ImportError:
+    pass
+
+
+def is_congestion(status=None, exc=None) -> bool:
+    """True for a throttling/5xx status or a transport error, the signals that should slow everyone down."""
+    if status is not None and (status in THROTTLE_STATUSES or status >= 500):
+        return True
+    return isinstance(exc, TRANSPORT_ERRORS)
+
+
+def parse_retry_after(value) -> float:
+    """Seconds to wait for a Retry-After header (delta-seconds or HTTP date); 0 if absent/invalid."""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class _Slot:
+    def __init__(self, controller):
+        self.controller = controller
+        self.status = None
+        self.retry_after = None
+        self.failed = False
+        self.cancelled = False
+        self.started = time.monotonic()
+
+    def observe(self, status: int, retry_after=None):
+        self.status = status
+        self.retry_after = retry_after
+
+    def fail(self):
+        """Counts the request as an error even though no exception was raised."""
+        self.failed = True
+
+    def cancel(self):
+        """Releases the slot without feeding its latency or outcome to the AIMD limits."""
+        self.cancelled = True
+
+    def _finish(self, exc):
+        latency = time.monotonic() - self.started
+        if self.cancelled or isinstance(exc, asyncio.CancelledError):
+            self.controller.release(latency, False, counted=False)
+            return
+        error = self.failed or is_congestion(self.status, exc)
+        self.controller.release(latency, error, parse_retry_after(self.retry_after))
+
+
+class _SyncSlot(_Slot):
+    def __enter__(self):
+        self.controller.acquire()
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._finish(exc)
+        return False
+
+
+class _AsyncSlot(_Slot):
+    async def __aenter__(self):
+        await self.controller.acquire_async()
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._finish(exc)
+        return False
+
+
+class RateController:
+    """Token bucket + AIMD concurrency limit, safe to share across threads (or one event loop)."""
+
+    def __init__(self, rate: float = 5.0, min_rate: float = 0.5, max_rate: float = 50.0,
+                 concurrency: int = 10, min_concurrency: int = 1, max_concurrency: int = 64,
+                 target_latency: float = 5.0, rate_step: float = 0.2, cooldown: float = 2.0, jitter: float = 0.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        # Answers slower than this count as a congestion signal
+        self.target_latency = target_latency
+        self.rate_step = rate_step
+        # Minimum time between two multiplicative decreases, so one burst of errors halves once
+        self.cooldown = cooldown
+        # Random extra delay, as a fraction of the token interval, to avoid a fixed request rhythm
+        self.jitter = jitter
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.successes = 0
+        self.errors = 0
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def slot(self) -> _SyncSlot:
+        return _SyncSlot(self)
+
+    def async_slot(self) -> _AsyncSlot:
+        return _AsyncSlot(self)
+
+    def limits(self) -> dict:
+        with self._cond:
+            return {
+                "rate": round(self.rate, 2),
+                "concurrency": int(self.concurrency),
+                "in_flight": self.in_flight,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+                "successes": self.successes,
+                "errors": self.errors,
+            }
+
+    def describe(self) -> str:
+        limits = self.limits()
+        text = f"rate={limits['rate']}/s concurrency={limits['in_flight']}/{limits['concurrency']}"
+        if limits["paused_for"]:
+            text += f" paused {limits['paused_for']}s"
+        return text
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait <= 0:
+                    return
+                self._cond.wait(wait)
+
+    async def acquire_async(self):
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait <= 0:
+                return
+            # No cross-loop notify here, so poll a bit faster than the sync path
+            await asyncio.sleep(min(wait, 0.05))
+
+    def release(self, latency: float, error: bool, retry_after: float = 0.0, counted: bool = True):
+        with self._cond:
+            self.in_flight -= 1
+            if not counted:
+                self._cond.notify_all()
+                return
+            now = time.monotonic()
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            if error or latency > 2 * self.target_latency:
+                self.errors += error
+                if now - self._last_decrease >= self.cooldown:
+                    self._last_decrease = now
+                    self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                    self.rate = max(self.min_rate, self.rate / 2)
+            else:
+                self.successes += 1
+                if latency <= self.target_latency:
+                    # +1 concurrency per "window" of successes, the classic AIMD increase
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+                    self.rate = min(self.max_rate, self.rate + self.rate_step)
+            self._cond.notify_all()
+
+    def _try_acquire(self) -> float:
+        """Takes a slot and a token if both are free; otherwise returns how long to wait. Caller holds the lock."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            # Woken by release(); the timeout only guards against a missed notify
+            return 0.5
+        self._tokens = min(1.0, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        if self._tokens < 1.0:
+            wait = (1.0 - self._tokens) / self.rate
+            return wait + random.uniform(0, self.jitter * wait)
+        self._tokens -= 1.0
+        self.in_flight += 1
+        return 0.0
@@ -0,0 +1,299 @@
+"""Append-only archive of raw responses (GraphQL JSON, product HTML) for offline re-parsing.
+
+Every body is compressed on its own (zstd when the ``zstandard`` package is
+installed, zlib otherwise) and appended to the current segment file; a
+segment is closed once it passes ``segment_bytes``. A GraphQL detail body is
+only a kilobyte or two, too little for zstd to find much to reuse, so after
+DICT_SAMPLES bodies of one kind a zstd dictionary is trained on them and
+stored in the index; later bodies of that kind are compressed with it (about
+twice as small for bina.az details). An SQLite index next to
+the segments maps ``(source, kind, key, fetched_at)`` to the segment, offset
+and length of the body, so one response can be read back without touching
+the others, and a replay can read whole segments front to back.
+
+    archive = RawArchive("raw_archive")
+    archive.put("binaz", "CurrentItem", "4757585", resp.content, url=resp.url)
+    ...
+    for entry, body in archive.iter_bodies("binaz", "CurrentItem"):   # latest fetch per key
+        parse(json.loads(body))
+
+Each writer process appends to segments of its own, so several scrapers can
+share one archive directory.
+
+    python raw_archive.py raw_archive                                # what's in it
+    python raw_archive.py raw_archive --show binaz CurrentItem 4757585
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+from collections import namedtuple
+
+try:
+    import zstandard
+except ImportError:  # bodies are zlib-compressed instead
+    zstandard = None
+
+SEGMENT_BYTES = 256 * 1024 * 1024
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+INDEX_NAME = "index.sqlite"
+# Index rows are committed in batches; bodies written after the last commit are lost on a hard kill
+FLUSH_EVERY = 200
+# Bodies of one (source, kind) collected before its zstd dictionary is trained; 0 disables dictionaries
+DICT_SAMPLES = 200
+DICT_BYTES = 64 * 1024
+
+Entry = namedtuple("Entry", "source kind key fetched_at segment offset length size codec dict_id url tag")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    dict_id INTEGER,
+    url TEXT,
+    tag TEXT
+);
+CREATE TABLE IF NOT EXISTS dictionaries (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_key ON responses (source, kind, key, fetched_at);
+CREATE INDEX IF NOT EXISTS responses_fetched ON responses (fetched_at);
+"""
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="milliseconds")
+
+
+class RawArchive:
+    """Thread-safe writer and reader of one archive directory."""
+
+    def __init__(self, directory: str, segment_bytes: int = SEGMENT_BYTES, level: int = None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.codec = "zstd" if zstandard is not None else "zlib"
+        self.level = level if level is not None else (ZSTD_LEVEL if zstandard is not None else ZLIB_LEVEL)
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, INDEX_NAME), check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # zstd (de)compressor objects must not be shared between threads
+        self._local = threading.local()
+        self._segment = None
+        self._segment_name = None
+        self._segment_count = 0
+        self._pending = []
+        self._closed = False
+        # (source, kind) -> (dict_id, ZstdCompressionDict) used for new bodies; None once training failed
+        self._dicts = {}
+        self._samples = {}
+        self._loaded_dicts = {}
+        if self.codec == "zstd":
+            for dict_id, source, kind in self._conn.execute("SELECT id, source, kind FROM dictionaries ORDER BY id"):
+                self._dicts[(source, kind)] = (dict_id, self._dictionary(dict_id))
+
+    # --- writing ---
+
+    def _compress(self, body: bytes, dictionary) -> bytes:
+        if self.codec == "zlib":
+            return zlib.compress(body, self.level)
+        dict_id, dict_data = dictionary or (None, None)
+        compressors = getattr(self._local, "compressors", None)
+        if compressors is None:
+            compressors = self._local.compressors = {}
+        if dict_id not in compressors:
+            compressors[dict_id] = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+        return compressors[dict_id].compress(body)
+
+    def _train(self, source: str, kind: str, samples: list):
+        """Trains and stores the dictionary for ``(source, kind)``; called with the lock held."""
+        try:
+            dict_data = zstandard.train_dictionary(DICT_BYTES, samples)
+        except zstandard.ZstdError as e:
+            print(f"[archive] no zstd dictionary for {source}/{kind}: {e}")
+            self._dicts[(source, kind)] = None
+            return
+        with self._conn:
+            dict_id = self._conn.execute("INSERT INTO dictionaries (source, kind, created_at, data) VALUES (?, ?, ?, ?)",
+                                         (source, kind, _now(), dict_data.as_bytes())).lastrowid
+        self._loaded_dicts[dict_id] = dict_data
+        self._dicts[(source, kind)] = (dict_id, dict_data)
+
+    def put(self, source: str, kind: str, key, body, url: str = None, tag: str = None, fetched_at: str = None):
+        """Archives one response body (bytes or str) under ``(source, kind, key)``."""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        dictionary = self._dicts.get((source, kind))
+        frame = self._compress(body, dictionary)
+        with self._lock:
+            if self._closed:
+                # A straggler (e.g. a hedged request's losing copy) finishing after the run ended
+                return
+            if self._segment is None or self._segment.tell() + len(frame) > self.segment_bytes:
+                self._rotate()
+            offset = self._segment.tell()
+            self._segment.write(frame)
+            self._pending.append((source, kind, str(key), fetched_at or _now(), self._segment_name, offset,
+                                  len(frame), len(body), self.codec, dictionary[0] if dictionary else None, url, tag))
+            if self.codec == "zstd" and DICT_SAMPLES and (source, kind) not in self._dicts:
+                samples = self._samples.setdefault((source, kind), [])
+                samples.append(body)
+                if len(samples) >= DICT_SAMPLES:
+                    self._train(source, kind, self._samples.pop((source, kind)))
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush()
+
+    def _rotate(self):
+        if self._segment is not None:
+            self._flush()
+            self._segment.close()
+        self._segment_count += 1
+        # Unique per process, so concurrent writers never append to the same file
+        self._segment_name = f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}-{self._segment_count:04d}.seg"
+        self._segment = open(os.path.join(self.directory, self._segment_name), "ab")
+
+    def _flush(self):
+        if self._segment is not None:
+            self._segment.flush()
+        if self._pending:
+            with self._conn:
+                self._conn.executemany("INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._pending)
+            self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._flush()
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            self._conn.close()
+
+    # --- reading ---
+
+    def entries(self, source: str, kind: str = None, tag: str = None, since: str = None, latest: bool = True) -> list:
+        """Index entries in segment order (the fastest order to read them in).
+
+        ``latest`` keeps only the newest fetch of each key; ``since`` is an ISO
+        time, e.g. "2025-07-24", that fetches must not be older than.
+        """
+        where, params = ["source = ?"], [source]
+        for column, value in (("kind", kind), ("tag", tag)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            where.append("fetched_at >= ?")
+            params.append(since)
+        columns = ", ".join(Entry._fields)
+        query = f"SELECT {columns} FROM responses WHERE {' AND '.join(where)}"
+        if latest:
+            # SQLite returns the other columns from the row that holds the MAX()
+            query = (f"SELECT {columns} FROM (SELECT {columns}, MAX(fetched_at) FROM responses "
+                     f"WHERE {' AND '.join(where)} GROUP BY source, kind, key)")
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(query + " ORDER BY segment, offset", params).fetchall()
+        return [Entry(*row) for row in rows]
+
+    def _dictionary(self, dict_id: int):
+        if dict_id not in self._loaded_dicts:
+            data, = self._conn.execute("SELECT data FROM dictionaries WHERE id = ?", (dict_id,)).fetchone()
+            self._loaded_dicts[dict_id] = zstandard.ZstdCompressionDict(data)
+        return self._loaded_dicts[dict_id]
+
+    def _decompress(self, frame: bytes, entry: Entry) -> bytes:
+        if entry.codec == "zlib":
+            return zlib.decompress(frame)
+        if zstandard is None:
+            raise ImportError("this archive has zstd-compressed bodies; pip install zstandard")
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        if entry.dict_id not in decompressors:
+            with self._lock:
+                dict_data = self._dictionary(entry.dict_id) if entry.dict_id is not None else None
+            decompressors[entry.dict_id] = zstandard.ZstdDecompressor(dict_data=dict_data)
+        return decompressors[entry.dict_id].decompress(frame)
+
+    def read(self, entry: Entry) -> bytes:
+        with open(os.path.join(self.directory, entry.segment), "rb") as f:
+            f.seek(entry.offset)
+            return self._decompress(f.read(entry.length), entry)
+
+    def get(self, source: str, kind: str, key) -> bytes:
+        """The newest archived body for ``key``, or None."""
+        with self._lock:
+            self._flush()
+            row = self._conn.execute(f"SELECT {', '.join(Entry._fields)} FROM responses WHERE source = ? AND kind = ? AND key = ? "
+                                     "ORDER BY fetched_at DESC, rowid DESC LIMIT 1", (source, kind, str(key))).fetchone()
+        return self.read(Entry(*row)) if row else None
+
+    def iter_bodies(self, source: str, kind: str = None, tag: str = None, since: str = None, latest: bool = True):
+        """Yields ``(entry, body)`` for ``entries(...)``, reading each segment once, front to back."""
+        segment_name, f = None, None
+        try:
+            for entry in self.entries(source, kind, tag, since, latest):
+                if entry.segment != segment_name:
+                    if f is not None:
+                        f.close()
+                    segment_name = entry.segment
+                    f = open(os.path.join(self.directory, segment_name), "rb")
+                f.seek(entry.offset)
+                yield entry, self._decompress(f.read(entry.length), entry)
+        finally:
+            if f is not None:
+                f.close()
+
+    def stats(self) -> list:
+        """``(source, kind, responses, distinct keys, raw bytes, stored bytes)`` per source and kind."""
+        with self._lock:
+            self._flush()
+            return self._conn.execute("SELECT source, kind, COUNT(*), COUNT(DISTINCT key), SUM(size), SUM(length) "
+                                      "FROM responses GROUP BY source, kind ORDER BY source, kind").fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a raw-response archive.")
+    parser.add_argument("directory")
+    parser.add_argument("--show", nargs=3, metavar=("SOURCE", "KIND", "KEY"), help="write the newest body for KEY to stdout")
+    args = parser.parse_args()
+
+    archive = RawArchive(args.directory)
+    try:
+        if args.show:
+            body = archive.get(*args.show)
+            if body is None:
+                sys.exit(f"{' '.join(args.show)} is not in {args.directory}")
+            sys.stdout.buffer.write(body)
+            return
+        for source, kind, n, keys, size, length in archive.stats():
+            print(f"{source:<8} {kind:<18} {n:>9} responses {keys:>9} keys "
+                  f"{size / 1024 / 1024:>9.1f} MiB raw {length / 1024 / 1024:>8.1f} MiB stored ({size / max(length, 1):.1f}x)")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""Retries, a circuit breaker and hedged requests around one network call.
+
+    data = retry_call(lambda: hedged_call(fetch, LATENCY.quantile("CurrentItem", 0.95), POOL),
+                      attempts=4, breaker=BREAKER, stop=stop_requested)
+
+``classify`` decides whether a failure is worth another attempt: transport
+errors, timeouts, truncated/garbled bodies and 408/429/5xx are; any other HTTP
+error is the site's final answer. Retries wait a jittered exponential backoff
+("full jitter", so workers that failed together don't retry together), and at
+least as long as a ``Retry-After`` header asks.
+
+A ``CircuitBreaker`` watches the outcome of the last requests. When too many of
+them fail it opens and every caller waits out the cooldown instead of burning
+requests (and listings) against a broken proxy or site; then a single probe
+request decides whether to close again or wait twice as long. The probe is the
+caller that ``before_call`` handed a token to, and only an outcome recorded with
+that token counts.
+
+``hedged_call`` sends a second copy of a call that hasn't answered after
+``delay`` seconds and returns whichever answers first. The other copy is
+cancelled: each copy gets its own ``threading.Event``, which is set once the
+race is decided, and the copy is expected to check it and raise ``Cancelled``
+instead of using or recording its answer. ``LatencyWindow`` keeps recent
+latencies so the delay can follow the observed p95.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from metrics import METRICS
+from rate_control import parse_retry_after
+
+try:
+    import aiohttp
+except ImportError:  # only the async engine raises aiohttp errors
+    aiohttp = None
+
+# Statuses that may well succeed when asked again
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+RETRY_ATTEMPTS = 4
+# Backoff before retry n (0-based) is uniform in [0, min(BACKOFF_CAP, BACKOFF_BASE * 2**n)]
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 20.0
+
+
+class Cancelled(Exception):
+    """Raised by a hedged copy whose twin already answered."""
+
+
+def error_status(exc):
+    """The HTTP status carried by a requests/aiohttp error, or None."""
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if status is not None else getattr(exc, "status", None)
+
+
+def classify(exc) -> str:
+    """Returns "retry" for transient failures, "fatal" for errors that another attempt won't fix."""
+    status = error_status(exc)
+    if status is not None:
+        return "retry" if status in RETRY_STATUSES else "fatal"
+    # requests' errors are OSErrors; ValueError is a body that isn't valid JSON (proxy error pages, cut-off reads)
+    if isinstance(exc, (OSError, TimeoutError, asyncio.TimeoutError, ValueError)):
+        return "retry"
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientError):
+        return "retry"
+    return "fatal"
+
+
+def failure_reason(exc) -> str:
+    status = error_status(exc)
+    return str(status) if status is not None else type(exc).__name__
+
+
+def retry_after(exc) -> float:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or getattr(exc, "headers", None) or {}
+    return parse_retry_after(headers.get("Retry-After"))
+
+
+def backoff_delay(attempt: int, wait_at_least: float = 0.0) -> float:
+    return max(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)), wait_at_least)
+
+
+class CircuitBreaker:
+    """Opens when ``error_ratio`` of the last ``window`` calls (at least ``min_calls``) failed.
+
+    Closed: calls go through. Open: callers wait until the cooldown has passed.
+    Half-open: one probe call goes through; success closes the breaker, failure
+    reopens it with the cooldown doubled (up to ``max_cooldown``). The probe's
+    caller gets a token from ``before_call`` and passes it to ``record``; other
+    outcomes recorded while half-open (calls that were in flight before the
+    breaker opened) don't count, and ``abandon`` frees a probe that ended without
+    an outcome.
+    """
+
+    def __init__(self, window: int = 50, min_calls: int = 20, error_ratio: float = 0.5,
+                 cooldown: float = 30.0, max_cooldown: float = 300.0, name: str = "requests"):
+        self.min_calls = min_calls
+        self.error_ratio = error_ratio
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.name = name
+        self.state = "closed"
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.opens = 0
+        self._outcomes = deque(maxlen=window)
+        # Token of the probe in flight while half-open, None otherwise
+        self._probe = None
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> tuple:
+        """``(seconds to wait, probe token)``; 0 seconds means go ahead, and a token means the caller is the probe."""
+        with self._lock:
+            if self.state == "closed":
+                return 0.0, None
+            now = time.monotonic()
+            if now < self.open_until:
+                return self.open_until - now, None
+            if self._probe is not None:
+                # Someone else's probe is in flight; check back shortly
+                return 1.0, None
+            self.state = "half-open"
+            self._probe = object()
+            return 0.0, self._probe
+
+    def before_call(self, stop: threading.Event = None):
+        """Waits until a call may go out. Returns the probe token for ``record`` (None unless half-open)."""
+        while True:
+            delay, token = self.wait_time()
+            if delay <= 0 or (stop is not None and stop.is_set()):
+                return token
+            time.sleep(min(delay, 1.0))
+
+    async def before_call_async(self, stop: threading.Event = None):
+        while True:
+            delay, token = self.wait_time()
+            if delay <= 0 or (stop is not None and stop.is_set()):
+                return token
+            await asyncio.sleep(min(delay, 1.0))
+
+    def abandon(self, token):
+        """Frees the probe slot if ``token``'s call ended without ``record`` (cancelled, interrupted)."""
+        with self._lock:
+            if token is not None and token is self._probe:
+                self._probe = None
+
+    def record(self, ok: bool, token=None):
+        with self._lock:
+            if self.state == "open":
+                # Stragglers that were in flight when it opened
+                return
+            if self.state == "half-open":
+                if token is None or token is not self._probe:
+                    # Only the probe decides; this call was admitted before the breaker opened
+                    return
+                self._probe = None
+                if ok:
+                    self.state = "closed"
+                    self.cooldown = self.base_cooldown
+                    self._outcomes.clear()
+                    print(f"Circuit breaker ({self.name}) closed: probe request succeeded")
+                else:
+                    self._open(min(self.cooldown * 2, self.max_cooldown), "probe request failed")
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures >= self.error_ratio * len(self._outcomes):
+                self._open(self.cooldown, f"{failures}/{len(self._outcomes)} recent requests failed")
+
+    def _open(self, cooldown: float, reason: str):
+        self.state = "open"
+        self.cooldown = cooldown
+        self.open_until = time.monotonic() + cooldown
+        self.opens += 1
+        METRICS.inc("breaker_opens", breaker=self.name)
+        print(f"Circuit breaker ({self.name}) open: {reason}; pausing requests for {cooldown:.0f}s")
+
+
+class LatencyWindow:
+    """The last ``size`` successful latencies per key, for quantiles that follow current conditions."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.size = size
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.size)
+            samples.append(seconds)
+
+    def quantile(self, key: str, q: float):
+        """The q-th quantile of ``key``'s recent latencies; None until ``min_samples`` were seen."""
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def retry_call(fn, attempts: int = RETRY_ATTEMPTS, breaker: CircuitBreaker = None,
+               stop: threading.Event = None, **labels):
+    """Calls ``fn()`` up to ``attempts`` times while it fails transiently; re-raises the last error."""
+    for attempt in range(attempts):
+        token = breaker.before_call(stop) if breaker else None
+        try:
+            result = fn()
+        except Exception as exc:
+            transient = classify(exc) == "retry"
+            if breaker:
+                # A 404 is an answer, not an outage
+                breaker.record(not transient, token)
+            if not transient or attempt + 1 == attempts or (stop is not None and stop.is_set()):
+                raise
+            METRICS.inc("retries", reason=failure_reason(exc), **labels)
+            delay = backoff_delay(attempt, retry_after(exc))
+            if stop is not None:
+                stop.wait(delay)
+            else:
+                time.sleep(delay)
+        else:
+            if breaker:
+                breaker.record(True, token)
+            return result
+        finally:
+            if breaker:
+                # No-op once recorded; frees the probe if fn() was interrupted
+                breaker.abandon(token)
+
+
+async def retry_call_async(make_coro, attempts: int = RETRY_ATTEMPTS, breaker: CircuitBreaker = None,
+                           stop: threading.Event = None, **labels):
+    """``retry_call`` for coroutines; ``make_coro()`` must return a fresh awaitable per attempt."""
+    for attempt in range(attempts):
+        token = await breaker.before_call_async(stop) if breaker else None
+        try:
+            result = await make_coro()
+        except Exception as exc:
+            transient = classify(exc) == "retry"
+            if breaker:
+                breaker.record(not transient, token)
+            if not transient or attempt + 1 == attempts or (stop is not None and stop.is_set()):
+                raise
+            METRICS.inc("retries", reason=failure_reason(exc), **labels)
+            # ``stop`` is a threading.Event (set by a signal handler), so it is polled between short sleeps
+            deadline = time.monotonic() + backoff_delay(attempt, retry_after(exc))
+            while time.monotonic() < deadline and not (stop is not None and stop.is_set()):
+                await asyncio.sleep(min(deadline - time.monotonic(), 1.0))
+        else:
+            if breaker:
+                breaker.record(True, token)
+            return result
+        finally:
+            if breaker:
+                # Task cancellation is a BaseException: the probe slot must not stay taken
+                breaker.abandon(token)
+
+
+def hedged_call(fn, delay, executor, **labels):
+    """Runs ``fn(cancelled)`` on ``executor``; if it hasn't answered after ``delay`` seconds, runs a second copy.
+
+    Returns the first successful result (an error only if both copies fail).
+    The slower copy's ``cancelled`` event is then set (by the winner's own
+    thread, so a twin still queued behind it sees it), and the copy is cancelled
+    outright if it hasn't started. A copy that is already running should check
+    the event once it has a rate slot and once its answer arrives, and raise
+    ``Cancelled``. ``delay=None`` calls ``fn`` directly.
+    """
+    events = [threading.Event(), threading.Event()]
+    if delay is None:
+        return fn(events[0])
+
+    def copy(i):
+        result = fn(events[i])
+        events[1 - i].set()
+        return result
+
+    first = executor.submit(copy, 0)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    METRICS.inc("hedged_requests", **labels)
+    second = executor.submit(copy, 1)
+    pending = {first: events[0], second: events[1]}
+    error = None
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                if future.exception() is None:
+                    METRICS.inc("hedge_wins", winner="hedge" if future is second else "first", **labels)
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        for future, cancelled in pending.items():
+            cancelled.set()
+            future.cancel()
+
+
+async def hedged_call_async(make_coro, delay, **labels):
+    """``hedged_call`` for coroutines; the losing copy is cancelled."""
+    if delay is None:
+        return await make_coro()
+    first = asyncio.ensure_future(make_coro())
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return first.result()
+        METRICS.inc("hedged_requests", **labels)
+        second = asyncio.ensure_future(make_coro())
+        tasks.add(second)
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    METRICS.inc("hedge_wins", winner="hedge" if task is second else "first", **labels)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
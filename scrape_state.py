@@ -0,0 +1,203 @@
+"""Checkpointed output to the listings store, so long scrapes can resume.
+
+Rows are collected as they are scraped and upserted into a ``ListingStore``
+(see listings_store.py) every ``every`` rows, in one transaction. Right after
+that, the IDs finished since the last checkpoint are appended to an ID log
+(``<checkpoint>.ids``, one per line) and a small JSON checkpoint is written
+atomically. The checkpoint records how many bytes of the ID log are
+known-good, the store run the rows belong to, the pagination offset to
+restart from and the list pages that failed. On resume the log is truncated
+back to that length. Rows committed after the last checkpoint are simply
+fetched and upserted again, so a hard kill can't leave anything half-written
+behind. A checkpoint only writes the rows and IDs that are new since the
+previous one, so its cost doesn't grow with the crawl.
+
+There is no CSV during the crawl; the caller exports the run with
+``listings_store.export_csv(store.iter_records(), ...)`` when it is done.
+
+A page is identified by ``(shard, offset)``; unsharded crawls use shard 0.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+
+from metrics import METRICS
+
+
+def _fsync_replace(path: str, payload: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointedWriter:
+    """Writes rows to a ``ListingStore`` and periodically checkpoints crawl progress.
+
+    Pages are tracked per shard by their list offset: a page stays "open"
+    until every item submitted with ``begin_page`` has been written or
+    skipped, and a shard's resume offset is its lowest open page (or the next
+    unlisted one). ``meta`` is stored with the checkpoint as-is, for run
+    settings that --resume has to reuse. ``output`` is the CSV the run is
+    exported to at the end, kept in the checkpoint so a resumed run exports
+    to the same file. A resumed writer switches ``store`` to the run it
+    resumes. All methods are safe to call from several threads.
+    """
+
+    def __init__(self, store, output: str, fieldnames: list, checkpoint_path: str, every: int = 24, state: dict = None, meta: dict = None):
+        state = state or {}
+        self.store = store
+        self.output = output
+        self.fieldnames = fieldnames
+        self.checkpoint_path = checkpoint_path
+        self.every = every
+        self.meta = state.get("meta", meta or {})
+        self.ids_path = checkpoint_path + ".ids"
+        # Checkpoints written before the ID log existed keep their IDs inline; they move to the log
+        self.done_ids = set(state.get("done_ids", []))
+        # Finished since the last checkpoint; appended to the ID log by the next one
+        self.new_ids = sorted(self.done_ids)
+        # Items handed out by begin_page that are not written or skipped yet
+        self.claimed_ids = set()
+        self.next_offsets = {int(shard): offset for shard, offset in state.get("next_offsets", {}).items()}
+        self.open_pages = {}
+        # List pages whose fetch failed; resume_pages hands them out again
+        self.failed_pages = {(int(shard), int(offset)) for shard, offset in state.get("failed_pages", [])}
+        self.written = 0
+        self.since_checkpoint = 0
+        # Rows written since the last checkpoint, upserted into the store by the next one
+        self._rows = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+        if state:
+            self.store.run_id = state.get("run_id", self.store.run_id)
+            if "output_bytes" in state:
+                # Checkpoints from before the store wrote rows to the CSV; its checkpointed part moves to the store
+                with open(output, "r+b") as f:
+                    f.truncate(state["output_bytes"])
+                self.store.import_csv(output)
+            self._ids_file = open(self.ids_path, "a+", encoding="utf-8")
+            self._ids_file.truncate(state.get("ids_bytes", 0))
+            self._ids_file.seek(0)
+            self.done_ids.update(line.rstrip("\n") for line in self._ids_file)
+        else:
+            self._ids_file = open(self.ids_path, "w", encoding="utf-8")
+            self.checkpoint()
+
+    @classmethod
+    def resume(cls, checkpoint_path: str, store, fieldnames: list, every: int = 24):
+        """Reopens the run recorded in ``checkpoint_path``. Returns None if there is nothing to resume."""
+        if not os.path.exists(checkpoint_path):
+            return None
+        with open(checkpoint_path, encoding="utf-8") as f:
+            state = json.load(f)
+        if "output_bytes" in state and not os.path.exists(state["output"]):
+            return None
+        return cls(store, state["output"], fieldnames, checkpoint_path, every, state)
+
+    def resume_pages(self, shard: int, limit: int, pages: int) -> tuple:
+        """``(retries, offsets)``: the offsets of ``shard``'s list pages that failed before the resume
+        offset, and those of the pages from the resume offset on (at most ``pages`` in all)."""
+        with self._lock:
+            start = self._resume_offsets().get(shard, 0)
+            retries = sorted(offset for failed_shard, offset in self.failed_pages if failed_shard == shard and offset < start)
+        return retries, list(range(start - start % limit, pages * limit, limit))
+
+    def fail_page(self, page: tuple):
+        """Records a list page that couldn't be fetched, so --resume fetches it again."""
+        with self._lock:
+            self.failed_pages.add(page)
+
+    def begin_page(self, page: tuple, item_ids: list, limit: int) -> list:
+        """Registers a list page and returns the IDs on it that nobody has written or claimed yet."""
+        shard, offset = page
+        with self._lock:
+            fresh = [item_id for item_id in item_ids
+                     if str(item_id) not in self.done_ids and str(item_id) not in self.claimed_ids]
+            self.claimed_ids.update(str(item_id) for item_id in fresh)
+            self.failed_pages.discard(page)
+            if fresh:
+                self.open_pages[page] = self.open_pages.get(page, 0) + len(fresh)
+            self.next_offsets[shard] = max(self.next_offsets.get(shard, 0), offset + limit)
+            return fresh
+
+    def write_row(self, row, item_id, page: tuple):
+        """Writes ``row``, a sequence of values in ``fieldnames`` order, for item ``item_id``."""
+        with self._lock:
+            self._rows.append(dict(zip(self.fieldnames, row)))
+            self._written(item_id, page)
+
+    def skip(self, item_id, page: tuple):
+        """Marks an item as finished without output (e.g. a failed detail fetch)."""
+        with self._lock:
+            self.claimed_ids.discard(str(item_id))
+            METRICS.inc("items_skipped")
+            self._close_item(page)
+
+    def checkpoint(self):
+        with self._lock:
+            self._checkpoint()
+
+    def close(self):
+        """Writes a last checkpoint. The store stays open; it belongs to the caller."""
+        with self._lock:
+            if self._closed:
+                return
+            self._checkpoint()
+            self._ids_file.close()
+            self._closed = True
+
+    def _written(self, item_id, page: tuple):
+        self.done_ids.add(str(item_id))
+        self.new_ids.append(str(item_id))
+        self.claimed_ids.discard(str(item_id))
+        self.written += 1
+        METRICS.inc("items_written")
+        self._close_item(page)
+        self.since_checkpoint += 1
+        if self.since_checkpoint >= self.every:
+            self._checkpoint()
+
+    def _close_item(self, page: tuple):
+        remaining = self.open_pages.get(page, 0) - 1
+        if remaining > 0:
+            self.open_pages[page] = remaining
+        else:
+            self.open_pages.pop(page, None)
+
+    def _resume_offsets(self) -> dict:
+        offsets = dict(self.next_offsets)
+        for shard, offset in self.open_pages:
+            offsets[shard] = min(offsets.get(shard, offset), offset)
+        return offsets
+
+    def _checkpoint(self):
+        started = time.perf_counter()
+        # Rows before IDs: an ID in the log always has its row committed
+        if self._rows:
+            self.store.append_many(self._rows)
+            self._rows = []
+        # Only the delta: an ID is in the log once, written by the first checkpoint after it finished
+        if self.new_ids:
+            self._ids_file.write("".join(item_id + "\n" for item_id in self.new_ids))
+            self.new_ids = []
+        self._ids_file.flush()
+        os.fsync(self._ids_file.fileno())
+        state = {
+            "output": self.output,
+            "store": self.store.path,
+            "run_id": self.store.run_id,
+            "ids_bytes": os.fstat(self._ids_file.fileno()).st_size,
+            "next_offsets": self._resume_offsets(),
+            "failed_pages": sorted(self.failed_pages),
+            "meta": self.meta,
+            "saved_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        _fsync_replace(self.checkpoint_path, json.dumps(state))
+        self.since_checkpoint = 0
+        METRICS.observe("checkpoint_seconds", time.perf_counter() - started)
@@ -1,9 +1,5 @@
-import pandas as pd
-import time
-import random
-import tempfile
 import shutil
-import os
+import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options
@@ -13,20 +9,72 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from bs4 import BeautifulSoup
 
+from rate_control import RateController
+from tapaz_http import iter_listing_links, scrape_products_http
+from tapaz_extract import elan_id_from_url, extract_product
+from tapaz_pool import BrowserPool
+from listings_store import ListingStore, export_xlsx, skip_known
+from metrics import METRICS, start_profile
+import listings_parquet
+from tapaz_categories import get_category, history_dir, parquet_columns
+from raw_archive import RawArchive
+from tapaz_browser import (DriverManager, apply_lean_options, enable_resource_blocking,
+                           ensure_profile_template, new_profile_dir)
+
 # --- Configuration ---
 BASE_URL = "https://tap.az"
-MAIN_CATEGORY_URL = "/elanlar/neqliyyat/tikinti-texnikasi"
+# Category to scrape: its URL, 'Type of Product' and property labels come from tapaz_categories.py
+CATEGORY = get_category("tikinti-texnikasi")
+MAIN_CATEGORY_URL = CATEGORY.url
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0'
 OUTPUT_FILENAME = "tap_az_tikinti_texnikasi_final1.xlsx"
 BROWSER_RESTART_BATCH_SIZE = 50 
+# Every record is upserted here (keyed by elan_id) as soon as it is scraped; OUTPUT_FILENAME is
+# exported from this run's rows at the end. Shared with the bina.az scraper.
+STORE_FILENAME = "listings.sqlite"
+# Only visit product pages whose elan_id isn't in STORE_FILENAME yet; known products stay in
+# this run's export with their stored data
+INCREMENTAL = True
+# Share of the known products that incremental runs scrape again anyway, to refresh prices
+REFRESH_FRACTION = 0.05
+# Typed daily Parquet snapshots (tap_az_YYYYMMDD.parquet) of each run's records; needs pyarrow
+PARQUET_DIR = "tapaz_history"
+# Per-phase timings and counters (see metrics.py) are written here at the end; .prom for Prometheus text
+METRICS_FILE = "tapaz_metrics.json"
+# Seconds between progress lines
+PROGRESS_EVERY = 30
+# Set to a path (e.g. "tapaz.prof") to run under cProfile
+PROFILE_FILE = None
+# Set to a directory (e.g. "raw_archive") to also keep every product page's HTML there, zstd-compressed
+# (see raw_archive.py); `python tapaz_runner.py --replay DIR` parses the archived pages again offline
+ARCHIVE_DIR = None
+ARCHIVE = RawArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
+# Block images/media/fonts/third-party hosts and return from driver.get at DOMContentLoaded
+LEAN_BROWSING = True
+# New browsers start from a copy of this profile (built on the first run) instead of an empty one
+PROFILE_TEMPLATE_DIR = "chrome_profile_template"
+# Browsers kept launching in the background, so a restart doesn't wait for a cold Chrome start
+SPARE_DRIVERS = 2
+# Parallel Chrome workers for product pages; each restarts its own browser every BROWSER_RESTART_BATCH_SIZE products
+BROWSER_WORKERS = 4
+# Paces product page loads across all browsers (replaces the fixed 0.5-1.5s sleep); slows down when pages fail or get slow
+PACER = RateController(rate=0.7 * BROWSER_WORKERS, min_rate=0.2, max_rate=1.0 * BROWSER_WORKERS, concurrency=BROWSER_WORKERS, max_concurrency=BROWSER_WORKERS, target_latency=8.0, jitter=0.5)
+
+# "http": fetch product pages with plain requests and use Chrome only for pages that fail
+# validation; "browser": load every product page in Chrome as before
+DETAIL_FETCH_MODE = "http"
+# "http": follow the listing's 'next' links with plain requests and stream product links to the
+# detail stage page by page; "browser": click 'Show More' in Chrome until everything is loaded
+LISTING_FETCH_MODE = "http"
 
 # --- Functions ---
 
-def setup_driver():
-    """Initializes a Selenium WebDriver instance with a unique user data directory."""
+def setup_driver(user_data_dir=None):
+    """Initializes a Selenium WebDriver instance with its own user data directory (a copy of the profile template)."""
     print("Initializing a fresh Selenium WebDriver instance...")
     options = Options()
-    user_data_dir = tempfile.mkdtemp()
+    if user_data_dir is None:
+        user_data_dir = new_profile_dir(PROFILE_TEMPLATE_DIR)
     options.add_argument(f"--user-data-dir={user_data_dir}")
     options.add_argument("--headless=new")
     options.add_argument("--disable-gpu")
@@ -35,10 +83,15 @@ def setup_driver():
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument(f"user-agent={USER_AGENT}")
     options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    if LEAN_BROWSING:
+        apply_lean_options(options)
     
     service = ChromeService(executable_path="chromedriver.exe")
-    driver = webdriver.Chrome(service=service, options=options)
+    with METRICS.timer("setup_driver_seconds"):
+        driver = webdriver.Chrome(service=service, options=options)
     driver.user_data_dir = user_data_dir
+    if LEAN_BROWSING:
+        enable_resource_blocking(driver)
     return driver
 
 def cleanup_driver(driver):
@@ -90,25 +143,21 @@ def get_product_urls_from_subcategory(driver, subcategory):
     soup = BeautifulSoup(driver.page_source, 'html.parser')
     return list(set(BASE_URL + link.get('href') for link in soup.select('div.products-i a.products-link') if link.get('href') and '/elanlar/' in link.get('href')))
 
+def extract_category_product(html, url):
+    """extract_product with CATEGORY's 'Type of Product' and field map (archiving the page first, if enabled)."""
+    if ARCHIVE is not None:
+        ARCHIVE.put("tapaz", "product", elan_id_from_url(url), html, url=url, tag=CATEGORY.slug)
+    return extract_product(html, url, CATEGORY.product_type, CATEGORY.fields)
+
 def scrape_product_details(driver, url):
     """Scrapes the detailed information from a single product page."""
     try:
-        driver.get(url)
-        WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.CSS_SELECTOR, "h1.product-title")))
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-
-        def get_text(element): return element.text.strip() if element else None
-        def get_property_value(label_text):
-            for prop in soup.select('.product-properties__i'):
-                label = prop.select_one('.product-properties__i-name')
-                if label and label_text in label.text:
-                    value_el = prop.select_one('.product-properties__i-value')
-                    return get_text(value_el.find('a')) if value_el and value_el.find('a') else get_text(value_el)
-            return None
-
-        price_val = get_text(soup.select_one('.price-val'))
-        description_el = soup.select_one('.product-description__content')
-        return {'Type of Product': "Tikinti Texnikası", 'elan_id': url.split('/')[-1].split('?')[0], 'title': get_text(soup.select_one('h1.product-title')), 'price': int(''.join(filter(str.isdigit, price_val))) if price_val else None, 'city': get_property_value('Şəhər'), 'category': get_property_value('Malın növü'), 'Year': get_property_value('Buraxılış ili'), 'New?': get_property_value('Yeni?'), 'Yurusu_km': get_property_value('Yürüşü, km'), 'Description': ' '.join(description_el.stripped_strings) if description_el else None, 'URL': url}
+        with METRICS.timer("page_load_seconds"):
+            driver.get(url)
+        with METRICS.timer("page_wait_seconds"):
+            WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.CSS_SELECTOR, "h1.product-title")))
+        with METRICS.timer("parse_seconds", source="browser"):
+            return extract_category_product(driver.page_source, url)
     except WebDriverException as e:
         print(f"    - CRITICAL BROWSER ERROR on {url}: {e.args[0].splitlines()[0]}")
         raise
@@ -116,18 +165,32 @@ def scrape_product_details(driver, url):
         print(f"    - Error parsing detail page {url}: {e}")
         return None
 
+def paced_scrape(driver, url):
+    """Runs scrape_product_details under PACER, reporting failed pages so the pace backs off."""
+    with PACER.slot() as slot:
+        details = scrape_product_details(driver, url)
+        if not details:
+            METRICS.inc("browser_failures")
+            slot.fail()
+        return details
+
 # --- Main Execution ---
 if __name__ == "__main__":
-    if os.path.exists(OUTPUT_FILENAME):
-        os.remove(OUTPUT_FILENAME)
-        print(f"Removed old output file: {OUTPUT_FILENAME}")
+    store = ListingStore(STORE_FILENAME, "tapaz", "elan_id")
+    print(f"Storing records of run {store.run_id} in '{STORE_FILENAME}'.")
+    reporter = METRICS.start_reporter(PROGRESS_EVERY, "records_stored")
+    stop_profile = start_profile(PROFILE_FILE)
     
+    ensure_profile_template(PROFILE_TEMPLATE_DIR, setup_driver, BASE_URL + MAIN_CATEGORY_URL)
+    # Every browser below comes from here: launched ahead of time, quit in the background
+    drivers = DriverManager(setup_driver, cleanup_driver, SPARE_DRIVERS)
+
     # Use a temporary driver just to get the list of subcategories
-    driver = setup_driver()
+    driver = drivers.get()
     try:
         subcategories = get_subcategory_urls(driver, MAIN_CATEGORY_URL)
     finally:
-        cleanup_driver(driver)
+        drivers.release(driver)
         print("Temporary driver for subcategory listing closed.")
 
     if not subcategories:
@@ -142,54 +205,72 @@ if __name__ == "__main__":
             # before moving to the next subcategory.
             
             driver = None # Ensure driver is defined before the try block
+            pool = None
             try:
-                driver = setup_driver()
-                product_links = get_product_urls_from_subcategory(driver, subcat)
-                print(f"Found {len(product_links)} products in '{subcat['name']}'. Now scraping their details...")
+                # Browser workers start lazily, when the first product is handed to them
+                pool = BrowserPool(drivers.get, drivers.release, paced_scrape, BROWSER_WORKERS,
+                                   BROWSER_RESTART_BATCH_SIZE, on_record=store.append)
+                if LISTING_FETCH_MODE == "http":
+                    print("Listing products over HTTP; each page's products are scraped as soon as it arrives...")
+                    product_links = iter_listing_links(subcat['url'], USER_AGENT, BASE_URL)
+                else:
+                    driver = drivers.get()
+                    with METRICS.timer("listing_seconds", mode="browser"):
+                        product_links = get_product_urls_from_subcategory(driver, subcat)
+                    # The product pages get browsers of their own; don't keep this one idle meanwhile
+                    drivers.release(driver)
+                    driver = None
+                    print(f"Found {len(product_links)} products in '{subcat['name']}'. Now scraping their details...")
+                link_stats = {}
+                if INCREMENTAL:
+                    # Lazy, so HTTP listing pages still stream straight into the detail stage
+                    product_links = skip_known(product_links, elan_id_from_url, store, REFRESH_FRACTION, link_stats)
 
                 subcategory_data = []
-                products_scraped_since_restart = 0
-                
-                for i, link in enumerate(product_links, 1):
-                    try:
-                        if products_scraped_since_restart >= BROWSER_RESTART_BATCH_SIZE:
-                            print(f"\n--- Reached batch size of {BROWSER_RESTART_BATCH_SIZE}. Restarting browser... ---\n")
-                            cleanup_driver(driver)
-                            driver = setup_driver()
-                            products_scraped_since_restart = 0
-
-                        print(f"  - Scraping product {i}/{len(product_links)}: {link}")
-                        details = scrape_product_details(driver, link)
-                        if details:
-                            subcategory_data.append(details)
-                        products_scraped_since_restart += 1
-                        time.sleep(random.uniform(0.5, 1.5))
-                    
-                    except WebDriverException:
-                        print(f"\n--- Browser crashed. Restarting driver and retrying last product... ---\n")
-                        cleanup_driver(driver)
-                        driver = setup_driver()
-                        products_scraped_since_restart = 0
-                        details = scrape_product_details(driver, link)
-                        if details:
-                            subcategory_data.append(details)
-
-                # Save the collected data for this subcategory
-                if subcategory_data:
-                    df_new = pd.DataFrame(subcategory_data)
-                    if not os.path.exists(OUTPUT_FILENAME):
-                        df_new.to_excel(OUTPUT_FILENAME, index=False)
-                        print(f"Created '{OUTPUT_FILENAME}' and saved {len(subcategory_data)} records.")
-                    else:
-                        with pd.ExcelWriter(OUTPUT_FILENAME, mode='a', engine='openpyxl', if_sheet_exists='overlay') as writer:
-                            df_new.to_excel(writer, header=False, index=False, startrow=writer.sheets['Sheet1'].max_row)
-                        print(f"Appended {len(subcategory_data)} new records to '{OUTPUT_FILENAME}'.")
-                
+                if DETAIL_FETCH_MODE == "http":
+                    # Pages that fail over HTTP go straight to the browser pool
+                    subcategory_data, failed_links = scrape_products_http(product_links, extract_category_product, USER_AGENT,
+                                                                          on_record=store.append, on_fallback=pool.submit)
+                    if failed_links:
+                        print(f"{len(failed_links)} products failed over HTTP and were retried in the browser.")
+                else:
+                    for link in product_links:
+                        pool.submit(link)
+                subcategory_data += pool.close()
+                if pool.failed:
+                    print(f"{len(pool.failed)} products could not be scraped in the browser.")
+
+                print(f"Stored {len(subcategory_data)} records from '{subcat['name']}'.")
+                if link_stats:
+                    print(f"Incremental: {link_stats['new']} new, {link_stats['refreshed']} refreshed, "
+                          f"{link_stats['skipped']} already stored and skipped.")
+
             except Exception as e:
                 print(f"An unexpected critical error occurred while processing '{subcat['name']}'. Moving on. Error: {e}")
             finally:
-                # This ensures the driver is ALWAYS cleaned up before the next subcategory starts.
-                cleanup_driver(driver)
+                # This ensures the drivers are ALWAYS cleaned up before the next subcategory starts.
+                if pool:
+                    pool.close()
+                drivers.release(driver)
                 print(f"Driver for '{subcat['name']}' closed.")
 
+    drivers.close()
+
+    # One streaming write of the whole run, instead of re-opening the workbook after every subcategory
+    print(f"\nExporting {store.count()} records to '{OUTPUT_FILENAME}'...")
+    with METRICS.timer("xlsx_export_seconds"):
+        export_xlsx(lambda: store.iter_records(), OUTPUT_FILENAME)
+    if listings_parquet.pa is not None:
+        with METRICS.timer("parquet_write_seconds"):
+            parquet_path = listings_parquet.snapshot_path(history_dir(CATEGORY, PARQUET_DIR), "tap_az", datetime.date.today())
+            listings_parquet.write_parquet(store.iter_records(), parquet_path, parquet_columns(CATEGORY))
+        print(f"Parquet snapshot written to {parquet_path}")
+    store.close()
+    if ARCHIVE is not None:
+        ARCHIVE.close()
+    stop_profile()
+    reporter.stop()
+    METRICS.export(METRICS_FILE)
+    print(METRICS.progress_line("records_stored"))
+    print(f"Metrics written to {METRICS_FILE}")
     print("\nScript finished.")
\ No newline at end of file
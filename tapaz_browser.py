@@ -0,0 +1,205 @@
+"""Chrome settings shared by the tapaz scripts' ``setup_driver``.
+
+"Lean browsing" loads only what the scrapers parse: the HTML (plus the site's
+own scripts and CSS, which the listing's 'Show More' button relies on).
+Images, media, fonts, ads and analytics are blocked through CDP
+``Network.setBlockedURLs``, ``driver.get`` returns at DOMContentLoaded
+(``pageLoadStrategy=eager``) and the WebDriverWait that follows waits only for
+the element we need. Background services that Chrome starts on every fresh
+profile are switched off as well.
+
+Chrome start-up is taken off the critical path too. New browsers get a copy of
+a profile template that has already been through first-run set-up (and has the
+site's scripts in its HTTP cache) instead of an empty temp dir, and a
+``DriverManager`` keeps spare browsers launching in the background so a
+restart hands one over at once:
+
+    ensure_profile_template(PROFILE_TEMPLATE_DIR, setup_driver, warmup_url)
+    drivers = DriverManager(setup_driver, cleanup_driver, spares=2)
+    driver = drivers.get()     # a browser launched in the background
+    drivers.release(driver)    # quit and profile removal also run in the background
+    drivers.close()
+"""
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+from metrics import METRICS
+
+PROFILE_TEMPLATE_DIR = "chrome_profile_template"
+SPARE_DRIVERS = 2
+# Left out when a profile is copied from the template: the template browser's locks and crash dumps
+PROFILE_COPY_IGNORE = shutil.ignore_patterns("Singleton*", "lockfile", "LOCK", "Crashpad", "*.log", "*.tmp")
+
+# URL patterns (CDP wildcard syntax) that never reach the network in lean mode
+BLOCKED_URL_PATTERNS = [
+    # images and media
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+    # fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # ads, analytics and other third-party hosts
+    "*googletagmanager.com*", "*google-analytics.com*", "*analytics.google.com*",
+    "*doubleclick.net*", "*googlesyndication.com*", "*adservice.google.*",
+    "*facebook.net*", "*facebook.com/tr*", "*connect.facebook.*",
+    "*mc.yandex.*", "*yandex.ru/metrika*", "*hotjar.com*", "*clarity.ms*",
+    "*criteo.*", "*adriver.ru*", "*tiktok.com*",
+]
+
+LEAN_CHROME_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,InterestFeedContentSuggestions",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-first-run",
+    "--no-default-browser-check",
+]
+
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.geolocation": 2,
+}
+
+
+def apply_lean_options(options):
+    """Adds the lean-browsing flags, preferences and eager page loading to Chrome ``options``."""
+    options.page_load_strategy = "eager"
+    for argument in LEAN_CHROME_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option("prefs", LEAN_PREFS)
+
+
+def enable_resource_blocking(driver, patterns: list = None):
+    """Blocks ``patterns`` (default BLOCKED_URL_PATTERNS) for every request ``driver`` makes from now on."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns or BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        # Not fatal: the preferences above still keep images out
+        print(f"  - Could not enable CDP resource blocking: {e}")
+
+
+def new_profile_dir(template_dir: str = None) -> str:
+    """Returns a new temp user-data dir, seeded from ``template_dir`` when that exists."""
+    user_data_dir = tempfile.mkdtemp()
+    if template_dir and os.path.isdir(template_dir):
+        shutil.copytree(template_dir, user_data_dir, ignore=PROFILE_COPY_IGNORE, dirs_exist_ok=True)
+    return user_data_dir
+
+
+def ensure_profile_template(template_dir: str, setup_fn, warmup_url: str = "about:blank") -> str:
+    """Builds ``template_dir`` once by running Chrome on an empty profile; later calls return it as is.
+
+    ``setup_fn(user_data_dir)`` must start a driver on that directory. The browser opens
+    ``warmup_url`` so first-run set-up is done and the site's scripts and CSS are cached.
+    """
+    if os.path.isdir(template_dir):
+        return template_dir
+    print(f"Building Chrome profile template '{template_dir}'...")
+    staging_dir = template_dir + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    driver = setup_fn(staging_dir)
+    try:
+        driver.get(warmup_url)
+    except Exception as e:
+        print(f"  - Template warm-up page failed ({e}); keeping the profile anyway.")
+    finally:
+        # Not cleanup_fn: that would delete the profile we want to keep
+        driver.quit()
+    os.replace(staging_dir, template_dir)
+    return template_dir
+
+
+class DriverManager:
+    """Hands out browsers that were launched in the background and disposes of old ones off-thread.
+
+    ``spares`` launches are always running or waiting: every ``get`` takes the oldest one and
+    starts a replacement. ``get``/``release`` fit ``BrowserPool``'s ``setup_fn``/``cleanup_fn``.
+    """
+
+    def __init__(self, setup_fn, cleanup_fn, spares: int = SPARE_DRIVERS):
+        self.setup_fn = setup_fn
+        self.cleanup_fn = cleanup_fn
+        self.spares = spares
+        self.handed_out = 0
+        self.wait_seconds = 0.0
+        # Launched drivers (or the exception their launch raised), oldest first
+        self._ready = queue.Queue()
+        self._threads = []
+        self._closed = False
+        self._lock = threading.Lock()
+        for _ in range(spares):
+            self._start(self._launch)
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._threads.append(thread)
+        thread.start()
+
+    def _launch(self):
+        try:
+            driver = self.setup_fn()
+        except Exception as e:
+            self._ready.put(e)
+            return
+        if self._closed:
+            self.cleanup_fn(driver)
+        else:
+            self._ready.put(driver)
+
+    def get(self):
+        """Returns a browser, waiting only if no background launch has finished yet."""
+        if self._closed:
+            raise RuntimeError("DriverManager is closed")
+        if self.spares <= 0:
+            return self.setup_fn()
+        self._start(self._launch)
+        started = time.perf_counter()
+        driver = self._ready.get()
+        waited = time.perf_counter() - started
+        METRICS.observe("driver_wait_seconds", waited)
+        with self._lock:
+            self.handed_out += 1
+            self.wait_seconds += waited
+        if isinstance(driver, Exception):
+            raise driver
+        return driver
+
+    def release(self, driver):
+        """Quits ``driver`` and removes its profile in the background."""
+        if not driver:
+            return
+        if self._closed:
+            self.cleanup_fn(driver)
+        else:
+            self._start(self.cleanup_fn, driver)
+
+    def close(self):
+        """Waits for pending launches and disposals, then quits the unused spares."""
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            threads = list(self._threads)
+        for thread in threads:
+            thread.join()
+        while not self._ready.empty():
+            driver = self._ready.get_nowait()
+            if not isinstance(driver, Exception):
+                self.cleanup_fn(driver)
+        if self.handed_out:
+            print(f"Driver manager: {self.handed_out} browsers handed out, "
+                  f"{self.wait_seconds / self.handed_out:.2f}s average wait for one.")
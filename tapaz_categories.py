@@ -0,0 +1,100 @@
+"""Registry of tap.az categories and the fields each one is read with.
+
+Product pages show a block of "label: value" properties, and the labels
+depend on the category ("Buraxılış ili" and "Yürüşü, km" only exist for
+vehicles). A ``Category`` names its listing URL, the value of the
+'Type of Product' column and its field map (output column -> property label),
+plus the Parquet kind of each field (see listings_parquet.py).
+
+    category = get_category("tikinti-texnikasi")
+    record = extract_product(html, url, category.product_type, category.fields)
+
+More categories can be added without touching code in CATEGORIES_FILE:
+
+    {"yuk-masinlari": {"url": "/elanlar/neqliyyat/yuk-masinlari", "product_type": "Yük maşınları",
+                       "fields": {"city": "Şəhər", "Year": "Buraxılış ili"}, "kinds": {"Year": "int16"}}}
+
+A category that isn't registered at all can still be crawled by its URL; it
+gets COMMON_FIELDS, which every tap.az product page has. ``discover_categories``
+finds every category linked from the site menu (the home page), so
+``tapaz_runner.py --all`` crawls the whole site, not only the registered ones.
+
+Only tikinti-texnikasi ships with a field map because it is the one whose
+property labels were checked against real product pages; a wrong label doesn't
+fail, it silently leaves its column empty. Other categories are crawled with
+COMMON_FIELDS until their labels are checked and added to CATEGORIES_FILE.
+"""
+import json
+import os
+import re
+from collections import namedtuple
+
+Category = namedtuple("Category", "slug url product_type fields kinds")
+
+CATEGORIES_FILE = "tapaz_categories.json"
+# The category the scrapers were first written for; its Parquet snapshots stay directly in the history dir
+DEFAULT_CATEGORY = "tikinti-texnikasi"
+COMMON_FIELDS = {'city': 'Şəhər', 'category': 'Malın növü', 'New?': 'Yeni?'}
+COMMON_KINDS = {'city': 'category', 'category': 'category', 'New?': 'category'}
+# A category page is /elanlar/<section>/<category>; subcategories and products are deeper
+CATEGORY_LINK = re.compile(r'href="(?:https?://[^/"]+)?(/elanlar/[\w-]+/[\w-]+)/?["?#]')
+
+BUILTIN_CATEGORIES = {
+    "tikinti-texnikasi": Category(
+        "tikinti-texnikasi", "/elanlar/neqliyyat/tikinti-texnikasi", "Tikinti Texnikası",
+        {'city': 'Şəhər', 'category': 'Malın növü', 'Year': 'Buraxılış ili', 'New?': 'Yeni?', 'Yurusu_km': 'Yürüşü, km'},
+        {'city': 'category', 'category': 'category', 'Year': 'int16', 'New?': 'category', 'Yurusu_km': 'digits'},
+    ),
+}
+
+
+def slug_from_url(url: str) -> str:
+    """``/elanlar/neqliyyat/tikinti-texnikasi`` -> ``tikinti-texnikasi``."""
+    return url.rstrip("/").split("/")[-1]
+
+
+def load_categories(path: str = CATEGORIES_FILE) -> dict:
+    """The built-in categories plus (overridden by) the ones in ``path``, if it exists."""
+    categories = dict(BUILTIN_CATEGORIES)
+    if not os.path.exists(path):
+        return categories
+    with open(path, encoding="utf-8") as f:
+        for slug, entry in json.load(f).items():
+            categories[slug] = Category(slug, entry["url"], entry.get("product_type", slug),
+                                        entry.get("fields", COMMON_FIELDS), entry.get("kinds", COMMON_KINDS))
+    return categories
+
+
+def discover_categories(html: str, categories: dict = None) -> dict:
+    """Categories linked from a tap.az page's menu, by slug; registered ones keep their field maps."""
+    categories = categories if categories is not None else load_categories()
+    found = {}
+    for url in CATEGORY_LINK.findall(html):
+        slug = slug_from_url(url)
+        if slug not in found:
+            found[slug] = categories.get(slug) or Category(slug, url, slug, COMMON_FIELDS, COMMON_KINDS)
+    return found
+
+
+def get_category(name: str, categories: dict = None) -> Category:
+    """A registered category by slug, or an ad-hoc one (COMMON_FIELDS) for an unregistered ``/elanlar/...`` URL."""
+    categories = categories if categories is not None else load_categories()
+    slug = slug_from_url(name)
+    if slug in categories:
+        return categories[slug]
+    if not name.startswith("/elanlar/"):
+        raise KeyError(f"unknown tap.az category {name!r}; registered: {', '.join(sorted(categories))}")
+    return Category(slug, name.rstrip("/"), slug, COMMON_FIELDS, COMMON_KINDS)
+
+
+def parquet_columns(category: Category) -> dict:
+    """Column -> Parquet kind for the records of ``category``, in extract_product's column order."""
+    columns = {"Type of Product": "category", "elan_id": "int64", "title": "string", "price": "int64"}
+    columns.update((column, category.kinds.get(column, "string")) for column in category.fields)
+    columns.update({"Description": "string", "URL": "string"})
+    return columns
+
+
+def history_dir(category: Category, base_dir: str) -> str:
+    """Where the category's Parquet snapshots go; one directory per category, since their columns differ."""
+    return base_dir if category.slug == DEFAULT_CATEGORY else os.path.join(base_dir, category.slug)
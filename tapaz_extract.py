@@ -0,0 +1,184 @@
+"""Single-pass extraction of tap.az pages, shared by both tapaz scripts.
+
+Each page is parsed once with the fastest parser available (selectolax, then
+lxml, then BeautifulSoup with html.parser as a last resort), and the
+properties block is walked once to build a label -> value map. The old code
+re-ran ``soup.select('.product-properties__i')`` over the whole document for
+every field it looked up.
+
+The backends only collect raw text; ``normalize_text`` then collapses the
+whitespace the same way for all of them, so a record does not depend on which
+parser happened to be installed.
+"""
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser  # selectolax < 1.0
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+PRODUCT_TYPE = "Tikinti Texnikası"
+# Output column -> label shown in the product properties block
+PROPERTY_FIELDS = {
+    'city': 'Şəhər',
+    'category': 'Malın növü',
+    'Year': 'Buraxılış ili',
+    'New?': 'Yeni?',
+    'Yurusu_km': 'Yürüşü, km',
+}
+
+
+def available_parsers() -> list:
+    parsers = []
+    if HTMLParser is not None:
+        parsers.append("selectolax")
+    if lxml is not None:
+        parsers.append("lxml")
+    parsers.append("bs4")
+    return parsers
+
+
+DEFAULT_PARSER = available_parsers()[0]
+
+
+def normalize_text(text):
+    """Collapses runs of whitespace (spaces, tabs, newlines) to single spaces and strips the ends."""
+    return ' '.join(text.split()) if text is not None else None
+
+
+def _selectolax_fields(html):
+    tree = HTMLParser(html)
+
+    def text(node):
+        return normalize_text(node.text()) if node else None
+
+    properties = {}
+    for prop in tree.css('.product-properties__i'):
+        label = prop.css_first('.product-properties__i-name')
+        value = prop.css_first('.product-properties__i-value')
+        if label:
+            link = value.css_first('a') if value else None
+            properties[text(label)] = text(link or value)
+    description = tree.css_first('.product-description__content')
+    if description:
+        description = normalize_text(description.text(separator=' '))
+    return text(tree.css_first('h1.product-title')), text(tree.css_first('.price-val')), description, properties
+
+
+def _class_xpath(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def _lxml_fields(html):
+    doc = lxml.html.fromstring(html)
+
+    def first(context, xpath):
+        found = context.xpath(xpath)
+        return found[0] if found else None
+
+    def text(element):
+        return normalize_text(element.text_content()) if element is not None else None
+
+    properties = {}
+    for prop in doc.xpath(f"//*[{_class_xpath('product-properties__i')}]"):
+        label = first(prop, f".//*[{_class_xpath('product-properties__i-name')}]")
+        value = first(prop, f".//*[{_class_xpath('product-properties__i-value')}]")
+        if label is not None:
+            link = first(value, ".//a") if value is not None else None
+            properties[text(label)] = text(link if link is not None else value)
+    description = first(doc, f"//*[{_class_xpath('product-description__content')}]")
+    if description is not None:
+        description = normalize_text(' '.join(description.itertext()))
+    title = first(doc, f"//h1[{_class_xpath('product-title')}]")
+    price = first(doc, f"//*[{_class_xpath('price-val')}]")
+    return text(title), text(price), description, properties
+
+
+def _bs4_fields(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def text(element):
+        return normalize_text(element.text) if element else None
+
+    properties = {}
+    for prop in soup.select('.product-properties__i'):
+        label = prop.select_one('.product-properties__i-name')
+        value = prop.select_one('.product-properties__i-value')
+        if label:
+            link = value.find('a') if value else None
+            properties[text(label)] = text(link or value)
+    description = soup.select_one('.product-description__content')
+    if description:
+        description = normalize_text(description.get_text(' '))
+    return text(soup.select_one('h1.product-title')), text(soup.select_one('.price-val')), description, properties
+
+
+_EXTRACTORS = {"selectolax": _selectolax_fields, "lxml": _lxml_fields, "bs4": _bs4_fields}
+
+
+def elan_id_from_url(url: str) -> str:
+    """``https://tap.az/elanlar/.../41000077?ref=x`` -> ``'41000077'``."""
+    return url.split('/')[-1].split('?')[0]
+
+
+def property_value(properties: dict, label_text: str):
+    """Exact label match, else the first label containing ``label_text`` (the old lookup's rule)."""
+    if label_text in properties:
+        return properties[label_text]
+    for label, value in properties.items():
+        if label_text in label:
+            return value
+    return None
+
+
+def extract_product(html: str, url: str, product_type: str = PRODUCT_TYPE, property_fields: dict = None, parser: str = None) -> dict:
+    """Returns the product record for one product page."""
+    title, price_val, description, properties = _EXTRACTORS[parser or DEFAULT_PARSER](html)
+    record = {
+        'Type of Product': product_type,
+        'elan_id': elan_id_from_url(url),
+        'title': title,
+        'price': int(''.join(filter(str.isdigit, price_val))) if price_val and any(c.isdigit() for c in price_val) else None,
+    }
+    for column, label in (property_fields or PROPERTY_FIELDS).items():
+        record[column] = property_value(properties, label)
+    record['Description'] = description
+    record['URL'] = url
+    return record
+
+
+def _selectolax_listing(html):
+    tree = HTMLParser(html)
+    hrefs = [a.attributes.get('href') for a in tree.css('div.products-i a.products-link')]
+    next_link = tree.css_first('.pagination .next a')
+    return hrefs, next_link.attributes.get('href') if next_link else None
+
+
+def _lxml_listing(html):
+    doc = lxml.html.fromstring(html)
+    hrefs = doc.xpath(f"//div[{_class_xpath('products-i')}]//a[{_class_xpath('products-link')}]/@href")
+    next_href = doc.xpath(f"//*[{_class_xpath('pagination')}]//*[{_class_xpath('next')}]//a/@href")
+    return hrefs, next_href[0] if next_href else None
+
+
+def _bs4_listing(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    next_link = soup.select_one('.pagination .next a')
+    return [a.get('href') for a in soup.select('div.products-i a.products-link')], next_link.get('href') if next_link else None
+
+
+_LISTING_EXTRACTORS = {"selectolax": _selectolax_listing, "lxml": _lxml_listing, "bs4": _bs4_listing}
+
+
+def extract_listing_page(html: str, base_url: str, parser: str = None):
+    """Returns ``(product_urls, next_page_href)`` for one page of a subcategory listing."""
+    hrefs, next_href = _LISTING_EXTRACTORS[parser or DEFAULT_PARSER](html)
+    return [base_url + href for href in hrefs if href and '/elanlar/' in href], next_href
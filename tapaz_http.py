@@ -0,0 +1,157 @@
+"""Plain-HTTP fetching of tap.az pages, without a browser.
+
+Product pages are rendered on the server, so a pooled ``requests`` session
+sending the scraper's User-Agent gets the same HTML Chrome would, for a
+fraction of the CPU, memory and time. Pages that don't look like a complete
+product page are handed back so the caller can retry them with Selenium.
+Subcategory listings are paginated the same way, by following the
+``.pagination .next a`` link instead of clicking "Show More" in a browser.
+"""
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import METRICS
+from rate_control import RateController
+from tapaz_extract import extract_listing_page
+
+HTTP_WORKERS = 8
+HTTP_TIMEOUT = 20
+# Tries per listing page before the rest of a subcategory is given up
+LISTING_ATTEMPTS = 3
+# Shared by every plain-HTTP page fetch; AIMD backs off on 429/5xx
+HTTP_RATE = RateController(rate=3.0, min_rate=0.5, max_rate=10.0, concurrency=4, max_concurrency=HTTP_WORKERS, target_latency=4.0, jitter=0.3)
+
+
+def make_session(user_agent: str, pool_size: int = HTTP_WORKERS) -> requests.Session:
+    """A keep-alive session that looks like the Selenium browser to the server."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": user_agent,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "az,en;q=0.8,ru;q=0.6",
+    })
+    return session
+
+
+def fetch_html(session: requests.Session, url: str, timeout: float = HTTP_TIMEOUT) -> str:
+    with HTTP_RATE.slot() as slot:
+        with METRICS.timer("http_fetch_seconds"):
+            resp = session.get(url, timeout=timeout)
+        slot.observe(resp.status_code, resp.headers.get("Retry-After"))
+        resp.raise_for_status()
+        return resp.text
+
+
+def looks_like_product_page(html: str) -> bool:
+    """Cheap check that the server sent the full page (the browser path waits for the same title)."""
+    return "product-title" in html and "product-properties" in html
+
+
+def fetch_html_with_retries(session: requests.Session, url: str, attempts: int = LISTING_ATTEMPTS) -> str:
+    for attempt in range(1, attempts + 1):
+        try:
+            return fetch_html(session, url)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            print(f"  - [http] {url} failed ({e}); retry {attempt}/{attempts - 1}")
+            time.sleep(2 ** attempt)
+
+
+def iter_listing_links(subcategory_url: str, user_agent: str, base_url: str = "https://tap.az", stats: dict = None):
+    """Yields a subcategory's product URLs page by page, following the 'next' link over plain HTTP.
+
+    Each page is parsed on its own as it arrives, so product URLs can be handed
+    to the detail stage while later pages are still being listed. If ``stats``
+    is given, ``stats['complete']`` is set once the last page has been listed.
+    """
+    session = make_session(user_agent, 1)
+    seen = set()
+    url = base_url + subcategory_url
+    page = 1
+    try:
+        while url:
+            try:
+                html = fetch_html_with_retries(session, url)
+            except Exception as e:
+                # Unlike a missed spinner, this is loud: the rest of the subcategory is not listed
+                print(f"  - !!! Listing stopped at page {page} of {subcategory_url}: {e}")
+                return
+            links, next_href = extract_listing_page(html, base_url)
+            new_links = [link for link in links if link not in seen]
+            seen.update(new_links)
+            print(f"  - [http] Listing page {page}: {len(new_links)} new products ({len(seen)} so far)")
+            yield from new_links
+            url = base_url + next_href if next_href and next_href.startswith('/') else next_href
+            page += 1
+        if stats is not None:
+            stats['complete'] = True
+    finally:
+        session.close()
+
+
+def scrape_products_http(urls, parse_fn, user_agent: str, workers: int = HTTP_WORKERS, on_record=None, on_fallback=None):
+    """Fetches and parses product pages concurrently over HTTP.
+
+    ``urls`` can be any iterable, including a generator that is still listing
+    pages: each URL is fetched as soon as it is produced, but at most
+    ``2 * workers`` pages are in flight, so a fast producer waits instead of
+    queueing the whole subcategory. ``parse_fn(html, url)`` returns a record
+    dict or None. Returns ``(records, fallback_urls)``, where ``fallback_urls``
+    are the pages that failed to download, failed validation or failed to
+    parse. ``on_record`` / ``on_fallback`` are called with each record / failed
+    URL as soon as it is known, on the calling thread.
+    """
+    session = make_session(user_agent, workers)
+    records, fallback_urls = [], []
+
+    def fetch_and_parse(url):
+        html = fetch_html(session, url)
+        if not looks_like_product_page(html):
+            raise ValueError("response does not look like a product page")
+        with METRICS.timer("parse_seconds", source="http"):
+            details = parse_fn(html, url)
+        if not details or not details.get("title"):
+            raise ValueError("no title parsed")
+        return details
+
+    def finished(url, future):
+        try:
+            record = future.result()
+        except Exception as e:
+            print(f"  - [http] {url} needs the browser: {e}")
+            METRICS.inc("http_fallbacks")
+            fallback_urls.append(url)
+            if on_fallback:
+                on_fallback(url)
+            return
+        records.append(record)
+        print(f"  - [http] Scraped product {len(records) + len(fallback_urls)}: {url}")
+        if on_record:
+            on_record(record)
+
+    def collect(pending, return_when):
+        done, still_pending = wait(pending, return_when=return_when)
+        for future in done:
+            finished(pending[future], future)
+        return {future: pending[future] for future in still_pending}
+
+    # Results are handled here rather than in done-callbacks, so on_fallback
+    # (e.g. BrowserPool.submit) and on_record never run on an executor thread
+    pending = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for url in urls:
+                if len(pending) >= 2 * workers:
+                    pending = collect(pending, FIRST_COMPLETED)
+                pending[executor.submit(fetch_and_parse, url)] = url
+            collect(pending, ALL_COMPLETED)
+    finally:
+        session.close()
+    return records, fallback_urls
@@ -0,0 +1,187 @@
+"""A pool of Selenium browser workers sharing one queue of product URLs.
+
+Every worker thread owns its own driver and applies the scrapers' restart
+policy on its own: a fresh browser every ``restart_every`` products, and on a
+``WebDriverException`` a restart plus one retry of the product that crashed.
+A crashing browser therefore only costs its own worker a restart. Any other
+error while scraping a product only costs that product. A browser that will
+not start is retried with backoff; a worker that still cannot get one hands
+its product back and stops, and once every worker has stopped, the products
+left in the queue go to ``pool.failed`` instead of waiting forever. Chrome runs
+in separate processes, so the threads mostly wait on the browsers and the pool
+scales with the cores available to Chrome.
+
+    pool = BrowserPool(setup_driver, cleanup_driver, scrape_fn, workers=4)
+    for url in urls:
+        pool.submit(url)       # can be fed while URLs are still being discovered
+    records = pool.close()     # waits for the queue to drain
+    pool.failed                # URLs that got no record because no browser could take them
+"""
+import queue
+import threading
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+BROWSER_WORKERS = 4
+# Attempts to start a browser before a worker gives up, and the first wait between them (doubled each time)
+SETUP_ATTEMPTS = 3
+SETUP_BACKOFF = 5.0
+
+
+class BrowserPool:
+    def __init__(self, setup_fn, cleanup_fn, scrape_fn, workers: int = BROWSER_WORKERS, restart_every: int = 50, on_record=None):
+        self.setup_fn = setup_fn
+        self.cleanup_fn = cleanup_fn
+        # scrape_fn(driver, url) -> record or None; raises WebDriverException when the browser dies
+        self.scrape_fn = scrape_fn
+        self.restart_every = restart_every
+        # Called with each record as soon as it is scraped (from the worker thread)
+        self.on_record = on_record
+        self.records = []
+        # URLs given up on: two browser crashes in a row, or no worker left to take them
+        self.failed = []
+        self.submitted = 0
+        self.completed = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._alive = workers
+        self._threads = [threading.Thread(target=self._work, args=(i + 1,), name=f"browser-{i + 1}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, url: str):
+        with self._lock:
+            self.submitted += 1
+            if self._alive:
+                self._queue.put(url)
+                return
+        self._give_up(url, "no browser worker is left")
+
+    def close(self) -> list:
+        """Stops the workers after the queued URLs are done and returns all records."""
+        if self._closed:
+            return self.records
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        # Products handed back by a worker that stopped after the others had already finished
+        self._drain()
+        return self.records
+
+    def _setup(self, worker: int):
+        delay = SETUP_BACKOFF
+        for attempt in range(1, SETUP_ATTEMPTS + 1):
+            try:
+                return self.setup_fn()
+            except Exception as e:
+                if attempt == SETUP_ATTEMPTS:
+                    raise
+                print(f"--- [browser {worker}] Browser failed to start ({e}); retry {attempt}/{SETUP_ATTEMPTS - 1} in {delay:.0f}s ---")
+                time.sleep(delay)
+                delay *= 2
+
+    def _retire(self, driver, worker: int, reason: str):
+        """Quits ``driver`` ahead of a restart and returns None, so a failed restart doesn't quit it twice."""
+        print(f"\n--- [browser {worker}] {reason}. Restarting its browser... ---\n")
+        self.cleanup_fn(driver)
+        return None
+
+    def _scrape(self, worker: int, driver, url: str):
+        """scrape_fn, where any error but a browser crash only costs this URL."""
+        try:
+            return self.scrape_fn(driver, url)
+        except WebDriverException:
+            raise
+        except Exception as e:
+            print(f"    - [browser {worker}] Error on {url}: {e}")
+            return None
+
+    def _work(self, worker: int):
+        driver = None
+        url = None
+        scraped_since_restart = 0
+        try:
+            while True:
+                url = self._queue.get()
+                if url is None:
+                    return
+                if driver is not None and scraped_since_restart >= self.restart_every:
+                    driver = self._retire(driver, worker, f"Reached batch size of {self.restart_every}")
+                if driver is None:
+                    driver = self._setup(worker)
+                    scraped_since_restart = 0
+
+                try:
+                    details = self._scrape(worker, driver, url)
+                    scraped_since_restart += 1
+                except WebDriverException:
+                    driver = self._retire(driver, worker, "Browser crashed; retrying its last product")
+                    driver = self._setup(worker)
+                    scraped_since_restart = 0
+                    try:
+                        details = self._scrape(worker, driver, url)
+                    except WebDriverException:
+                        # Second crash on the same page: give up on it, the next URL gets a fresh browser
+                        self.cleanup_fn(driver)
+                        driver = None
+                        self._give_up(url, "two browser crashes", worker)
+                        url = None
+                        continue
+                self._finish(worker, url, details)
+                url = None
+        except Exception as e:
+            # The other workers keep taking URLs from the queue, including the one this worker was on
+            print(f"--- [browser {worker}] Worker stopped on an unexpected error: {e} ---")
+        finally:
+            self.cleanup_fn(driver)
+            self._stopped(url)
+
+    def _stopped(self, url):
+        """Hands an unfinished URL back; the last worker to stop drains the queue into ``failed``."""
+        with self._lock:
+            if url is not None:
+                self._queue.put(url)
+            self._alive -= 1
+            last = not self._alive
+        if last:
+            self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                url = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if url is not None:
+                self._give_up(url, "no browser worker is left")
+
+    def _give_up(self, url: str, reason: str, worker: int = None):
+        with self._lock:
+            self.completed += 1
+            self.failed.append(url)
+        print(f"    - [browser {worker or '-'}] Giving up on {url}: {reason}.")
+
+    def _finish(self, worker: int, url: str, details):
+        with self._lock:
+            self.completed += 1
+            if details:
+                self.records.append(details)
+            print(f"  - [browser {worker}] Scraped product {self.completed}/{self.submitted}: {url}")
+        if details and self.on_record:
+            self.on_record(details)
+
+
+def scrape_with_browser_pool(urls, setup_fn, cleanup_fn, scrape_fn, workers: int = BROWSER_WORKERS, restart_every: int = 50, on_record=None) -> list:
+    """Scrapes ``urls`` with ``workers`` browsers in parallel and returns the records."""
+    pool = BrowserPool(setup_fn, cleanup_fn, scrape_fn, min(workers, max(1, len(urls))), restart_every, on_record)
+    for url in urls:
+        pool.submit(url)
+    records = pool.close()
+    if pool.failed:
+        print(f"{len(pool.failed)} products could not be scraped in the browser.")
+    return records
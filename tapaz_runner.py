@@ -0,0 +1,280 @@
+"""Crawls several tap.az categories at once, with their subcategories sharded over processes.
+
+    python tapaz_runner.py tikinti-texnikasi /elanlar/neqliyyat/yuk-masinlari --workers 6
+    python tapaz_runner.py --all
+
+``--all`` crawls every category linked from the home page's menu, plus the
+registered ones; categories without a field map are read with COMMON_FIELDS
+(see tapaz_categories.py). Every category page is read once to find its subcategories. Each subcategory
+is weighted by how many listings it had last time (SUBCATEGORY_COUNTS_FILE,
+updated after every run; unknown ones get the average), and the subcategories
+are split into one shard per worker process, heaviest first onto the lightest
+shard, so the shards finish at about the same time. A worker lists and scrapes
+its subcategories over plain HTTP (tapaz_http) and upserts the records into
+the shared listings store under this run's id; the HTTP request rate is split
+between the processes. Product pages that fail over HTTP are written to
+FALLBACK_FILE for a browser run.
+
+At the end each category's records are exported to ``tap_az_<slug>.xlsx`` and,
+with pyarrow, to a Parquet snapshot in its own history directory.
+
+With ``--archive DIR`` every product page is also kept in a raw_archive.py
+archive; ``--replay DIR`` skips the crawl and runs the extractor over the
+newest archived page of every listing instead, writing ``tap_az_<slug>_replay.xlsx``.
+"""
+import argparse
+import datetime
+import heapq
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup
+
+import listings_parquet
+import tapaz_http
+from listings_store import ListingStore, export_xlsx, new_run_id, skip_known
+from rate_control import RateController
+from raw_archive import RawArchive
+from tapaz_categories import discover_categories, get_category, history_dir, load_categories, parquet_columns
+from tapaz_extract import elan_id_from_url, extract_product
+
+BASE_URL = "https://tap.az"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36 Edg/138.0.0.0'
+# Worker processes; each one crawls one shard of subcategories
+WORKERS = 4
+# Upper bound for all processes' HTTP requests together; each process gets an equal share
+MAX_TOTAL_RATE = 20.0
+STORE_FILENAME = "listings.sqlite"
+INCREMENTAL = True
+REFRESH_FRACTION = 0.05
+PARQUET_DIR = "tapaz_history"
+# Listings seen per subcategory URL in the last run, used to balance the shards
+SUBCATEGORY_COUNTS_FILE = "tapaz_subcategory_counts.json"
+# Product URLs that couldn't be scraped over HTTP, one per line
+FALLBACK_FILE = "tapaz_fallbacks.txt"
+
+
+def get_subcategories(session, category, base_url: str = BASE_URL) -> list:
+    html = tapaz_http.fetch_html_with_retries(session, base_url + category.url)
+    soup = BeautifulSoup(html, 'html.parser')
+    return [{'name': link.text.strip(), 'url': link.get('href'), 'category': category.slug}
+            for link in soup.select('.subcategories-inner a.cat-name') if link.get('href')]
+
+
+def all_categories(session, registry: dict, base_url: str = BASE_URL) -> list:
+    """Every category in the site menu plus the registered ones; just the registered ones if the menu can't be read."""
+    try:
+        found = discover_categories(tapaz_http.fetch_html_with_retries(session, base_url + "/"), registry)
+        print(f"{len(found)} categories in the site menu")
+    except Exception as e:
+        print(f"!!! Could not read the category menu ({e}); crawling the registered categories only")
+        found = {}
+    found.update(registry)
+    return [found[slug] for slug in sorted(found)]
+
+
+def load_counts(path: str = SUBCATEGORY_COUNTS_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_counts(counts: dict, path: str = SUBCATEGORY_COUNTS_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(counts, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_shards(subcategories: list, counts: dict, workers: int) -> list:
+    """Splits ``subcategories`` into at most ``workers`` shards of about equal estimated listings.
+
+    Greedy longest-first: each subcategory, largest estimate first, goes to the
+    shard with the smallest total so far. Returns ``[(estimated_total, [subcategory, ...]), ...]``.
+    """
+    known = [counts[sub['url']] for sub in subcategories if sub['url'] in counts]
+    default = sum(known) / len(known) if known else 1
+    for sub in subcategories:
+        sub['estimate'] = counts.get(sub['url'], default)
+    heap = [(0, i, []) for i in range(min(workers, len(subcategories)))]
+    for sub in sorted(subcategories, key=lambda sub: sub['estimate'], reverse=True):
+        total, i, shard = heapq.heappop(heap)
+        shard.append(sub)
+        heapq.heappush(heap, (total + sub['estimate'], i, shard))
+    return [(total, shard) for total, _, shard in sorted(heap, key=lambda entry: entry[1])]
+
+
+def init_worker(rate_share: float):
+    """Gives this process its share of the request rate (HTTP_RATE's other settings stay)."""
+    base = tapaz_http.HTTP_RATE
+    tapaz_http.HTTP_RATE = RateController(
+        rate=min(base.rate, rate_share), min_rate=min(base.min_rate, rate_share), max_rate=rate_share,
+        concurrency=int(base.concurrency), max_concurrency=base.max_concurrency,
+        target_latency=base.target_latency, jitter=base.jitter)
+
+
+def crawl_shard(shard_index: int, shard: list, categories: dict, run_id: str, base_url: str, archive_dir: str = None) -> list:
+    """Runs in a worker process: lists and scrapes every subcategory of ``shard``. Returns one stats dict each."""
+    store = ListingStore(STORE_FILENAME, "tapaz", "elan_id", run_id=run_id)
+    # Each process appends to segments of its own; the index is shared
+    archive = RawArchive(archive_dir) if archive_dir else None
+    results = []
+    try:
+        for sub in shard:
+            category = categories[sub['category']]
+            print(f"[shard {shard_index + 1}] {category.slug} / {sub['name']} (~{sub['estimate']:.0f} listings)")
+            started = time.perf_counter()
+            stats = {'url': sub['url'], 'category': category.slug, 'listed': 0, 'stored': 0, 'fallbacks': [],
+                     'complete': False}
+
+            def counted(links):
+                for link in links:
+                    stats['listed'] += 1
+                    yield link
+
+            def parse(html, url, category=category):
+                if archive is not None:
+                    archive.put("tapaz", "product", elan_id_from_url(url), html, url=url, tag=category.slug)
+                return extract_product(html, url, category.product_type, category.fields)
+
+            links = counted(tapaz_http.iter_listing_links(sub['url'], USER_AGENT, base_url, stats))
+            if INCREMENTAL:
+                links = skip_known(links, elan_id_from_url, store, REFRESH_FRACTION)
+            try:
+                records, stats['fallbacks'] = tapaz_http.scrape_products_http(links, parse, USER_AGENT, on_record=store.append)
+                stats['stored'] = len(records)
+            except Exception as e:
+                print(f"[shard {shard_index + 1}] !!! {sub['url']} failed: {e}")
+                stats['error'] = str(e)
+            stats['seconds'] = round(time.perf_counter() - started, 1)
+            results.append(stats)
+    finally:
+        store.close()
+        if archive is not None:
+            archive.close()
+    return results
+
+
+def export_category(store: ListingStore, category) -> int:
+    def records():
+        return (record for record in store.iter_records() if record.get('Type of Product') == category.product_type)
+
+    path = f"tap_az_{category.slug}.xlsx"
+    n = export_xlsx(records, path)
+    print(f"{category.slug}: {n} records exported to {path}")
+    if n and listings_parquet.pa is not None:
+        parquet_path = listings_parquet.snapshot_path(history_dir(category, PARQUET_DIR), "tap_az", datetime.date.today())
+        listings_parquet.write_parquet(records(), parquet_path, parquet_columns(category))
+        print(f"{category.slug}: Parquet snapshot written to {parquet_path}")
+    return n
+
+
+def replay_category(archive: RawArchive, category) -> int:
+    """Runs the extractor over the newest archived page of each of ``category``'s listings; no network."""
+    started = time.perf_counter()
+    records, failed = [], 0
+    for entry, body in archive.iter_bodies("tapaz", "product", tag=category.slug):
+        record = extract_product(body.decode("utf-8"), entry.url, category.product_type, category.fields)
+        if record and record.get('title'):
+            records.append(record)
+        else:
+            failed += 1
+    if not records and not failed:
+        return 0
+    path = f"tap_az_{category.slug}_replay.xlsx"
+    export_xlsx(records, path)
+    print(f"{category.slug}: {len(records)} archived pages parsed in {time.perf_counter() - started:.1f}s, "
+          f"{failed} without a title; written to {path}")
+    return len(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl several tap.az categories with subcategories sharded over processes.")
+    parser.add_argument("categories", nargs="*", help="registered category slugs or /elanlar/... URLs")
+    parser.add_argument("--all", action="store_true", help="every category in the site menu, plus the registered ones")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--base-url", default=BASE_URL, help="site root (e.g. a local stand-in from bench_servers.py)")
+    parser.add_argument("--archive", metavar="DIR", help="also keep every product page's HTML in this archive (see raw_archive.py)")
+    parser.add_argument("--replay", metavar="DIR", help="don't crawl: parse the product pages archived in DIR again")
+    args = parser.parse_args(argv)
+
+    registry = load_categories()
+    if not args.all and not args.categories:
+        parser.error("name at least one category, or --all")
+    if args.replay:
+        # Offline: --all means the registered categories
+        categories = [registry[slug] for slug in sorted(registry)] if args.all else [get_category(name, registry) for name in args.categories]
+        archive = RawArchive(args.replay)
+        try:
+            if not sum(replay_category(archive, category) for category in categories):
+                print(f"No archived product pages of {', '.join(category.slug for category in categories)} in {args.replay}.")
+        finally:
+            archive.close()
+        return
+
+    session = tapaz_http.make_session(USER_AGENT, 1)
+    categories = all_categories(session, registry, args.base_url) if args.all else [get_category(name, registry) for name in args.categories]
+    by_slug = {category.slug: category for category in categories}
+    subcategories = []
+    for category in categories:
+        try:
+            found = get_subcategories(session, category, args.base_url)
+        except Exception as e:
+            print(f"!!! Could not list subcategories of {category.slug}: {e}")
+            continue
+        print(f"{category.slug}: {len(found)} subcategories")
+        subcategories += found
+    session.close()
+    if not subcategories:
+        print("No subcategories found. Exiting.")
+        return
+
+    counts = load_counts()
+    shards = plan_shards(subcategories, counts, args.workers)
+    for i, (total, shard) in enumerate(shards):
+        print(f"Shard {i + 1}: {len(shard)} subcategories, ~{total:.0f} listings")
+
+    run_id = new_run_id()
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=len(shards), initializer=init_worker,
+                             initargs=(MAX_TOTAL_RATE / len(shards),)) as executor:
+        futures = [executor.submit(crawl_shard, i, shard, by_slug, run_id, args.base_url, args.archive)
+                   for i, (_, shard) in enumerate(shards)]
+        for i, future in enumerate(futures):
+            try:
+                shard_results = future.result()
+            except Exception as e:
+                print(f"!!! Shard {i + 1} failed: {e}")
+                continue
+            print(f"Shard {i + 1} done: {sum(r['stored'] for r in shard_results)} records in "
+                  f"{sum(r['seconds'] for r in shard_results):.0f}s")
+            results += shard_results
+    print(f"All shards finished in {time.perf_counter() - started:.0f}s")
+
+    # Only complete listings update the estimates; a subcategory whose listing stopped early or
+    # errored out keeps its old count (as do the ones of a shard that failed outright)
+    complete = {r['url']: r['listed'] for r in results if r['complete'] and 'error' not in r}
+    counts.update(complete)
+    save_counts(counts)
+    if len(complete) < len(subcategories):
+        print(f"{len(subcategories) - len(complete)} subcategories were not listed to the end; their counts were kept.")
+    fallbacks = [url for r in results for url in r['fallbacks']]
+    if fallbacks:
+        with open(FALLBACK_FILE, "w", encoding="utf-8") as f:
+            f.write("\n".join(fallbacks) + "\n")
+        print(f"{len(fallbacks)} product pages failed over HTTP; listed in {FALLBACK_FILE}")
+
+    store = ListingStore(STORE_FILENAME, "tapaz", "elan_id", run_id=run_id)
+    try:
+        for category in categories:
+            export_category(store, category)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
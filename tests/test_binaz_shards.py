@@ -0,0 +1,96 @@
+import random
+
+from bench_servers import matches_filter
+from binaz_shards import plan_shards
+
+
+def make_listings(n, seed=1):
+    rng = random.Random(seed)
+    listings = []
+    for i in range(n):
+        category = rng.choice(["1", "2", "3"])
+        listings.append({
+            "id": str(i),
+            "leased": rng.random() < 0.2,
+            "cityId": "1" if rng.random() < 0.7 else str(rng.randint(2, 30)),
+            "categoryId": category,
+            # Category "3" is land: no room count, so a rooms split can't cover it
+            "rooms": None if category == "3" else rng.randint(1, 7),
+            "price": {"value": rng.randrange(20_000, 900_000, 100)},
+        })
+    return listings
+
+
+def counter(listings):
+    calls = []
+
+    def count(filter_params):
+        calls.append(filter_params)
+        return sum(matches_filter(listing, filter_params) for listing in listings)
+
+    return count, calls
+
+
+def test_shards_fit_under_the_cap_and_cover_every_listing_once():
+    listings = make_listings(20_000)
+    count, _ = counter(listings)
+    shards = plan_shards(count, max_items=1128)
+    assert all(shard["count"] <= 1128 and not shard.get("truncated") for shard in shards)
+    owners = [sum(matches_filter(listing, shard["filter"]) for shard in shards) for listing in listings]
+    assert owners == [1] * len(listings)
+    assert sum(shard["count"] for shard in shards) == len(listings)
+
+
+def test_a_dimension_that_drops_listings_is_not_used():
+    listings = make_listings(5_000)
+    count, _ = counter(listings)
+    shards = plan_shards(count, max_items=500)
+    for shard in shards:
+        # Rooms only split within the flat categories, where every listing has a room count
+        if "roomIds" in shard["filter"]:
+            assert shard["filter"]["categoryId"] in ("1", "2")
+    assert sum(shard["count"] for shard in shards) == len(listings)
+
+
+def test_city_and_category_come_before_price():
+    listings = make_listings(5_000)
+    count, _ = counter(listings)
+    shards = plan_shards(count, max_items=1128)
+    assert all("cityId" in shard["filter"] and "categoryId" in shard["filter"] for shard in shards
+               if "priceFrom" in shard["filter"])
+    assert any("cityId" in shard["filter"] for shard in shards)
+
+
+def test_unsplittable_shards_are_marked_truncated():
+    listings = [{"id": str(i), "leased": False, "cityId": "1", "categoryId": "1", "rooms": 2, "price": {"value": 100_000}}
+                for i in range(50)]
+    count, _ = counter(listings)
+    shards = plan_shards(count, max_items=10)
+    assert len(shards) == 1 and shards[0]["truncated"] and shards[0]["count"] == 50
+
+
+def test_small_searches_are_one_shard_with_one_count():
+    listings = make_listings(100)
+    count, calls = counter(listings)
+    assert plan_shards(count, {"leased": False}, max_items=1128) == [
+        {"filter": {"leased": False}, "count": sum(not listing["leased"] for listing in listings)}]
+    assert len(calls) == 1
+
+
+def test_counting_side_by_side_plans_the_same_shards():
+    listings = make_listings(5_000)
+    count, _ = counter(listings)
+    assert plan_shards(count, max_items=500, workers=8) == plan_shards(count, max_items=500)
+
+
+def test_price_bands_that_lose_listings_are_reported(capsys):
+    listings = make_listings(100)
+    count, _ = counter(listings)
+
+    def count_with_unpriced(filter_params):
+        # 5 listings with no price: counted by the search, invisible to any price band
+        return count(filter_params) + (0 if "priceFrom" in filter_params else 5)
+
+    shards = plan_shards(count_with_unpriced, max_items=60, dimensions=[])
+    assert "5 without a matching price will be missed" in capsys.readouterr().out
+    assert sum(shard["count"] for shard in shards) == len(listings)
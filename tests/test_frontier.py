@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from frontier import Frontier, SqliteFrontier, keep_leased
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = SqliteFrontier(str(tmp_path / "frontier.sqlite"), max_attempts=2)
+    yield frontier
+    frontier.close()
+
+
+def test_frontier_is_abstract():
+    with pytest.raises(TypeError):
+        Frontier()
+
+
+def test_add_is_idempotent_per_kind(frontier):
+    assert frontier.add("item", [("1", {"a": 1}), ("2", {})]) == 2
+    assert frontier.add("item", [("1", {"a": 2}), ("3", {})]) == 1
+    assert frontier.add("page", [("1", {})]) == 1
+    assert frontier.counts("item") == {"pending": 3}
+
+
+def test_leases_are_exclusive_until_they_expire(frontier):
+    frontier.add("item", [(str(i), {"i": i}) for i in range(3)])
+    first = frontier.lease("item", "a", 2, ttl=0.2)
+    assert [task.payload["i"] for task in first] == [0, 1]
+    assert [task.key for task in frontier.lease("item", "b", 5, ttl=60)] == ["2"]
+    assert frontier.lease("item", "b", 5) == []
+    assert frontier.counts("item") == {"leased": 3}
+
+    time.sleep(0.3)
+    assert frontier.counts("item") == {"pending": 2, "leased": 1}
+    taken = frontier.lease("item", "b", 5, ttl=60)
+    assert [(task.key, task.attempts) for task in taken] == [("0", 2), ("1", 2)]
+    # "a" lost its leases: its results no longer count
+    assert not frontier.complete(first[0], "a")
+    assert frontier.complete(taken[0], "b")
+    assert frontier.counts("item") == {"done": 1, "leased": 2}
+
+
+def test_renew_keeps_a_lease_alive(frontier):
+    frontier.add("seed", [("plan", {})])
+    task, = frontier.lease("seed", "a", ttl=0.2)
+    time.sleep(0.1)
+    assert frontier.renew(task, "a", ttl=0.5)
+    time.sleep(0.2)
+    assert frontier.lease("seed", "b") == []
+    assert not frontier.renew(task, "b")
+
+
+def test_keep_leased_renews_in_the_background(frontier):
+    frontier.add("seed", [("plan", {})])
+    task, = frontier.lease("seed", "a", ttl=0.3)
+    with keep_leased(frontier, task, "a", ttl=0.3):
+        time.sleep(0.6)
+        assert frontier.lease("seed", "b") == []
+    time.sleep(0.4)
+    assert len(frontier.lease("seed", "b")) == 1
+
+
+def test_failed_tasks_are_retried_then_parked(frontier):
+    frontier.add("page", [("0:0", {})])
+    task, = frontier.lease("page", "a")
+    frontier.fail(task, "a", "boom")
+    task, = frontier.lease("page", "a")
+    frontier.fail(task, "a", "boom again")
+    assert frontier.lease("page", "a") == []
+    assert frontier.counts("page") == {"failed": 1}
+    assert frontier.unfinished() == 0
+
+
+def test_tasks_whose_last_lease_expires_are_parked(frontier):
+    frontier.add("item", [("1", {})])
+    frontier.lease("item", "a", ttl=0.1)
+    time.sleep(0.2)
+    task, = frontier.lease("item", "b", ttl=0.1)
+    assert task.attempts == 2
+    time.sleep(0.2)
+    assert frontier.counts("item") == {"failed": 1}
+    assert frontier.lease("item", "c") == []
+    assert frontier.counts("item") == {"failed": 1}
+    assert frontier.unfinished() == 0
+
+
+def test_meta_only_if_absent(frontier):
+    assert frontier.set_meta("exported_by", "a", only_if_absent=True)
+    assert not frontier.set_meta("exported_by", "b", only_if_absent=True)
+    assert frontier.get_meta("exported_by") == "a"
+    assert frontier.get_meta("missing", 5) == 5
+
+
+def test_seeding_is_taken_over_when_the_seeder_dies(frontier, monkeypatch):
+    pytest.importorskip("requests")
+    import bench_suite
+    binaz = bench_suite.load_binaz()
+    monkeypatch.setattr(binaz, "FRONTIER_POLL", 0.05)
+    monkeypatch.setattr(binaz, "FRONTIER_LEASE", 0.3)
+    plans = []
+
+    def plan_run(total, filter_params, use_shards, limit):
+        plans.append(total)
+        return [{"filter": {}, "count": total}]
+
+    monkeypatch.setattr(binaz, "plan_run", plan_run)
+    # A seeder that claimed the task, stored its plan and some pages, then died
+    frontier.add("seed", [("plan", {})])
+    frontier.lease("seed", "dead", ttl=0.2)
+    frontier.set_meta("plan", [{"filter": {}, "count": 48}])
+    frontier.add("page", [("0:0", {"shard": 0, "offset": 0})])
+
+    shards, run_id = binaz.seed_frontier(frontier, "alive", 48, {}, False, 24)
+    assert shards == [{"filter": {}, "count": 48}] and run_id
+    assert plans == []  # the stored plan is reused, not planned again
+    assert frontier.counts("page") == {"pending": 2}
+    assert frontier.counts("seed") == {"done": 1}
+    # Seeding again (another worker joining late) changes nothing
+    assert binaz.seed_frontier(frontier, "late", 48, {}, False, 24) == (shards, run_id)
+    assert frontier.counts("page") == {"pending": 2}
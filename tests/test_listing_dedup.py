@@ -0,0 +1,94 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import listing_dedup
+from listing_dedup import DedupIndex, signatures
+from listings_store import ListingStore
+
+TEXT = ("Nəsimi rayonunda, metroya 5 dəqiqəlik məsafədə təmirli 3 otaqlı mənzil satılır. "
+        "Mənzil 9 mərtəbəli binanın 4-cü mərtəbəsində yerləşir, kupçası var, ipoteka mümkündür.")
+OTHER = ("Xətai rayonunda yeni tikilidə ağ karkas 2 otaqlı mənzil. Binada lift və qaz var, "
+         "həyət abadlaşdırılıb, yaxınlıqda məktəb və bağça var.")
+
+
+def listing(listing_id, description=TEXT, lat=40.40, lon=49.85, price=150000, area=90, rooms=3):
+    return {"id": listing_id, "description": description, "latitude": lat, "longitude": lon,
+            "price": price, "area": area, "rooms": rooms}
+
+
+def test_signatures_ignore_case_spacing_and_punctuation():
+    sigs, has_text = signatures([TEXT, TEXT.replace("mənzil", "MƏNZIL").replace(",", " ,  "), OTHER, "", None])
+    assert (sigs[0] == sigs[1]).all()
+    assert (sigs[0] == sigs[2]).mean() < 0.3
+    assert has_text.tolist() == [True, True, True, False, False]
+
+
+def test_reposts_cluster_under_the_earliest_id():
+    index = DedupIndex()
+    index.add([
+        listing("1"),
+        # Reposted nearby, re-priced, with a contact line added
+        listing("2", TEXT + " Vasitəçi yoxdur.", lat=40.4004, lon=49.8503, price=145000),
+        listing("3", OTHER),
+        # Same text, but another property: too far, other room count, too different in price
+        listing("4", lat=40.45),
+        listing("5", rooms=2),
+        listing("6", price=200000),
+        listing("7", description=None),
+    ])
+    clusters = {listing_id: (cluster, size) for listing_id, cluster, size in index.clusters()}
+    assert clusters["1"] == clusters["2"] == ("1", 2)
+    assert all(clusters[i] == (i, 1) for i in "34567")
+
+
+def test_incremental_adds_and_save_load(tmp_path):
+    path = str(tmp_path / "dedup.npz")
+    index = DedupIndex.load(path)
+    assert index.add([listing("1"), listing("3", OTHER)]) == 2
+    index.save(path)
+
+    index = DedupIndex.load(path)
+    assert len(index) == 2
+    # Unchanged listings are skipped; a later repost joins the stored listing's cluster
+    assert index.add([listing("1"), listing("9", TEXT + " Təcili satılır.")]) == 1
+    assert index.cluster_of("9") == "1" and index.cluster_of("3") == "3"
+
+
+def test_edited_listings_are_indexed_again(tmp_path):
+    index = DedupIndex()
+    index.add([listing("1"), listing("2", TEXT + " Vasitəçi yoxdur."), listing("3", OTHER), listing("4", OTHER, rooms=2)])
+    assert index.cluster_of("2") == "1" and index.cluster_of("4") == "4"
+    # Punctuation only: nothing to re-index
+    assert index.add([listing("1", TEXT.replace(",", " ,"))]) == 0
+    # "2" is rewritten into another listing and leaves "1"; "4" is corrected to 3 rooms and joins "3"
+    assert index.add([listing("2", OTHER, lat=40.45), listing("4", OTHER)]) == 2
+    assert [cluster for _, cluster, _ in index.clusters()] == ["1", "2", "3", "3"]
+
+    # Files saved before the checksums were kept compare by signature instead
+    path = str(tmp_path / "dedup.npz")
+    index.save(path)
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files if name != "text_sum"}
+    np.savez(path, **arrays)
+    index = DedupIndex.load(path)
+    assert index.add([listing("1"), listing("2", OTHER, lat=40.45)]) == 0
+    assert index.add([listing("2", TEXT, lat=40.40)]) == 1 and index.cluster_of("2") == "1"
+
+
+def test_update_store_writes_the_run_clusters(tmp_path):
+    store = ListingStore(str(tmp_path / "listings.sqlite"), "binaz", "id", run_id="r1")
+    index_path = str(tmp_path / "dedup.npz")
+    try:
+        store.append_many([listing("1"), listing("3", OTHER)])
+        assert listing_dedup.update_store(store, index_path) == (2, 0)
+        store.run_id = "r2"
+        store.append_many([listing("2", TEXT + " Zəng edin!")])
+        assert listing_dedup.update_store(store, index_path) == (1, 2)
+        assert store.cluster_of("2") == ("1", 2) and store.cluster_of("1") == ("1", 2)
+        assert store.cluster_of("3") == ("3", 1)
+        assert store.cluster_of("missing") is None
+        # Nothing changed: nothing is rewritten
+        assert store.set_clusters(DedupIndex.load(index_path).clusters()) == 0
+    finally:
+        store.close()
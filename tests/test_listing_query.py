@@ -0,0 +1,183 @@
+import json
+import os
+import random
+import sqlite3
+
+import pytest
+
+import listing_query
+from listing_query import ListingIndex, distance_km
+
+CENTER = (40.40, 49.85)
+
+
+def make_listing(listing_id, rng, **fields):
+    rooms = rng.randint(1, 5)
+    area = round(rng.uniform(30, 50) * rooms, 1)
+    listing = {
+        "id": str(listing_id), "url": f"https://bina.az/items/{listing_id}", "currency": "AZN", "leased": "No",
+        "price": round(area * rng.uniform(1000, 4000), -2), "rooms": rooms, "area": area, "area_units": "m²",
+        "category": rng.choice(["Yeni tikili", "Köhnə tikili"]), "location": rng.choice(["Nəsimi", "Yasamal", "Xətai"]),
+        "latitude": CENTER[0] + rng.uniform(-0.05, 0.05), "longitude": CENTER[1] + rng.uniform(-0.05, 0.05),
+    }
+    listing.update(fields)
+    return listing
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ListingIndex(str(tmp_path / "query.sqlite"))
+    yield index
+    index.close()
+
+
+def summary(index):
+    return {by: index.price_per_m2(by) for by in listing_query.GROUPS}
+
+
+def test_search_near_a_point_matches_a_brute_force_scan(index):
+    rng = random.Random(1)
+    listings = [make_listing(i, rng) for i in range(2000)]
+    index.add(listings)
+    for _ in range(30):
+        lat, lon = CENTER[0] + rng.uniform(-0.04, 0.04), CENTER[1] + rng.uniform(-0.04, 0.04)
+        km, low, rooms = rng.choice([0.5, 1.0, 2.5]), rng.randrange(50_000, 400_000, 10_000), rng.randint(1, 4)
+        found = index.search(lat, lon, km, min_price=low, max_price=low + 150_000, min_rooms=rooms, max_rooms=rooms + 1)
+        expected = {listing["id"] for listing in listings
+                    if low <= listing["price"] <= low + 150_000 and rooms <= listing["rooms"] <= rooms + 1
+                    and distance_km(lat, lon, listing["latitude"], listing["longitude"]) <= km}
+        assert {row["id"] for row in found} == expected
+        assert [row["distance_km"] for row in found] == sorted(row["distance_km"] for row in found)
+
+
+def test_search_filters_rentals_and_currency(index):
+    rng = random.Random(2)
+    index.add([make_listing(1, rng), make_listing(2, rng, leased="Yes"), make_listing(3, rng, currency="USD")])
+    assert {row["id"] for row in index.search(*CENTER, 20)} == {"1", "2", "3"}
+    assert [row["id"] for row in index.search(*CENTER, 20, leased=True)] == ["2"]
+    assert {row["id"] for row in index.search(*CENTER, 20, leased=False)} == {"1", "3"}
+    assert [row["id"] for row in index.search(*CENTER, 20, currency="USD")] == ["3"]
+
+
+def test_price_per_m2_counts_sales_in_azn_only(index):
+    rng = random.Random(3)
+    sale = make_listing(1, rng, location="Nəsimi", price=200_000, area=100)
+    index.add([sale, make_listing(2, rng, location="Nəsimi", leased="Yes", price=1_000, area=100),
+               make_listing(3, rng, location="Nəsimi", currency="USD", price=150_000, area=100),
+               # Not known to be a rental (older CSVs have no leased column): counted as a sale
+               make_listing(4, rng, location="Nəsimi", leased=None, price=300_000, area=100)])
+    expected = [{"location": "Nəsimi", "listings": 2, "median": 2500.0, "mean": 2500.0, "min": 2000.0, "max": 3000.0}]
+    # From the summary table, and computed from the matching listings
+    assert index.price_per_m2("location") == expected
+    assert index.price_per_m2("location", *CENTER, 50) == expected
+    assert index.price_per_m2("location", leased=True)[0]["median"] == 10.0
+    assert index.price_per_m2("location", currency="USD")[0]["median"] == 1500.0
+    assert index.price_per_m2("location", leased=None, currency=None)[0]["listings"] == 4
+
+
+def test_incremental_summary_matches_a_rebuild(index, monkeypatch):
+    rng = random.Random(4)
+    listings = {str(i): make_listing(i, rng) for i in range(300)}
+    index.add(listings.values(), seen_at="2025-08-01T12:00:00")
+    # Small updates: only their groups are recomputed
+    monkeypatch.setattr(listing_query, "REBUILD_SHARE", 10.0)
+    changes = [
+        dict(listings["1"], price=listings["1"]["price"] * 2),
+        dict(listings["2"], location="Binəqədi", latitude=40.5, longitude=49.9),
+        dict(listings["3"], leased="Yes"),
+        dict(listings["4"], currency="USD"),
+        dict(listings["5"], category="Obyekt", rooms=7),
+        make_listing(1000, rng, location="Sabunçu"),
+    ]
+    index.add(changes, seen_at="2025-08-02T12:00:00")
+    incremental = summary(index)
+    index._refresh(everything=True)
+    assert summary(index) == incremental
+    locations = {row["location"] for row in incremental["location"]}
+    assert {"Binəqədi", "Sabunçu"} <= locations
+    # A group whose only listing stopped counting disappears
+    index.add([dict(changes[1], leased="Yes")], seen_at="2025-08-03T12:00:00")
+    assert "Binəqədi" not in {row["location"] for row in index.price_per_m2("location")}
+
+
+def test_seeing_a_listing_again_only_moves_last_seen(index, monkeypatch):
+    rng = random.Random(5)
+    listings = [make_listing(i, rng) for i in range(50)]
+    index.add(listings, seen_at="2025-08-01T12:00:00")
+    marked = []
+    refresh = index._refresh
+    monkeypatch.setattr(index, "_refresh", lambda: marked.append(
+        index._conn.execute("SELECT COUNT(*) FROM dirty").fetchone()[0]) or refresh())
+    before = index._conn.total_changes
+    index.add(listings, seen_at="2025-08-02T12:00:00")
+    # One row write each, and no group to recompute
+    assert index._conn.total_changes - before == 50 and marked == [0]
+    assert len(index.search(seen_since="2025-08-02")) == 50
+    # An older snapshot changes nothing
+    index.add([dict(listings[0], price=1)], seen_at="2025-07-01T12:00:00")
+    assert index.search(seen_since="2025-08-02", min_price=1, max_price=1) == []
+
+
+def test_analyze_runs_on_growth_or_age(index, monkeypatch):
+    rng = random.Random(6)
+    index.add([make_listing(i, rng) for i in range(100)])
+    analyzed = json.loads(index._meta("analyzed"))
+    assert analyzed[0] == 100
+    index.add([make_listing(i, rng) for i in range(100, 110)])
+    assert json.loads(index._meta("analyzed")) == analyzed
+    index.add([make_listing(i, rng) for i in range(110, 130)])
+    assert json.loads(index._meta("analyzed"))[0] == 130
+    monkeypatch.setattr(listing_query, "ANALYZE_DAYS", 0)
+    index.add([make_listing(0, rng)])
+    assert json.loads(index._meta("analyzed"))[1] > analyzed[1]
+
+
+def test_an_older_index_is_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE listings (id TEXT PRIMARY KEY, url TEXT, price REAL, currency TEXT, rooms INTEGER, area REAL,
+            price_per_m2 REAL, category TEXT, location TEXT, city TEXT, latitude REAL, longitude REAL,
+            updated_at TEXT, last_seen TEXT NOT NULL);
+        CREATE TABLE summary (by TEXT NOT NULL, category TEXT NOT NULL, grp NOT NULL, listings INTEGER NOT NULL,
+            median REAL, mean REAL, min REAL, max REAL, PRIMARY KEY (by, category, grp));
+        INSERT INTO listings VALUES ('1', NULL, 100000, 'AZN', 2, 50, 2000, 'Yeni tikili', 'Nəsimi', 'Bakı',
+            40.4, 49.85, NULL, '2025-08-01T12:00:00');
+        INSERT INTO summary VALUES ('location', '', 'Nəsimi', 1, 2000, 2000, 2000, 2000);
+    """)
+    conn.close()
+    index = ListingIndex(path)
+    try:
+        # Whether it is a rental isn't known until it is scraped again; until then it counts as a sale
+        assert index.price_per_m2("location")[0]["median"] == 2000.0
+        assert index.price_per_m2("cell")[0]["cell"] == listing_query.cell_of(40.4, 49.85)
+        index.add([{"id": "1", "leased": "Yes"}], seen_at="2025-08-02T12:00:00")
+        assert index.price_per_m2("location") == []
+    finally:
+        index.close()
+
+
+def test_csvs_without_a_leased_column_have_statistics(index):
+    path = os.path.join(os.path.dirname(__file__), os.pardir, "bina_listings_20250724.csv")
+    assert index.import_csv(path) > 1000
+    groups = index.price_per_m2("location")
+    # The summary table agrees with a scan of the listings (any filter skips the summary)
+    assert groups and groups == index.price_per_m2("location", min_price=0)
+    assert sum(group["listings"] for group in groups) <= sum(group["listings"] for group in index.price_per_m2(
+        "location", leased=None, currency=None))
+
+
+def test_an_index_summarised_with_an_older_rule_is_rebuilt(tmp_path):
+    path = str(tmp_path / "query.sqlite")
+    index = ListingIndex(path)
+    index.add([make_listing(1, random.Random(4), leased=None)])
+    # As written before listings with an unknown leased counted
+    index._conn.execute("DELETE FROM summary")
+    index._conn.execute("UPDATE meta SET value = 'old rule' WHERE key = 'counted'")
+    index._conn.commit()
+    index.close()
+    index = ListingIndex(path)
+    try:
+        assert index.price_per_m2("rooms")[0]["listings"] == 1
+    finally:
+        index.close()
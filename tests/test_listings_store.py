@@ -0,0 +1,76 @@
+import random
+
+from listings_store import ListingStore, export_csv, skip_known
+
+
+def open_store(tmp_path, run_id="run1"):
+    return ListingStore(str(tmp_path / "listings.sqlite"), "binaz", "id", run_id=run_id)
+
+
+def test_upsert_replaces_data_and_keeps_first_seen(tmp_path):
+    store = open_store(tmp_path)
+    store.append_many([{"id": 1, "price": 100}], seen_at="2025-08-01T10:00:00")
+    store.append_many([{"id": 1, "price": 90}, {"id": 2, "price": 50}], seen_at="2025-08-02T10:00:00")
+    assert store.get(1) == {"id": 1, "price": 90}
+    first_seen, last_seen = store._conn.execute(
+        "SELECT first_seen, last_seen FROM listings WHERE listing_id = '1'").fetchone()
+    assert (first_seen, last_seen) == ("2025-08-01T10:00:00", "2025-08-02T10:00:00")
+    assert store.count() == 2
+
+
+def test_older_snapshots_do_not_overwrite_newer_data(tmp_path):
+    store = open_store(tmp_path)
+    store.append_many([{"id": 1, "price": 90}], seen_at="2025-08-02T10:00:00")
+    old = open_store(tmp_path, run_id="old")
+    old.append_many([{"id": 1, "price": 100}], seen_at="2025-07-01T10:00:00")
+    assert store.get(1)["price"] == 90
+    first_seen = store._conn.execute("SELECT first_seen FROM listings WHERE listing_id = '1'").fetchone()[0]
+    assert first_seen == "2025-07-01T10:00:00"
+    assert old.count() == 0 and store.count() == 1
+
+
+def test_sources_are_kept_apart(tmp_path):
+    store = open_store(tmp_path)
+    tapaz = ListingStore(str(tmp_path / "listings.sqlite"), "tapaz", "elan_id", run_id="run1")
+    store.append({"id": "7"})
+    tapaz.append({"elan_id": "7", "title": "crane"})
+    assert store.get("7") == {"id": "7"} and store.get("8") is None
+    assert store.seen(7) and not store.seen("8") and not tapaz.seen("1")
+    assert store.known_ids() == {"7"} and tapaz.known_ids() == {"7"}
+    assert [record["title"] for record in tapaz.iter_records()] == ["crane"]
+
+
+def test_import_and_export_csv_round_trip(tmp_path):
+    store = open_store(tmp_path)
+    store.append_many([{"id": "1", "title": "a", "extra": 1}, {"id": "2", "title": None}])
+    path = str(tmp_path / "out.csv")
+    assert export_csv(store.iter_records(), path, ["id", "title"]) == 2
+    other = ListingStore(str(tmp_path / "other.sqlite"), "binaz", "id")
+    assert other.import_csv(path) == 2
+    assert other.get("2") == {"id": "2", "title": None}
+
+
+def test_skip_known_yields_new_and_refreshed_and_touches_skipped(tmp_path):
+    store = open_store(tmp_path, run_id="yesterday")
+    store.append_many([{"id": str(i)} for i in range(10)], seen_at="2025-08-01T10:00:00")
+    today = open_store(tmp_path, run_id="today")
+    random.seed(3)
+    stats = {}
+    items = [str(i) for i in range(5, 15)] + ["12"]
+    yielded = list(skip_known(items, str, today, refresh_fraction=0.5, stats=stats))
+
+    assert stats["new"] == 5 and stats["new"] + stats["refreshed"] + stats["skipped"] == 10
+    assert set(str(i) for i in range(10, 15)) <= set(yielded) and yielded.count("12") == 1
+    assert len(yielded) == stats["new"] + stats["refreshed"]
+    # Skipped listings count as seen by today's run; refreshed ones are written again by the caller
+    assert today.count() == stats["skipped"]
+
+
+def test_skip_known_is_lazy(tmp_path):
+    store = open_store(tmp_path)
+
+    def items():
+        yield "1"
+        raise AssertionError("read past the first item")
+
+    assert next(skip_known(items(), str, store)) == "1"
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from rate_control import RateController, parse_retry_after
+
+
+class HTTPError(Exception):
+    """Stands in for raise_for_status() on a 4xx: the site's answer, not congestion."""
+
+
+def controller(**kwargs):
+    kwargs = dict(dict(rate=1000.0, max_rate=2000.0, concurrency=4, max_concurrency=8, cooldown=0.0), **kwargs)
+    return RateController(**kwargs)
+
+
+def finish(rate, status=None, exc=None):
+    try:
+        with rate.slot() as slot:
+            if status is not None:
+                slot.observe(status)
+            if exc is not None:
+                raise exc
+    except Exception as e:
+        if e is not exc:
+            raise
+
+
+def test_successes_grow_limits_additively():
+    rate = controller(rate_step=1.0)
+    finish(rate, 200)
+    assert rate.rate == 1001.0
+    assert rate.concurrency == pytest.approx(4.25)
+    assert rate.limits()["successes"] == 1
+
+
+@pytest.mark.parametrize("status", [429, 500, 503, 520])
+def test_throttle_and_5xx_halve_limits(status):
+    rate = controller()
+    finish(rate, status)
+    assert (rate.rate, rate.concurrency) == (500.0, 2.0)
+    assert rate.limits()["errors"] == 1
+
+
+@pytest.mark.parametrize("exc", [ConnectionError("reset"), TimeoutError("slow"), asyncio.TimeoutError()])
+def test_transport_errors_halve_limits(exc):
+    rate = controller()
+    finish(rate, exc=exc)
+    assert (rate.rate, rate.concurrency) == (500.0, 2.0)
+
+
+@pytest.mark.parametrize("status, exc", [(404, HTTPError("404")), (400, HTTPError("400")), (200, ValueError("not JSON"))])
+def test_request_errors_leave_limits_alone(status, exc):
+    rate = controller(rate_step=1.0)
+    finish(rate, status, exc)
+    assert rate.rate == 1001.0
+    assert rate.limits()["errors"] == 0
+    assert rate.in_flight == 0
+
+
+def test_explicit_fail_counts_as_congestion():
+    rate = controller()
+    with rate.slot() as slot:
+        slot.fail()
+    assert rate.rate == 500.0
+
+
+def test_decrease_respects_cooldown_and_floors():
+    rate = controller(cooldown=60.0, min_rate=400.0, min_concurrency=3)
+    finish(rate, 503)
+    finish(rate, 503)
+    assert (rate.rate, rate.concurrency) == (500.0, 3)
+    assert rate.limits()["errors"] == 2
+
+
+def test_slow_answer_halves_without_counting_an_error():
+    rate = controller(target_latency=0.0)
+    rate.acquire()
+    rate.release(1.0, False)
+    assert rate.rate == 500.0
+    assert rate.limits()["errors"] == 0
+
+
+def test_retry_after_pauses_callers():
+    rate = controller()
+    with rate.slot() as slot:
+        slot.observe(429, "30")
+    assert rate.limits()["paused_for"] > 25
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("junk") == 0.0
+
+
+def test_async_slot_classifies_like_the_sync_one():
+    rate = controller(rate_step=1.0)
+
+    async def run():
+        with pytest.raises(HTTPError):
+            async with rate.async_slot() as slot:
+                slot.observe(404)
+                raise HTTPError("404")
+        async with rate.async_slot() as slot:
+            slot.observe(502)
+
+    asyncio.run(run())
+    assert rate.rate == (1000.0 + 1.0) / 2
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import resilience
+from rate_control import RateController
+from resilience import Cancelled, CircuitBreaker, hedged_call, hedged_call_async, retry_call, retry_call_async
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt, wait_at_least=0.0: 0.0)
+
+
+def tripped(cooldown=0.05):
+    breaker = CircuitBreaker(window=4, min_calls=4, error_ratio=0.5, cooldown=cooldown, max_cooldown=0.2, name="test")
+    for ok in (True, True, False, False):
+        breaker.record(ok)
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_breaker_opens_on_the_error_ratio():
+    breaker = CircuitBreaker(window=4, min_calls=4, error_ratio=0.5, cooldown=30.0)
+    for ok in (True, False, True):
+        breaker.record(ok)
+    assert breaker.state == "closed"
+    breaker.record(False)
+    assert breaker.state == "open" and breaker.opens == 1
+    delay, token = breaker.wait_time()
+    assert delay > 29 and token is None
+
+
+def test_probe_success_closes_and_failure_doubles_the_cooldown():
+    breaker = tripped()
+    time.sleep(0.06)
+    token = breaker.before_call()
+    assert token is not None and breaker.state == "half-open"
+    # Everyone else waits while the probe is in flight
+    assert breaker.wait_time() == (1.0, None)
+    breaker.record(False, token)
+    assert breaker.state == "open" and breaker.cooldown == 0.1
+
+    time.sleep(0.11)
+    token = breaker.before_call()
+    breaker.record(True, token)
+    assert breaker.state == "closed" and breaker.cooldown == 0.05
+
+
+def test_only_the_probe_decides_while_half_open():
+    breaker = tripped()
+    time.sleep(0.06)
+    token = breaker.before_call()
+    # Calls admitted before the breaker opened finish now; they don't count
+    breaker.record(True)
+    breaker.record(False, object())
+    assert breaker.state == "half-open"
+    breaker.record(True, token)
+    assert breaker.state == "closed"
+
+
+def test_interrupted_probe_frees_the_probe_slot():
+    breaker = tripped()
+    time.sleep(0.06)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        retry_call(interrupted, 2, breaker)
+    assert breaker.state == "half-open"
+    token = breaker.before_call()
+    assert token is not None
+    breaker.record(True, token)
+    assert breaker.state == "closed"
+
+
+def test_cancelled_async_probe_frees_the_probe_slot():
+    breaker = tripped()
+    time.sleep(0.06)
+
+    async def run():
+        task = asyncio.ensure_future(retry_call_async(lambda: asyncio.sleep(10), 2, breaker))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.wait_time()[1] is not None
+
+
+def test_async_retries_give_up_once_stop_is_set(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt, wait_at_least=0.0: 30.0)
+    breaker = tripped(cooldown=30)
+    stop = threading.Event()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise ConnectionError("reset")
+
+    threading.Timer(0.1, stop.set).start()
+    started = time.monotonic()
+    with pytest.raises(ConnectionError):
+        asyncio.run(retry_call_async(failing, 4, breaker, stop))
+    # Neither the open breaker nor the backoff keeps it waiting past the stop
+    assert time.monotonic() - started < 2 and calls == [1]
+
+
+def test_retry_call_retries_transient_errors_and_records_each_attempt():
+    breaker = CircuitBreaker(window=10, min_calls=10)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert retry_call(flaky, 4, breaker) == "ok"
+    assert list(breaker._outcomes) == [False, False, True]
+
+    def not_found():
+        raise LookupError("404")
+
+    with pytest.raises(LookupError):
+        retry_call(not_found, 4, breaker)
+    assert list(breaker._outcomes)[-1] is True
+
+
+def test_hedge_loser_is_cancelled_and_records_nothing():
+    rate = RateController(rate=1000.0, max_rate=2000.0, concurrency=4, cooldown=0.0, rate_step=1.0)
+    recorded = []
+    started = threading.Event()
+    lock = threading.Lock()
+
+    def fetch(cancelled):
+        with lock:
+            copy = "first" if not started.is_set() else "hedge"
+            started.set()
+        with rate.slot() as slot:
+            time.sleep(0.3 if copy == "first" else 0.02)
+            if cancelled.is_set():
+                slot.cancel()
+                raise Cancelled()
+            slot.observe(200)
+            recorded.append(copy)
+            return copy
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert hedged_call(fetch, 0.05, executor) == "hedge"
+    assert recorded == ["hedge"]
+    assert rate.in_flight == 0 and rate.limits()["successes"] == 1
+
+
+def test_hedge_queued_behind_the_winner_sends_nothing():
+    sent = []
+
+    def fetch(cancelled):
+        if cancelled.is_set():
+            raise Cancelled()
+        sent.append(1)
+        time.sleep(0.1)
+        return "ok"
+
+    # One worker: the hedge copy is still queued when the first copy answers
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert hedged_call(fetch, 0.01, executor) == "ok"
+    assert sent == [1]
+
+
+def test_async_hedge_loser_gives_its_rate_slot_back_uncounted():
+    rate = RateController(rate=1000.0, max_rate=2000.0, concurrency=4, cooldown=0.0, rate_step=1.0)
+    copies = iter(["first", "hedge"])
+
+    async def fetch():
+        copy = next(copies)
+        async with rate.async_slot() as slot:
+            await asyncio.sleep(0.3 if copy == "first" else 0.02)
+            slot.observe(200)
+            return copy
+
+    assert asyncio.run(hedged_call_async(fetch, 0.05)) == "hedge"
+    assert rate.in_flight == 0 and rate.limits()["successes"] == 1 and rate.rate == 1001.0
@@ -0,0 +1,122 @@
+import csv
+import json
+
+from listings_store import ListingStore
+from scrape_state import CheckpointedWriter
+
+FIELDS = ["id", "title"]
+
+
+def open_store(tmp_path):
+    return ListingStore(str(tmp_path / "listings.sqlite"), "binaz", "id")
+
+
+def open_writer(tmp_path, every=2):
+    return CheckpointedWriter(open_store(tmp_path), str(tmp_path / "out.csv"), FIELDS, str(tmp_path / "checkpoint.json"), every)
+
+
+def resume(tmp_path, every=2):
+    return CheckpointedWriter.resume(str(tmp_path / "checkpoint.json"), open_store(tmp_path), FIELDS, every)
+
+
+def stored_ids(writer):
+    return sorted(record["id"] for record in writer.store.iter_records())
+
+
+def test_rows_reach_the_store_at_checkpoints_and_resume_skips_them(tmp_path):
+    writer = open_writer(tmp_path)
+    page = (0, 0)
+    assert writer.begin_page(page, ["1", "2", "3"], 24) == ["1", "2", "3"]
+    writer.write_row(("1", "a"), "1", page)
+    writer.write_row(("2", "b"), "2", page)   # checkpoint after 2 rows
+    writer.write_row(("3", "c"), "3", page)   # not checkpointed: lost in the "crash"
+    assert stored_ids(writer) == ["1", "2"]
+    assert not (tmp_path / "out.csv").exists()
+
+    resumed = resume(tmp_path)
+    assert resumed.store.run_id == writer.store.run_id
+    assert resumed.done_ids == {"1", "2"}
+    # Page 0 still had an open item, so the crawl resumes there; only the unwritten item is handed out
+    assert resumed.resume_pages(0, 24, 10) == ([], list(range(0, 240, 24)))
+    assert resumed.begin_page(page, ["1", "2", "3"], 24) == ["3"]
+    resumed.write_row(("3", "c"), "3", page)
+    resumed.close()
+    assert [record["title"] for record in resumed.store.iter_records()] == ["a", "b", "c"]
+
+
+def test_rows_after_the_ids_checkpoint_are_upserted_again(tmp_path):
+    writer = open_writer(tmp_path, every=10)
+    writer.begin_page((0, 0), ["1"], 24)
+    writer.write_row(("1", "a"), "1", (0, 0))
+    # Rows committed but the process dies before the checkpoint file is written
+    writer.store.append_many(writer._rows)
+
+    resumed = resume(tmp_path, every=10)
+    assert resumed.begin_page((0, 0), ["1"], 24) == ["1"]
+    resumed.write_row(("1", "a2"), "1", (0, 0))
+    resumed.close()
+    assert [record["title"] for record in resumed.store.iter_records()] == ["a2"]
+
+
+def test_checkpoints_append_only_new_ids(tmp_path):
+    writer = open_writer(tmp_path)
+    for i in range(6):
+        page = (0, i * 24)
+        writer.begin_page(page, [str(i)], 24)
+        writer.write_row((str(i), "x"), str(i), page)
+    writer.close()
+    assert (tmp_path / "checkpoint.json.ids").read_text().split() == [str(i) for i in range(6)]
+    state = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert "done_ids" not in state
+    assert state["ids_bytes"] == len("".join(f"{i}\n" for i in range(6)))
+    assert state["run_id"] == writer.store.run_id
+
+
+def test_failed_pages_are_retried_on_resume(tmp_path):
+    writer = open_writer(tmp_path)
+    writer.fail_page((0, 24))
+    for offset in (0, 48):
+        writer.begin_page((0, offset), [str(offset)], 24)
+        writer.write_row((str(offset), "x"), str(offset), (0, offset))
+    writer.close()
+
+    resumed = resume(tmp_path)
+    assert resumed.resume_pages(0, 24, 4) == ([24], [72])
+    resumed.begin_page((0, 24), ["24"], 24)
+    resumed.write_row(("24", "x"), "24", (0, 24))
+    resumed.close()
+    assert resume(tmp_path).resume_pages(0, 24, 4) == ([], [72])
+
+
+def test_old_checkpoints_with_inline_ids_still_resume(tmp_path):
+    writer = open_writer(tmp_path)
+    writer.begin_page((0, 0), ["1"], 24)
+    writer.write_row(("1", "a"), "1", (0, 0))
+    writer.close()
+    state = json.loads((tmp_path / "checkpoint.json").read_text())
+    state["done_ids"] = ["1"]
+    del state["ids_bytes"]
+    (tmp_path / "checkpoint.json").write_text(json.dumps(state))
+    (tmp_path / "checkpoint.json.ids").unlink()
+
+    resumed = resume(tmp_path)
+    assert "1" in resumed.done_ids
+    resumed.close()
+    assert "1" in resume(tmp_path).done_ids
+
+
+def test_old_csv_checkpoints_move_into_the_store(tmp_path):
+    csv_path = tmp_path / "out.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([FIELDS, ["1", "a"], ["2", "b"]])
+        checkpointed = f.tell()
+        f.write("3,half a ro")
+    (tmp_path / "checkpoint.json.ids").write_text("1\n2\n")
+    (tmp_path / "checkpoint.json").write_text(json.dumps({
+        "output": str(csv_path), "output_bytes": checkpointed, "ids_bytes": 4, "next_offsets": {"0": 24}, "meta": {}}))
+
+    resumed = resume(tmp_path)
+    assert resumed.done_ids == {"1", "2"}
+    assert stored_ids(resumed) == ["1", "2"]
+    resumed.close()
+    assert "output_bytes" not in json.loads((tmp_path / "checkpoint.json").read_text())
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from tapaz_categories import COMMON_FIELDS, DEFAULT_CATEGORY, discover_categories, get_category, load_categories
+
+MENU = """
+<nav>
+  <a href="/elanlar/neqliyyat/tikinti-texnikasi">Tikinti texnikası</a>
+  <a href="https://tap.az/elanlar/neqliyyat/yuk-masinlari/">Yük maşınları</a>
+  <a href="/elanlar/elektronika/telefonlar?utm=menu">Telefonlar</a>
+  <a href="/elanlar/elektronika">Elektronika</a>
+  <a href="/elanlar/neqliyyat/tikinti-texnikasi/ekskavatorlar">Ekskavatorlar</a>
+  <a href="/elanlar/neqliyyat/tikinti-texnikasi/ekskavatorlar/41000077">Elan</a>
+  <a href="/elanlar/elektronika/telefonlar">Telefonlar again</a>
+</nav>
+"""
+
+
+def test_discovery_finds_category_pages_only():
+    found = discover_categories(MENU, load_categories("missing.json"))
+    assert sorted(found) == ["telefonlar", "tikinti-texnikasi", "yuk-masinlari"]
+    assert found["yuk-masinlari"].url == "/elanlar/neqliyyat/yuk-masinlari"
+    assert found["telefonlar"].fields == COMMON_FIELDS
+    # A registered category keeps its field map
+    assert "Yurusu_km" in found[DEFAULT_CATEGORY].fields
+
+
+def test_categories_file_adds_and_overrides(tmp_path):
+    path = tmp_path / "categories.json"
+    path.write_text(json.dumps({"yuk-masinlari": {"url": "/elanlar/neqliyyat/yuk-masinlari",
+                                                  "fields": {"Year": "Buraxılış ili"}}}), encoding="utf-8")
+    categories = load_categories(str(path))
+    assert categories["yuk-masinlari"].fields == {"Year": "Buraxılış ili"}
+    assert discover_categories(MENU, categories)["yuk-masinlari"] is categories["yuk-masinlari"]
+
+
+def test_get_category_by_slug_or_url():
+    categories = load_categories("missing.json")
+    assert get_category("/elanlar/neqliyyat/tikinti-texnikasi/", categories).slug == DEFAULT_CATEGORY
+    assert get_category("/elanlar/elektronika/telefonlar", categories).fields == COMMON_FIELDS
+    with pytest.raises(KeyError):
+        get_category("telefonlar", categories)
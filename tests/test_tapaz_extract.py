@@ -0,0 +1,58 @@
+import glob
+import os
+
+import pytest
+
+from tapaz_extract import available_parsers, extract_listing_page, extract_product, normalize_text
+
+pytest.importorskip("bs4")
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), os.pardir, "fixtures", "tapaz", "*.html")))
+URL = "https://tap.az/elanlar/xidmetler/tikinti-texnikasi/41000077"
+
+# Whitespace and inline markup the backends used to flatten differently
+AWKWARD_PAGE = """<html><body>
+<h1 class="product-title">  JCB
+   3CX  </h1>
+<div class="price-val">45 000</div>
+<div class="product-properties__i"><label class="product-properties__i-name">Şəhər</label>
+  <span class="product-properties__i-value"><a href="/bak">Bakı</a></span></div>
+<div class="product-properties__i"><label class="product-properties__i-name">Buraxılış   ili</label>
+  <span class="product-properties__i-value">2019</span></div>
+<div class="product-description__content"><p>Line one
+    continued,<b>bold</b>&nbsp;tail</p>
+<p>	tab	separated  </p><br><p></p></div>
+</body></html>"""
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_backends_agree_on_fixtures(path):
+    with open(path, encoding="utf-8") as f:
+        html = f.read()
+    records = {parser: extract_product(html, URL, parser=parser) for parser in available_parsers()}
+    assert len({repr(record) for record in records.values()}) == 1, records
+    assert records["bs4"]["title"] and records["bs4"]["Description"]
+
+
+def test_backends_normalize_whitespace_the_same_way():
+    records = {parser: extract_product(AWKWARD_PAGE, URL, parser=parser) for parser in available_parsers()}
+    for record in records.values():
+        assert record["title"] == "JCB 3CX"
+        assert record["price"] == 45000
+        assert record["city"] == "Bakı"
+        assert record["Description"] == "Line one continued, bold tail tab separated"
+    assert len({repr(record) for record in records.values()}) == 1
+
+
+def test_listing_pages_agree():
+    html = ('<div class="products-i"><a class="products-link" href="/elanlar/a/1">x</a></div>'
+            '<div class="products-i"><a class="products-link" href="/shops/b">y</a></div>'
+            '<div class="pagination"><span class="next"><a href="?page=2">next</a></span></div>')
+    results = {parser: extract_listing_page(html, "https://tap.az", parser=parser) for parser in available_parsers()}
+    assert set(map(repr, results.values())) == {repr((["https://tap.az/elanlar/a/1"], "?page=2"))}
+
+
+def test_normalize_text():
+    assert normalize_text("  a\n\tb  c ") == "a b c"
+    assert normalize_text("") == ""
+    assert normalize_text(None) is None
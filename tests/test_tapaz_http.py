@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+import tapaz_http
+
+PAGE = "<h1 class='product-title'>{}</h1><div class='product-properties'></div>"
+
+
+def parse(html, url):
+    return {"title": url} if "bad" not in url else None
+
+
+def test_in_flight_pages_are_bounded_and_results_handled_on_the_caller(monkeypatch):
+    workers = 2
+    state = {"produced": 0, "fetched": 0, "max_ahead": 0}
+    lock = threading.Lock()
+
+    def fake_fetch(session, url):
+        time.sleep(0.005)
+        with lock:
+            state["fetched"] += 1
+        return PAGE.format(url)
+
+    def urls():
+        for i in range(60):
+            with lock:
+                state["max_ahead"] = max(state["max_ahead"], state["produced"] - state["fetched"])
+            state["produced"] += 1
+            yield f"https://tap.az/elanlar/{'bad' if i % 10 == 0 else 'ok'}/{i}"
+
+    caller = threading.current_thread()
+    callback_threads = set()
+
+    def on_fallback(url):
+        callback_threads.add(threading.current_thread())
+
+    def on_record(record):
+        callback_threads.add(threading.current_thread())
+
+    monkeypatch.setattr(tapaz_http, "fetch_html", fake_fetch)
+    records, fallbacks = tapaz_http.scrape_products_http(urls(), parse, "test-agent", workers=workers,
+                                                         on_record=on_record, on_fallback=on_fallback)
+    assert len(records) == 54 and len(fallbacks) == 6
+    assert all("/bad/" in url for url in fallbacks)
+    assert state["max_ahead"] <= 2 * workers
+    assert callback_threads == {caller}
+
+
+def test_fetch_errors_fall_back(monkeypatch):
+    def fake_fetch(session, url):
+        if url.endswith("/1"):
+            raise ConnectionError("reset")
+        if url.endswith("/2"):
+            return "<html>captcha</html>"
+        return PAGE.format(url)
+
+    monkeypatch.setattr(tapaz_http, "fetch_html", fake_fetch)
+    records, fallbacks = tapaz_http.scrape_products_http([f"https://tap.az/elanlar/x/{i}" for i in range(4)],
+                                                         parse, "test-agent", workers=2)
+    assert sorted(fallbacks) == ["https://tap.az/elanlar/x/1", "https://tap.az/elanlar/x/2"]
+    assert len(records) == 2
+
+
+@pytest.mark.parametrize("last_page_fails", [False, True])
+def test_listing_reports_whether_it_reached_the_last_page(monkeypatch, last_page_fails):
+    def fake_fetch(session, url, attempts=1):
+        if url.endswith("page=2") and last_page_fails:
+            raise ConnectionError("reset")
+        return url
+
+    def fake_extract(html, base_url):
+        page = 2 if html.endswith("page=2") else 1
+        return [f"{base_url}/elanlar/x/{page}"], "/elanlar/x?page=2" if page == 1 else None
+
+    monkeypatch.setattr(tapaz_http, "fetch_html_with_retries", fake_fetch)
+    monkeypatch.setattr(tapaz_http, "extract_listing_page", fake_extract)
+    stats = {}
+    links = list(tapaz_http.iter_listing_links("/elanlar/x", "test-agent", "https://tap.az", stats))
+    assert len(links) == (1 if last_page_fails else 2)
+    assert stats.get("complete", False) is not last_page_fails
@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+pytest.importorskip("selenium")
+from selenium.common.exceptions import WebDriverException
+
+import tapaz_pool
+from tapaz_pool import BrowserPool
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(tapaz_pool, "SETUP_BACKOFF", 0.0)
+
+
+class Browsers:
+    """setup_fn/cleanup_fn pair that fails the first ``failures`` starts, or all of them."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.started = 0
+        self.live = set()
+        self.lock = threading.Lock()
+
+    def setup(self):
+        with self.lock:
+            self.started += 1
+            if self.failures is None or self.started <= self.failures:
+                raise RuntimeError("chrome did not start")
+            driver = object()
+            self.live.add(driver)
+            return driver
+
+    def cleanup(self, driver):
+        if driver is not None:
+            with self.lock:
+                self.live.remove(driver)  # raises on a double quit
+
+
+def run(urls, scrape, browsers, workers=2, restart_every=50):
+    pool = BrowserPool(browsers.setup, browsers.cleanup, scrape, workers, restart_every)
+    for url in urls:
+        pool.submit(url)
+    return pool, pool.close()
+
+
+def test_errors_on_one_url_do_not_stop_the_worker():
+    def scrape(driver, url):
+        if url == "bad":
+            raise ValueError("no title")
+        return {"url": url}
+
+    browsers = Browsers()
+    pool, records = run(["a", "bad", "b", "c"], scrape, browsers, workers=1)
+    assert sorted(record["url"] for record in records) == ["a", "b", "c"]
+    assert pool.completed == 4 and pool.failed == []
+    assert not browsers.live
+
+
+def test_setup_is_retried_with_backoff():
+    browsers = Browsers(failures=tapaz_pool.SETUP_ATTEMPTS - 1)
+    pool, records = run(["a", "b"], lambda driver, url: {"url": url}, browsers, workers=1)
+    assert len(records) == 2 and browsers.started == tapaz_pool.SETUP_ATTEMPTS
+
+
+def test_queue_drains_into_failed_when_every_worker_dies():
+    browsers = Browsers(failures=None)
+    pool, records = run(["a", "b", "c", "d"], lambda driver, url: {"url": url}, browsers, workers=2)
+    assert records == []
+    assert sorted(pool.failed) == ["a", "b", "c", "d"]
+    assert pool.completed == pool.submitted == 4
+    pool.submit("late")
+    assert pool.failed[-1] == "late"
+
+
+def test_crash_restarts_and_two_crashes_give_up():
+    crashes = {"flaky": 1, "broken": 2}
+
+    def scrape(driver, url):
+        if crashes.get(url):
+            crashes[url] -= 1
+            raise WebDriverException("tab crashed")
+        return {"url": url}
+
+    browsers = Browsers()
+    pool, records = run(["flaky", "broken", "ok"], scrape, browsers, workers=1)
+    assert sorted(record["url"] for record in records) == ["flaky", "ok"]
+    assert pool.failed == ["broken"]
+    assert not browsers.live
+
+
+def test_failed_restart_after_a_crash_hands_the_url_back():
+    browsers = Browsers()
+
+    def scrape(driver, url):
+        if url == "crash":
+            browsers.failures = None  # nothing starts any more
+            raise WebDriverException("browser died")
+        return {"url": url}
+
+    pool, records = run(["ok", "crash", "after"], scrape, browsers, workers=1)
+    assert [record["url"] for record in records] == ["ok"]
+    assert sorted(pool.failed) == ["after", "crash"]
+    assert not browsers.live